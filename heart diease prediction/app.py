@@ -1,54 +1,490 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory, redirect, url_for, send_from_directory
+from flask import Flask, request, g, jsonify, render_template, send_from_directory, redirect, url_for, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
-import joblib
 import os
+import io
+import mimetypes
 import json
+import threading
+import time
 from datetime import datetime
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import seaborn as sns
-import json
-from datetime import datetime
+from history_store import HistoryStore, DEFAULT_DB_PATH
+from batching import MicroBatcher, QueueFull, BatchTimeout
+from prediction_cache import PredictionCache, SQLiteCache, artifact_version
+from jobs import JobStore, start_job, DEFAULT_DB_PATH as DEFAULT_JOBS_DB_PATH
+from assets import AssetManifest, build_assets, DIST_DIRNAME
+from chart_data import ChartData, CHART_NAMES, MODEL_CHARTS
+from population import load_or_build_stats, load_or_build_index, summary_stats, DEFAULT_STATS_PATH, DEFAULT_PERCENTILES_PATH
+from cohorts import CohortCube, load_or_build_cube, DIMENSIONS as COHORT_DIMENSIONS, DEFAULT_COHORTS_PATH
+from forest import SMALL_BATCH_ROWS
+from metrics import Registry, StageTimer, STAGE_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 CORS(app)
 
-# Check if model exists, if not train it
-if not os.path.exists('heart_disease_model.pkl'):
+# Unhashed /static files may change in place (charts are re-rendered), so browsers revalidate them after 5 minutes
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 300
+
+# Content-hashed files under /static/dist never change, so they can be cached for a year
+HASHED_ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Set ASSET_PIPELINE=0 to reference the plain /static files from templates
+ASSET_PIPELINE = os.environ.get('ASSET_PIPELINE', '1') != '0'
+
+MODEL_PATH = 'heart_disease_model.pkl'
+MODEL_ARRAYS_DIR = 'heart_disease_model.arrays'
+STATS_PATH = DEFAULT_STATS_PATH
+PERCENTILES_PATH = DEFAULT_PERCENTILES_PATH
+COHORTS_PATH = DEFAULT_COHORTS_PATH
+
+# Set MODEL_MMAP=1 to serve from the memory-mapped array store so all workers share one copy of the trees
+MODEL_MMAP = os.environ.get('MODEL_MMAP', '0') == '1'
+
+# Set MODEL_BACKGROUND_LOADING=0 to load the model before the module finishes importing
+MODEL_BACKGROUND_LOADING = os.environ.get('MODEL_BACKGROUND_LOADING', '1') != '0'
+
+# Set MICRO_BATCHING=1 to score concurrent /predict requests together in small batches
+MICRO_BATCHING = os.environ.get('MICRO_BATCHING', '0') == '1'
+MICRO_BATCH_WINDOW_MS = float(os.environ.get('MICRO_BATCH_WINDOW_MS', 2))
+MICRO_BATCH_MAX_ROWS = int(os.environ.get('MICRO_BATCH_MAX_ROWS', 64))
+MICRO_BATCH_MAX_QUEUE = int(os.environ.get('MICRO_BATCH_MAX_QUEUE', 1024))
+MICRO_BATCH_TIMEOUT_MS = float(os.environ.get('MICRO_BATCH_TIMEOUT_MS', 1000))
+
+# /predict result cache; PREDICTION_CACHE_SIZE=0 disables it, PREDICTION_CACHE_DB shares it between workers
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+PREDICTION_CACHE_DB = os.environ.get('PREDICTION_CACHE_DB')
+
+# Prometheus metrics at /metrics; METRICS_DIR (a directory shared by the workers) makes them add up over all workers
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+
+# Input features expected by the model, in training column order
+FEATURE_COLUMNS = ['age', 'education', 'sex', 'is_smoking', 'cigsPerDay', 'BPMeds',
+                   'prevalentStroke', 'prevalentHyp', 'diabetes', 'totChol', 'sysBP',
+                   'diaBP', 'BMI', 'heartRate', 'glucose']
+
+# Population statistics from the snapshot written next to the model, so workers do not parse the dataset
+dataset_stats = {}
+population_stats = None
+
+# Sorted feature values for percentile ranks and the cohort aggregate cube, both saved next to the model
+population_index = None
+cohort_cube = None
+population_index_version = None
+
+def refresh_dataset_stats():
+    """
+    Reload the population statistics for the current model artifact
+    """
+    global dataset_stats, population_stats, population_index, cohort_cube, population_index_version
     try:
-        from model import train_model
-        model = train_model()
+        population_stats = load_or_build_stats(STATS_PATH, MODEL_PATH)
+        # Rebound rather than updated in place, so a request never sees a half-filled dictionary
+        dataset_stats = summary_stats(population_stats)
+        if population_index is None or population_index_version != population_stats['model_version']:
+            population_index = load_or_build_index(PERCENTILES_PATH, MODEL_PATH)
+            cohort_cube = load_or_build_cube(COHORTS_PATH, MODEL_PATH, version=population_stats['dataset_version'])
+            population_index_version = population_stats['model_version']
     except Exception as e:
-        print(f"Error training model: {e}")
-        model = None
-else:
+        print(f"Error loading dataset statistics: {e}")
+
+refresh_dataset_stats()
+
+# Filled in by load_model(); requests answer 503 until the model is ready
+model = None
+fast_model = None
+batcher = None
+model_version = None
+
+prediction_cache = None
+if PREDICTION_CACHE_SIZE > 0:
+    shared_cache = SQLiteCache(PREDICTION_CACHE_DB, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL) if PREDICTION_CACHE_DB else None
+    prediction_cache = PredictionCache(FEATURE_COLUMNS, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, shared=shared_cache)
+model_status = {'state': 'loading', 'error': None, 'load_seconds': None}
+model_ready = threading.Event()
+
+def load_model():
+    """
+    Load the saved model, training it first if it does not exist yet
+    """
+    global model, fast_model, batcher, model_version
+    start = time.perf_counter()
     try:
-        model = joblib.load('heart_disease_model.pkl')
+        # Check if model exists, if not train it
+        if not os.path.exists(MODEL_PATH):
+            from model import train_model
+            loaded = train_model()
+        elif not MODEL_MMAP:
+            import joblib
+            loaded = joblib.load(MODEL_PATH)
+        
+        if MODEL_MMAP:
+            from forest import model_arrays_current, save_model_arrays, load_model_arrays
+            if not model_arrays_current(MODEL_PATH, MODEL_ARRAYS_DIR):
+                import joblib
+                save_model_arrays(joblib.load(MODEL_PATH), MODEL_PATH, MODEL_ARRAYS_DIR)
+            loaded = load_model_arrays(MODEL_ARRAYS_DIR, mmap_mode='r')
+        
+        # Precompile the pipeline into NumPy arrays for single-row scoring
+        from inference import compile_pipeline
+        fast_model = compile_pipeline(loaded)
+        model_version = artifact_version(MODEL_PATH)
+        if prediction_cache is not None:
+            # Results cached for an older artifact are never served
+            prediction_cache.set_version(model_version)
+        if MICRO_BATCHING and fast_model is not None:
+            batcher = MicroBatcher(fast_model.predict_many,
+                                   max_batch_size=MICRO_BATCH_MAX_ROWS,
+                                   max_wait=MICRO_BATCH_WINDOW_MS / 1000,
+                                   max_queue=MICRO_BATCH_MAX_QUEUE)
+        # Training (or a new artifact) brings its own statistics snapshot
+        refresh_dataset_stats()
+        model = loaded
+        model_status['state'] = 'ready'
     except Exception as e:
         print(f"Error loading model: {e}")
-        model = None
-
-# Load dataset for statistics
-try:
-    df = pd.read_csv('train_updated.csv')
-    dataset_stats = {
-        'total_records': len(df),
-        'positive_cases': int(df['TenYearCHD'].sum()),
-        'negative_cases': int(len(df) - df['TenYearCHD'].sum()),
-        'positive_rate': float(df['TenYearCHD'].mean()),
-        'avg_age': float(df['age'].mean()),
-        'avg_cholesterol': float(df['totChol'].mean()),
-        'avg_systolic_bp': float(df['sysBP'].mean()),
-        'avg_diastolic_bp': float(df['diaBP'].mean()),
-        'smokers_count': int(df['is_smoking'].sum()),
-        'smokers_percentage': float(df['is_smoking'].mean() * 100)
-    }
-except Exception as e:
-    print(f"Error loading dataset statistics: {e}")
-    dataset_stats = {}
+        model_status['state'] = 'failed'
+        model_status['error'] = str(e)
+    finally:
+        model_status['load_seconds'] = time.perf_counter() - start
+        model_ready.set()
+
+def start_model_loading(background=MODEL_BACKGROUND_LOADING):
+    """
+    Load the model in a daemon thread so the app can serve health checks and pages meanwhile
+    """
+    if background:
+        threading.Thread(target=load_model, name='model-loader', daemon=True).start()
+    else:
+        load_model()
+
+def wait_for_model(timeout=None):
+    """
+    Block until the model has finished loading (or failed)
+
+    Returns:
+        ready: True if the model is available
+    """
+    model_ready.wait(timeout)
+    return model is not None
+
+# sklearn pipeline for large batches when serving from the array store, loaded on first use
+bulk_model = None
+bulk_model_lock = threading.Lock()
+
+def batch_model(n_rows):
+    """
+    The model to score a batch of n_rows with
+
+    The compiled forest of the array store is only faster than sklearn up to
+    SMALL_BATCH_ROWS rows, so with MODEL_MMAP=1 larger batches go through the
+    sklearn pipeline, loaded from MODEL_PATH by the first large batch.
+    """
+    global bulk_model
+    if not MODEL_MMAP or n_rows <= SMALL_BATCH_ROWS:
+        return model
+    with bulk_model_lock:
+        if bulk_model is None or bulk_model[0] != model_version:
+            import joblib
+            bulk_model = (model_version, joblib.load(MODEL_PATH))
+        return bulk_model[1]
+
+def model_unavailable():
+    if model_status['state'] == 'loading':
+        return jsonify({'error': 'Model is still loading, please retry shortly'}), 503
+    return jsonify({'error': 'Model not available'}), 500
+
+def _restart_loading_after_fork():
+    """
+    The loader thread does not survive a fork; if the model was not ready yet, load it again in the child
+    """
+    global model_ready
+    if not model_ready.is_set():
+        model_ready = threading.Event()
+        start_model_loading()
+
+os.register_at_fork(after_in_child=_restart_loading_after_fork)
+
+start_model_loading()
+
+# Append-only prediction history (imports prediction_history.json on first use)
+history_store = HistoryStore(os.environ.get('HISTORY_DB', DEFAULT_DB_PATH))
+
+# Background jobs (visualization regeneration), visible to every worker process
+job_store = JobStore(os.environ.get('JOBS_DB', DEFAULT_JOBS_DB_PATH))
+
+# Fingerprinted copies of the static assets; only new or changed files are written
+asset_manifest = AssetManifest(app.static_folder, app.static_url_path)
+if ASSET_PIPELINE:
+    try:
+        build_assets(app.static_folder)
+    except Exception as e:
+        print(f"Error building static assets: {e}")
+
+# JSON chart data, computed once per dataset (and model) version
+chart_data = ChartData('train_updated.csv')
+
+def history_store_bytes():
+    """
+    Size of the history database including its write-ahead log, or None for an in-memory store
+    """
+    paths = [history_store.db_path + suffix for suffix in ('', '-wal')]
+    sizes = [os.path.getsize(path) for path in paths if os.path.exists(path)]
+    return sum(sizes) if sizes else None
+
+metrics_registry = Registry(METRICS_DIR, METRICS_FLUSH_SECONDS)
+http_requests = metrics_registry.counter(
+    'http_requests_total', 'HTTP requests by route, method and status code', ('route', 'method', 'status'))
+http_request_errors = metrics_registry.counter(
+    'http_request_errors_total', 'HTTP requests answered with a 5xx status code', ('route', 'method'))
+http_request_seconds = metrics_registry.histogram(
+    'http_request_duration_seconds', 'Time to build the response, by route and method', ('route', 'method'))
+predict_stage_seconds = metrics_registry.histogram(
+    'predict_stage_duration_seconds', 'Time spent in each stage of a /predict request', ('stage',), STAGE_BUCKETS)
+metrics_registry.gauge(
+    'model_load_seconds', 'Time taken to load (or train) the model at startup',
+    lambda: model_status['load_seconds'])
+metrics_registry.gauge(
+    'model_ready', '1 once the model is loaded and serving predictions',
+    lambda: 1 if model_status['state'] == 'ready' else 0)
+metrics_registry.gauge(
+    'history_store_records', 'Predictions stored in the history', lambda: history_store.count())
+metrics_registry.gauge(
+    'history_store_bytes', 'Size of the history database and its write-ahead log', history_store_bytes)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Count the request and record its latency under its route pattern
+
+    Streamed responses are timed until the response object is returned, not until the last chunk is sent.
+    """
+    start = g.get('request_start')
+    if start is not None:
+        # Route patterns rather than paths keep the number of label values bounded
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        http_request_seconds.observe(time.perf_counter() - start, (route, request.method))
+        http_requests.inc((route, request.method, str(response.status_code)))
+        if response.status_code >= 500:
+            http_request_errors.inc((route, request.method))
+        metrics_registry.ensure_flushing()
+    return response
+
+@app.context_processor
+def inject_asset_url():
+    def asset_url(path):
+        if ASSET_PIPELINE:
+            return asset_manifest.url(path)
+        return url_for('static', filename=path)
+    return {'asset_url': asset_url}
+
+# Features the risk-factor rules compare against and therefore must be present
+REQUIRED_FEATURES = ['age', 'is_smoking', 'totChol', 'sysBP', 'diaBP']
+
+# Upper bound on the number of rows accepted by /predict/batch
+MAX_BATCH_SIZE = 10000
+
+# Records per page on /history and /api/history, and the largest page a client may ask for
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 500
+
+def validate_record(data):
+    """
+    Check a single input record before it is scored
+
+    Args:
+        data: Dictionary of input features
+
+    Returns:
+        error: A message describing the first problem found, or None if the record is valid
+    """
+    if not isinstance(data, dict):
+        return 'Record must be a JSON object'
+    for feature in REQUIRED_FEATURES:
+        if data.get(feature) is None:
+            return f"Missing required feature '{feature}'"
+    for feature in FEATURE_COLUMNS:
+        value = data.get(feature)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            return f"Feature '{feature}' must be numeric"
+    return None
+
+def identify_risk_factors(data):
+    """
+    Apply the rule-based risk and protective factor checks to an input record
+
+    Args:
+        data: Dictionary of input features
+
+    Returns:
+        risk_factors: List of {'name', 'impact'} dictionaries
+    """
+    risk_factors = []
+    
+    # Age risk
+    if data.get('age') > 60:
+        risk_factors.append({'name': 'Age > 60', 'impact': 1})
+    
+    # Smoking risk
+    if data.get('is_smoking') == 1:
+        risk_factors.append({'name': 'Current Smoker', 'impact': 1})
+        if (data.get('cigsPerDay') or 0) > 20:
+            risk_factors.append({'name': 'Heavy Smoker (>20 cigarettes/day)', 'impact': 1})
+    
+    # Blood pressure risk
+    if data.get('sysBP') > 140 or data.get('diaBP') > 90:
+        risk_factors.append({'name': 'High Blood Pressure', 'impact': 1})
+    
+    # Cholesterol risk
+    if data.get('totChol') > 240:
+        risk_factors.append({'name': 'High Cholesterol', 'impact': 1})
+    
+    # BMI risk
+    if data.get('BMI') and data.get('BMI') > 30:
+        risk_factors.append({'name': 'Obesity (BMI > 30)', 'impact': 1})
+    
+    # Medical history risks
+    if data.get('prevalentStroke') == 1:
+        risk_factors.append({'name': 'Previous Stroke', 'impact': 1})
+    if data.get('prevalentHyp') == 1:
+        risk_factors.append({'name': 'Hypertension', 'impact': 1})
+    if data.get('diabetes') == 1:
+        risk_factors.append({'name': 'Diabetes', 'impact': 1})
+    
+    # Protective factors
+    if data.get('is_smoking') == 0:
+        risk_factors.append({'name': 'Non-Smoker', 'impact': -1})
+    if data.get('BMI') and 18.5 <= data.get('BMI') <= 24.9:
+        risk_factors.append({'name': 'Healthy BMI', 'impact': -1})
+    if data.get('totChol') < 200:
+        risk_factors.append({'name': 'Healthy Cholesterol Level', 'impact': -1})
+    
+    return risk_factors
+
+def prediction_message(prediction):
+    return 'High risk of heart disease in 10 years' if prediction == 1 else 'Low risk of heart disease in 10 years'
+
+def parse_batch_request():
+    """
+    Read the rows of a /predict/batch request body
+
+    Accepts a JSON array of records, a JSON object with a 'records' array,
+    or a CSV body with a header row of feature names.
+
+    Returns:
+        rows: List of input records
+    """
+    if request.mimetype in ('text/csv', 'application/csv'):
+        frame = pd.read_csv(io.StringIO(request.get_data(as_text=True)))
+        frame = frame.astype(object).where(frame.notna(), None)
+        return frame.to_dict(orient='records')
+    
+    payload = request.get_json(force=True)
+    if isinstance(payload, dict):
+        payload = payload.get('records')
+    if not isinstance(payload, list):
+        raise ValueError('Expected a JSON array of records or a CSV body')
+    return payload
+
+def parse_history_filters():
+    """
+    Read the time-range and risk-class filters of a history request
+
+    Query parameters:
+        start, end: 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS' (an end date includes the whole day)
+        risk: 'high' or 'low'
+
+    Returns:
+        filters: Keyword arguments for HistoryStore.page() and HistoryStore.iter_records()
+    """
+    filters = {'start': None, 'end': None, 'prediction': None}
+    for name in ('start', 'end'):
+        value = request.args.get(name)
+        if not value:
+            continue
+        try:
+            if len(value) == 10:
+                datetime.strptime(value, '%Y-%m-%d')
+                value += ' 00:00:00' if name == 'start' else ' 23:59:59'
+            else:
+                datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            raise ValueError(f"'{name}' must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+        filters[name] = value
+    
+    risk = request.args.get('risk')
+    if risk:
+        if risk not in ('high', 'low'):
+            raise ValueError("'risk' must be 'high' or 'low'")
+        filters['prediction'] = 1 if risk == 'high' else 0
+    return filters
+
+@app.route('/healthz')
+def healthz():
+    """
+    Liveness probe: the process is up and serving requests
+    """
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """
+    Readiness probe: only healthy once the model is loaded and can score requests
+    """
+    status_code = 200 if model_status['state'] == 'ready' else 503
+    return jsonify({
+        'status': model_status['state'],
+        'error': model_status['error'],
+        'model_load_seconds': model_status['load_seconds']
+    }), status_code
+
+@app.route('/metrics')
+def metrics():
+    """
+    Request, /predict stage, model and history metrics in the Prometheus text format
+    """
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/cache_stats')
+def cache_stats():
+    """
+    Hit/miss counters of this worker's /predict result cache
+    """
+    if prediction_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(prediction_cache.stats(), enabled=True))
+
+@app.route('/static/dist/<path:filename>')
+def hashed_asset(filename):
+    """
+    Serve a content-hashed asset with a year-long cache lifetime and a strong ETag,
+    using a precompressed variant when the client accepts one
+    """
+    dist_dir = os.path.join(app.static_folder, DIST_DIRNAME)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    # The content hash is the part of the name before the extension
+    digest = os.path.splitext(filename)[0].rsplit('.', 1)[-1]
+    
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(dist_dir, filename + suffix)):
+            response = send_from_directory(dist_dir, filename + suffix, mimetype=mimetype,
+                                           download_name=os.path.basename(filename),
+                                           etag=f'{digest}-{encoding}', max_age=HASHED_ASSET_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(dist_dir, filename, mimetype=mimetype,
+                                       etag=digest, max_age=HASHED_ASSET_MAX_AGE)
+    
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
 
 @app.route('/')
 def home():
@@ -61,106 +497,163 @@ def dashboard():
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
+        # Each stage's time goes into the predict_stage_duration_seconds histogram
+        timer = StageTimer(predict_stage_seconds)
+        
         # Get data from request
         data = request.json
-        
-        # Create a DataFrame with the input data
-        input_data = pd.DataFrame({
-            'age': [data.get('age')],
-            'education': [data.get('education')],
-            'sex': [data.get('sex')],
-            'is_smoking': [data.get('is_smoking')],
-            'cigsPerDay': [data.get('cigsPerDay')],
-            'BPMeds': [data.get('BPMeds')],
-            'prevalentStroke': [data.get('prevalentStroke')],
-            'prevalentHyp': [data.get('prevalentHyp')],
-            'diabetes': [data.get('diabetes')],
-            'totChol': [data.get('totChol')],
-            'sysBP': [data.get('sysBP')],
-            'diaBP': [data.get('diaBP')],
-            'BMI': [data.get('BMI')],
-            'heartRate': [data.get('heartRate')],
-            'glucose': [data.get('glucose')]
-        })
+        timer.lap('parse')
         
         # Make prediction
         if model is not None:
-            prediction = model.predict(input_data)
-            prediction_proba = model.predict_proba(input_data)
-            
-            # Identify risk factors
-            risk_factors = []
-            
-            # Age risk
-            if data.get('age') > 60:
-                risk_factors.append({'name': 'Age > 60', 'impact': 1})
-            
-            # Smoking risk
-            if data.get('is_smoking') == 1:
-                risk_factors.append({'name': 'Current Smoker', 'impact': 1})
-                if data.get('cigsPerDay', 0) > 20:
-                    risk_factors.append({'name': 'Heavy Smoker (>20 cigarettes/day)', 'impact': 1})
-            
-            # Blood pressure risk
-            if data.get('sysBP') > 140 or data.get('diaBP') > 90:
-                risk_factors.append({'name': 'High Blood Pressure', 'impact': 1})
-            
-            # Cholesterol risk
-            if data.get('totChol') > 240:
-                risk_factors.append({'name': 'High Cholesterol', 'impact': 1})
-            
-            # BMI risk
-            if data.get('BMI') and data.get('BMI') > 30:
-                risk_factors.append({'name': 'Obesity (BMI > 30)', 'impact': 1})
-            
-            # Medical history risks
-            if data.get('prevalentStroke') == 1:
-                risk_factors.append({'name': 'Previous Stroke', 'impact': 1})
-            if data.get('prevalentHyp') == 1:
-                risk_factors.append({'name': 'Hypertension', 'impact': 1})
-            if data.get('diabetes') == 1:
-                risk_factors.append({'name': 'Diabetes', 'impact': 1})
-            
-            # Protective factors
-            if data.get('is_smoking') == 0:
-                risk_factors.append({'name': 'Non-Smoker', 'impact': -1})
-            if data.get('BMI') and 18.5 <= data.get('BMI') <= 24.9:
-                risk_factors.append({'name': 'Healthy BMI', 'impact': -1})
-            if data.get('totChol') < 200:
-                risk_factors.append({'name': 'Healthy Cholesterol Level', 'impact': -1})
+            # Identical inputs are answered from the cache
+            cache_key = prediction_cache.key(data) if prediction_cache is not None else None
+            cached = prediction_cache.get(cache_key) if cache_key is not None else None
+            if prediction_cache is not None:
+                timer.lap('cache_lookup')
+            if cached is not None:
+                prediction = cached['prediction']
+                probability = cached['probability']
+                risk_factors = cached['risk_factors']
+            else:
+                if batcher is not None:
+                    # Scored together with other requests arriving at the same time
+                    try:
+                        label, probability = batcher.submit(data, timeout=MICRO_BATCH_TIMEOUT_MS / 1000)
+                    except (QueueFull, BatchTimeout) as e:
+                        return jsonify({'error': f'Server busy, please retry shortly: {e}'}), 503
+                    # Transform and forest evaluation happen in the batch, together with the wait for it
+                    timer.lap('micro_batch')
+                elif fast_model is not None:
+                    # Score straight from the request dict with one forest evaluation
+                    row = fast_model.transform_one(data)[0]
+                    timer.lap('transform')
+                    label, probability = fast_model.predict_row(row)
+                    timer.lap('forest')
+                else:
+                    input_data = pd.DataFrame({feature: [data.get(feature)] for feature in FEATURE_COLUMNS})
+                    timer.lap('dataframe')
+                    transformed = model.named_steps['preprocessor'].transform(input_data)
+                    timer.lap('transform')
+                    prediction_proba = model.named_steps['classifier'].predict_proba(transformed)[0]
+                    label = model.classes_[int(np.argmax(prediction_proba))]
+                    probability = prediction_proba[list(model.classes_).index(1)]
+                    timer.lap('forest')
+                prediction = int(label)
+                probability = float(probability)
+                
+                # Identify risk factors
+                risk_factors = identify_risk_factors(data)
+                timer.lap('risk_factors')
+                
+                # Cache the result for identical inputs
+                if cache_key is not None:
+                    prediction_cache.put(cache_key, {
+                        'prediction': prediction,
+                        'probability': probability,
+                        'risk_factors': risk_factors
+                    })
+                    timer.lap('cache_store')
             
-            # Save prediction to history file
+            # Save prediction to history
             try:
-                prediction_history = {
+                history_store.append([{
                     'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                     'input_data': data,
-                    'prediction': int(prediction[0]),
-                    'probability': float(prediction_proba[0][1])
-                }
-                
-                history_file = 'prediction_history.json'
-                if os.path.exists(history_file):
-                    with open(history_file, 'r') as f:
-                        history = json.load(f)
-                else:
-                    history = []
-                
-                history.append(prediction_history)
-                
-                with open(history_file, 'w') as f:
-                    json.dump(history, f)
+                    'prediction': prediction,
+                    'probability': probability
+                }])
             except Exception as e:
                 print(f"Error saving prediction history: {e}")
+            timer.lap('history_write')
             
             # Return prediction
             return jsonify({
-                'prediction': int(prediction[0]),
-                'probability': float(prediction_proba[0][1]),
-                'message': 'High risk of heart disease in 10 years' if prediction[0] == 1 else 'Low risk of heart disease in 10 years',
+                'prediction': prediction,
+                'probability': probability,
+                'message': prediction_message(prediction),
                 'risk_factors': risk_factors
             })
         else:
-            return jsonify({'error': 'Model not available'}), 500
+            return model_unavailable()
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Score many records with a single model call
+
+    Invalid rows are reported individually and do not fail the batch.
+    """
+    try:
+        if model is None:
+            return model_unavailable()
+        
+        try:
+            rows = parse_batch_request()
+        except Exception as e:
+            return jsonify({'error': f'Invalid batch request: {e}'}), 400
+        
+        if len(rows) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch size exceeds the limit of {MAX_BATCH_SIZE} records'}), 413
+        
+        # Validate every row up front and keep the scorable ones
+        results = [None] * len(rows)
+        valid_indices = []
+        for index, row in enumerate(rows):
+            error = validate_record(row)
+            if error is None:
+                valid_indices.append(index)
+            else:
+                results[index] = {'index': index, 'error': error}
+        
+        history_records = []
+        if valid_indices:
+            # One vectorized pass through the pipeline for the whole batch
+            input_data = pd.DataFrame([rows[i] for i in valid_indices], columns=FEATURE_COLUMNS)
+            scorer = batch_model(len(valid_indices))
+            probabilities = scorer.predict_proba(input_data)
+            predictions = scorer.classes_.take(np.argmax(probabilities, axis=1))
+            positive_column = list(scorer.classes_).index(1)
+            
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for index, prediction, proba in zip(valid_indices, predictions, probabilities[:, positive_column]):
+                row = rows[index]
+                try:
+                    risk_factors = identify_risk_factors(row)
+                except Exception as e:
+                    results[index] = {'index': index, 'error': str(e)}
+                    continue
+                results[index] = {
+                    'index': index,
+                    'prediction': int(prediction),
+                    'probability': float(proba),
+                    'message': prediction_message(prediction),
+                    'risk_factors': risk_factors
+                }
+                history_records.append({
+                    'timestamp': timestamp,
+                    'input_data': row,
+                    'prediction': int(prediction),
+                    'probability': float(proba)
+                })
+        
+        # Record the whole batch in history in one transaction
+        if history_records:
+            try:
+                history_store.append(history_records)
+            except Exception as e:
+                print(f"Error saving prediction history: {e}")
+        
+        succeeded = len(history_records)
+        return jsonify({
+            'total': len(rows),
+            'succeeded': succeeded,
+            'failed': len(rows) - succeeded,
+            'results': results
+        })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -168,138 +661,191 @@ def predict():
 @app.route('/api/clear_history', methods=['POST'])
 def clear_history():
     try:
-        if os.path.exists('prediction_history.json'):
-            os.remove('prediction_history.json')
+        history_store.clear()
         return jsonify({'success': True, 'message': 'History cleared successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/history')
+def history_api():
+    """
+    Paginated prediction history, newest first
+
+    Pass the returned next_cursor as ?cursor= to fetch the following page.
+    """
+    try:
+        try:
+            filters = parse_history_filters()
+            cursor = request.args.get('cursor')
+            if cursor is not None:
+                # type=int would quietly turn a malformed cursor into the first page
+                if not cursor.isdigit():
+                    raise ValueError("'cursor' must be a non-negative integer")
+                cursor = int(cursor)
+            limit = request.args.get('limit', HISTORY_PAGE_SIZE, type=int)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+        
+        records, next_cursor = history_store.page(cursor=cursor, limit=limit, **filters)
+        return jsonify({'records': records, 'next_cursor': next_cursor})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/history/export')
+def export_history():
+    """
+    Stream the full (optionally filtered) history as JSON Lines, oldest first
+    """
+    try:
+        filters = parse_history_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def generate():
+        for record in history_store.iter_records(**filters):
+            yield json.dumps(record) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=prediction_history.jsonl'})
+
 @app.route('/api/generate_report/<int:history_id>')
 def generate_report(history_id):
     try:
-        if os.path.exists('prediction_history.json'):
-            with open('prediction_history.json', 'r') as f:
-                history = json.load(f)
-            
-            if history_id < len(history):
-                record = history[history_id]
-                # Generate PDF report (placeholder for now)
-                return jsonify({
-                    'success': True,
-                    'message': 'Report generated successfully',
-                    'record': record
-                })
-            else:
-                return jsonify({'error': 'Record not found'}), 404
-        else:
+        if history_store.count() == 0:
             return jsonify({'error': 'No history found'}), 404
+        
+        record = history_store.get(history_id)
+        if record is not None:
+            # Generate PDF report (placeholder for now)
+            return jsonify({
+                'success': True,
+                'message': 'Report generated successfully',
+                'record': record
+            })
+        else:
+            return jsonify({'error': 'Record not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/user_statistics')
 def user_statistics():
     try:
-        if os.path.exists('prediction_history.json'):
-            with open('prediction_history.json', 'r') as f:
-                history = json.load(f)
-            
-            # Calculate statistics from user predictions
-            total_predictions = len(history)
-            high_risk_count = sum(1 for record in history if record['prediction'] == 1)
-            low_risk_count = total_predictions - high_risk_count
-            
-            # Calculate average values for key metrics
-            avg_age = sum(record['input_data'].get('age', 0) for record in history) / total_predictions if total_predictions > 0 else 0
-            avg_systolic = sum(record['input_data'].get('sysBP', 0) for record in history) / total_predictions if total_predictions > 0 else 0
-            avg_diastolic = sum(record['input_data'].get('diaBP', 0) for record in history) / total_predictions if total_predictions > 0 else 0
-            avg_cholesterol = sum(record['input_data'].get('totChol', 0) for record in history) / total_predictions if total_predictions > 0 else 0
-            
-            # Count common risk factors
-            smokers = sum(1 for record in history if record['input_data'].get('is_smoking') == 1)
-            hypertension = sum(1 for record in history if record['input_data'].get('prevalentHyp') == 1)
-            diabetes = sum(1 for record in history if record['input_data'].get('diabetes') == 1)
-            
-            return jsonify({
-                'total_predictions': total_predictions,
-                'high_risk_count': high_risk_count,
-                'low_risk_count': low_risk_count,
-                'high_risk_percentage': (high_risk_count / total_predictions * 100) if total_predictions > 0 else 0,
-                'avg_age': avg_age,
-                'avg_systolic': avg_systolic,
-                'avg_diastolic': avg_diastolic,
-                'avg_cholesterol': avg_cholesterol,
-                'smokers_count': smokers,
-                'smokers_percentage': (smokers / total_predictions * 100) if total_predictions > 0 else 0,
-                'hypertension_count': hypertension,
-                'hypertension_percentage': (hypertension / total_predictions * 100) if total_predictions > 0 else 0,
-                'diabetes_count': diabetes,
-                'diabetes_percentage': (diabetes / total_predictions * 100) if total_predictions > 0 else 0
-            })
-        else:
-            return jsonify({
-                'total_predictions': 0,
-                'high_risk_count': 0,
-                'low_risk_count': 0,
-                'high_risk_percentage': 0,
-                'avg_age': 0,
-                'avg_systolic': 0,
-                'avg_diastolic': 0,
-                'avg_cholesterol': 0,
-                'smokers_count': 0,
-                'smokers_percentage': 0,
-                'hypertension_count': 0,
-                'hypertension_percentage': 0,
-                'diabetes_count': 0,
-                'diabetes_percentage': 0
-            })
+        # Running totals maintained by the history store on every append
+        totals = history_store.aggregates()
+        
+        # Calculate statistics from user predictions
+        total_predictions = totals['total']
+        high_risk_count = totals['high_risk']
+        low_risk_count = total_predictions - high_risk_count
+        
+        # Calculate average values for key metrics
+        avg_age = totals['sum_age'] / total_predictions if total_predictions > 0 else 0
+        avg_systolic = totals['sum_sysBP'] / total_predictions if total_predictions > 0 else 0
+        avg_diastolic = totals['sum_diaBP'] / total_predictions if total_predictions > 0 else 0
+        avg_cholesterol = totals['sum_totChol'] / total_predictions if total_predictions > 0 else 0
+        
+        # Count common risk factors
+        smokers = totals['smokers']
+        hypertension = totals['hypertension']
+        diabetes = totals['diabetes']
+        
+        return jsonify({
+            'total_predictions': total_predictions,
+            'high_risk_count': high_risk_count,
+            'low_risk_count': low_risk_count,
+            'high_risk_percentage': (high_risk_count / total_predictions * 100) if total_predictions > 0 else 0,
+            'avg_age': avg_age,
+            'avg_systolic': avg_systolic,
+            'avg_diastolic': avg_diastolic,
+            'avg_cholesterol': avg_cholesterol,
+            'smokers_count': smokers,
+            'smokers_percentage': (smokers / total_predictions * 100) if total_predictions > 0 else 0,
+            'hypertension_count': hypertension,
+            'hypertension_percentage': (hypertension / total_predictions * 100) if total_predictions > 0 else 0,
+            'diabetes_count': diabetes,
+            'diabetes_percentage': (diabetes / total_predictions * 100) if total_predictions > 0 else 0
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/compare_to_population')
 def compare_to_population():
     try:
-        if os.path.exists('prediction_history.json'):
-            with open('prediction_history.json', 'r') as f:
-                history = json.load(f)
-            
-            if not history:
-                return jsonify({'error': 'No history found'}), 404
-            
-            # Get the most recent prediction
-            latest = history[-1]
-            
-            # Compare with population statistics
-            comparison = {
-                'age': {
-                    'user': latest['input_data'].get('age', 0),
-                    'population_avg': dataset_stats.get('avg_age', 0),
-                    'difference': latest['input_data'].get('age', 0) - dataset_stats.get('avg_age', 0)
-                },
-                'systolic_bp': {
-                    'user': latest['input_data'].get('sysBP', 0),
-                    'population_avg': dataset_stats.get('avg_systolic_bp', 0),
-                    'difference': latest['input_data'].get('sysBP', 0) - dataset_stats.get('avg_systolic_bp', 0)
-                },
-                'diastolic_bp': {
-                    'user': latest['input_data'].get('diaBP', 0),
-                    'population_avg': dataset_stats.get('avg_diastolic_bp', 0),
-                    'difference': latest['input_data'].get('diaBP', 0) - dataset_stats.get('avg_diastolic_bp', 0)
-                },
-                'cholesterol': {
-                    'user': latest['input_data'].get('totChol', 0),
-                    'population_avg': dataset_stats.get('avg_cholesterol', 0),
-                    'difference': latest['input_data'].get('totChol', 0) - dataset_stats.get('avg_cholesterol', 0)
-                },
-                'smoking': {
-                    'user': latest['input_data'].get('is_smoking', 0),
-                    'population_percentage': dataset_stats.get('smokers_percentage', 0) / 100,
-                    'difference': latest['input_data'].get('is_smoking', 0) - dataset_stats.get('smokers_percentage', 0) / 100
-                }
-            }
-            
-            return jsonify(comparison)
-        else:
+        # Get the most recent prediction
+        latest = history_store.latest()
+        if latest is None:
             return jsonify({'error': 'No history found'}), 404
+        
+        # Compare with population statistics
+        comparison = {
+            'age': {
+                'user': latest['input_data'].get('age', 0),
+                'population_avg': dataset_stats.get('avg_age', 0),
+                'difference': latest['input_data'].get('age', 0) - dataset_stats.get('avg_age', 0)
+            },
+            'systolic_bp': {
+                'user': latest['input_data'].get('sysBP', 0),
+                'population_avg': dataset_stats.get('avg_systolic_bp', 0),
+                'difference': latest['input_data'].get('sysBP', 0) - dataset_stats.get('avg_systolic_bp', 0)
+            },
+            'diastolic_bp': {
+                'user': latest['input_data'].get('diaBP', 0),
+                'population_avg': dataset_stats.get('avg_diastolic_bp', 0),
+                'difference': latest['input_data'].get('diaBP', 0) - dataset_stats.get('avg_diastolic_bp', 0)
+            },
+            'cholesterol': {
+                'user': latest['input_data'].get('totChol', 0),
+                'population_avg': dataset_stats.get('avg_cholesterol', 0),
+                'difference': latest['input_data'].get('totChol', 0) - dataset_stats.get('avg_cholesterol', 0)
+            },
+            'smoking': {
+                'user': latest['input_data'].get('is_smoking', 0),
+                'population_percentage': dataset_stats.get('smokers_percentage', 0) / 100,
+                'difference': latest['input_data'].get('is_smoking', 0) - dataset_stats.get('smokers_percentage', 0) / 100
+            }
+        }
+        if population_index is not None:
+            # Percentile of every numerical feature, overall and within the patient's sex and age band
+            comparison['percentiles'] = population_index.compare(latest['input_data'])
+        if population_stats is not None:
+            comparison['population'] = {
+                'dataset_version': population_stats['dataset_version'],
+                'model_version': population_stats['model_version'],
+                'created_at': population_stats['created_at']
+            }
+        
+        return jsonify(comparison)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cohorts')
+def cohorts():
+    """
+    Heart disease rate, counts and feature means by cohort, from the precomputed cube
+
+    Query parameters:
+        group_by: Comma-separated dimensions to break the result down by
+            (age_band, sex, is_smoking, prevalentHyp, diabetes); the rest are rolled up
+        <dimension>: Comma-separated values to keep, e.g. ?sex=1&age_band=50-59,60%2B
+    """
+    if cohort_cube is None:
+        return jsonify({'error': 'Cohort data not available'}), 503
+    
+    try:
+        try:
+            group_by = [d for d in request.args.get('group_by', '').split(',') if d]
+            filters = CohortCube.parse_filters({d: request.args[d].split(',') for d in COHORT_DIMENSIONS if d in request.args})
+            groups = cohort_cube.query(filters, group_by)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'version': cohort_cube.version,
+            'dimensions': COHORT_DIMENSIONS,
+            'group_by': [d for d in COHORT_DIMENSIONS if d in group_by],
+            'filters': filters,
+            'groups': groups
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -308,31 +854,89 @@ def favicon():
     return send_from_directory(os.path.join(app.root_path, 'static', 'images'),
                                'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
-@app.route('/generate_visualizations')
+@app.route('/generate_visualizations', methods=['POST'])
+@app.route('/api/visualizations/jobs', methods=['POST'])
 def generate_visualizations():
     """
-    Endpoint to regenerate visualizations on demand
+    Start regenerating the visualizations in a background job
+
+    Returns 202 with the job id straight away; poll /api/jobs/<job_id> for
+    progress. If a regeneration is already queued or running, its job is
+    returned instead of starting another.
     """
     try:
-        from model import create_visualizations
-        
-        # Load dataset
-        df = pd.read_csv('train_updated.csv')
-        
-        # Create dummy test data for visualization functions
-        X_test = df.drop('TenYearCHD', axis=1).sample(100, random_state=42)
-        y_test = df.loc[X_test.index, 'TenYearCHD']
-        
-        # Generate dummy prediction probabilities
-        if model is not None:
-            y_pred_proba = model.predict_proba(X_test)[:, 1]
-        else:
-            y_pred_proba = np.random.random(len(y_test))
-        
-        # Create visualizations
-        create_visualizations(df, X_test, y_test, y_pred_proba)
-        
-        return jsonify({'success': True, 'message': 'Visualizations generated successfully'})
+        job, created = start_job(job_store, 'visualizations')
+        response = jsonify({
+            'success': True,
+            'job_id': job['job_id'],
+            'state': job['state'],
+            'deduplicated': not created,
+            'status_url': url_for('job_status', job_id=job['job_id'])
+        })
+        response.headers['Location'] = url_for('job_status', job_id=job['job_id'])
+        return response, 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/generate_visualizations', methods=['GET'])
+@app.route('/api/visualizations/jobs', methods=['GET'])
+def latest_visualizations_job():
+    """
+    State of the most recent visualization job
+
+    Regenerating is state-changing work, so it only starts on POST; a GET
+    (a visited link, a prefetch or a reload) just reports on the last job.
+    """
+    try:
+        job = job_store.latest('visualizations')
+        return jsonify({
+            'job': job,
+            'status_url': url_for('job_status', job_id=job['job_id']) if job is not None else None,
+            'message': 'POST to this URL to regenerate the visualizations'
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """
+    State of a background job, with its result once it has finished
+    """
+    try:
+        job = job_store.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/charts')
+def list_charts():
+    """
+    Names of the charts available from /api/charts/<name>
+    """
+    return jsonify({'charts': CHART_NAMES})
+
+@app.route('/api/charts/<name>')
+def chart(name):
+    """
+    Pre-aggregated data for one chart, for rendering in the browser
+
+    The ETag is the dataset (and model) version, so clients revalidate with
+    If-None-Match and get a 304 until the data changes.
+    """
+    if name not in CHART_NAMES:
+        return jsonify({'error': f"Unknown chart '{name}'", 'charts': CHART_NAMES}), 404
+    if name in MODEL_CHARTS and model is None:
+        return model_unavailable()
+    
+    try:
+        version, payload = chart_data.get(name, model=model, model_version=model_version)
+        response = jsonify({'chart': name, 'version': version, 'data': payload})
+        response.set_etag(version)
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['SEND_FILE_MAX_AGE_DEFAULT']
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -347,15 +951,12 @@ def about():
 @app.route('/history')
 def history():
     try:
-        if os.path.exists('prediction_history.json'):
-            with open('prediction_history.json', 'r') as f:
-                history = json.load(f)
-            return render_template('history.html', history=history)
-        else:
-            return render_template('history.html', history=[])
+        # Only the newest page is rendered; the page fetches older ones from /api/history
+        records, next_cursor = history_store.page(limit=HISTORY_PAGE_SIZE)
+        return render_template('history.html', history=records, next_cursor=next_cursor)
     except Exception as e:
         print(f"Error loading history: {e}")
-        return render_template('history.html', history=[])
+        return render_template('history.html', history=[], next_cursor=None)
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
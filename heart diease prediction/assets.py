@@ -0,0 +1,179 @@
+"""
+Static asset pipeline
+
+Copies the stylesheets, scripts and chart images under static/ to
+static/dist/ with a content hash in the file name (styles.css becomes
+styles.1a2b3c4d5e6f.css), writes gzip (and, if the brotli package is
+installed, brotli) variants of the text assets next to them, and records
+the mapping in static/dist/manifest.json. Templates reference assets
+through asset_url(), so a changed file gets a new URL and the hashed files
+can be cached by browsers forever.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = 'static'
+DIST_DIRNAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# File types the pipeline fingerprints
+ASSET_EXTENSIONS = {'.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp'}
+
+# Text formats worth precompressing; images are already compressed
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json'}
+
+# Compressed variants smaller than this fraction of the original are not worth keeping
+MIN_COMPRESSION_RATIO = 0.9
+
+HASH_LENGTH = 12
+
+def _hashed_name(relative_path, digest):
+    root, extension = os.path.splitext(relative_path)
+    return f'{root}.{digest[:HASH_LENGTH]}{extension}'
+
+def _write_atomic(path, data):
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.asset-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+def _source_files(static_dir):
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    for directory, subdirectories, filenames in os.walk(static_dir):
+        if os.path.abspath(directory) == os.path.abspath(dist_dir):
+            subdirectories[:] = []
+            continue
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() in ASSET_EXTENSIONS:
+                path = os.path.join(directory, filename)
+                yield os.path.relpath(path, static_dir).replace(os.sep, '/'), path
+
+def build_assets(static_dir=STATIC_DIR):
+    """
+    Write hashed and precompressed copies of the static assets and their manifest
+
+    Only files that are not already in static/dist are written, so running
+    this repeatedly is cheap. Hashed files from the previous manifest are
+    kept (pages rendered just before a rebuild may still reference them);
+    older ones are removed.
+
+    Args:
+        static_dir: The Flask static folder
+
+    Returns:
+        manifest: Dictionary of source path -> hashed path, relative to static/dist
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest_path = os.path.join(dist_dir, MANIFEST_NAME)
+    previous = load_manifest(static_dir)
+
+    manifest = {}
+    for relative_path, path in _source_files(static_dir):
+        with open(path, 'rb') as f:
+            content = f.read()
+        hashed = _hashed_name(relative_path, hashlib.sha256(content).hexdigest())
+        manifest[relative_path] = hashed
+
+        target = os.path.join(dist_dir, hashed)
+        if os.path.exists(target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.splitext(relative_path)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', brotli.compress(content)))
+            for suffix, compressed in variants:
+                if len(compressed) < len(content) * MIN_COMPRESSION_RATIO:
+                    _write_atomic(target + suffix, compressed)
+        # The uncompressed file goes last: its presence marks the asset as complete
+        _write_atomic(target, content)
+
+    if manifest != previous:
+        _write_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode())
+        _prune(dist_dir, set(manifest.values()) | set(previous.values()))
+    return manifest
+
+def _prune(dist_dir, keep):
+    for directory, _, filenames in os.walk(dist_dir):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            relative_path = os.path.relpath(path, dist_dir).replace(os.sep, '/')
+            base = relative_path
+            for suffix in ('.gz', '.br'):
+                if base.endswith(suffix):
+                    base = base[:-len(suffix)]
+            if relative_path != MANIFEST_NAME and base not in keep:
+                os.remove(path)
+
+def load_manifest(static_dir=STATIC_DIR):
+    """
+    The current manifest, or an empty one if the pipeline has not run yet
+    """
+    try:
+        with open(os.path.join(static_dir, DIST_DIRNAME, MANIFEST_NAME), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def clean_assets(static_dir=STATIC_DIR):
+    """
+    Remove static/dist entirely
+    """
+    shutil.rmtree(os.path.join(static_dir, DIST_DIRNAME), ignore_errors=True)
+
+class AssetManifest:
+    """
+    Resolves asset paths to their hashed URLs, re-reading the manifest when it changes
+
+    Charts are re-rendered by background jobs in other processes, so every
+    worker checks the manifest's modification time before resolving.
+    """
+
+    def __init__(self, static_dir=STATIC_DIR, url_prefix='/static'):
+        """
+        Args:
+            static_dir: The Flask static folder
+            url_prefix: URL path the static folder is served under
+        """
+        self.static_dir = static_dir
+        self.url_prefix = url_prefix
+        self.path = os.path.join(static_dir, DIST_DIRNAME, MANIFEST_NAME)
+        self._mtime = None
+        self._entries = {}
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self._entries = load_manifest(self.static_dir) if mtime is not None else {}
+            self._mtime = mtime
+
+    def url(self, relative_path):
+        """
+        URL of an asset: the hashed copy if the pipeline has one, else the plain static file
+
+        Args:
+            relative_path: Path under static/, e.g. 'css/styles.css'
+        """
+        self._refresh()
+        hashed = self._entries.get(relative_path)
+        if hashed is None:
+            return f'{self.url_prefix}/{relative_path}'
+        return f'{self.url_prefix}/{DIST_DIRNAME}/{hashed}'
+
+if __name__ == '__main__':
+    built = build_assets()
+    print(f"Built {len(built)} assets into {os.path.join(STATIC_DIR, DIST_DIRNAME)}")
@@ -0,0 +1,163 @@
+"""
+Micro-batching scheduler for single-record predictions
+
+Concurrent /predict requests are queued and scored together: a scheduler
+thread collects the requests that arrive within a short window (or until
+the batch is full), runs one batched model call and hands each caller its
+own result. Scoring 64 rows at once costs far less than 64 separate
+one-row forest evaluations.
+
+Once the first request of a batch arrives, everything already queued is
+taken at once and the scheduler waits up to max_wait for more, stopping
+early when the batch is full. Each request therefore waits at most one
+window before it is scored.
+"""
+
+import os
+import queue
+import threading
+import time
+
+class QueueFull(Exception):
+    """
+    Raised when the scheduler's queue is full and the request is rejected
+    """
+
+class BatchTimeout(Exception):
+    """
+    Raised when a request is not scored within its timeout
+    """
+
+class _Pending:
+    """
+    A queued record waiting for its result
+    """
+
+    __slots__ = ('record', 'done', 'result', 'error', 'cancelled')
+
+    def __init__(self, record):
+        self.record = record
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+
+class MicroBatcher:
+    """
+    Collects concurrent single-record predictions into batched model calls
+    """
+
+    def __init__(self, predict_many, max_batch_size=64, max_wait=0.002, max_queue=1024):
+        """
+        Args:
+            predict_many: Function taking a list of records and returning one result per record
+            max_batch_size: Most records scored in one call
+            max_wait: Seconds to wait for more requests after the first one arrives
+            max_queue: Most requests waiting at once before new ones are rejected with QueueFull
+        """
+        self.predict_many = predict_many
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.stats = {'batches': 0, 'records': 0, 'rejected': 0, 'timeouts': 0}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        """
+        Start the scheduler thread on first use in this process
+
+        Threads do not survive a fork, so each worker process starts its own.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self.max_queue)
+                threading.Thread(target=self._run, name='micro-batcher', daemon=True).start()
+                self._pid = os.getpid()
+
+    def submit(self, record, timeout=1.0):
+        """
+        Queue one record and wait for its result
+
+        Args:
+            record: Input feature dictionary
+            timeout: Seconds to wait for the result
+
+        Returns:
+            result: The entry predict_many returned for this record
+
+        Raises:
+            QueueFull: If too many requests are already waiting
+            BatchTimeout: If the record was not scored in time
+        """
+        self._ensure_started()
+        pending = _Pending(record)
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            self._count('rejected')
+            raise QueueFull('Prediction queue is full')
+
+        if not pending.done.wait(timeout):
+            # Skipped by the scheduler if it has not been picked up yet
+            pending.cancelled = True
+            self._count('timeouts')
+            raise BatchTimeout(f'Prediction not ready within {timeout:.3f}s')
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _collect(self):
+        """
+        Block for the next request, then collect more until the window after
+        its arrival closes or the batch is full
+        """
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [pending for pending in self._collect() if not pending.cancelled]
+            if batch:
+                self._score(batch)
+
+    def _score(self, batch):
+        try:
+            results = self.predict_many([pending.record for pending in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # One bad record should not fail everyone else's request
+                for pending in batch:
+                    self._score([pending])
+            else:
+                batch[0].error = e
+                batch[0].done.set()
+            return
+
+        for pending, result in zip(batch, results):
+            pending.result = result
+            pending.done.set()
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['records'] += len(batch)
@@ -0,0 +1,111 @@
+"""
+Static asset delivery benchmark
+
+Simulates a browser loading the dashboard and visualizations pages with
+a cold cache, reloading them a minute later and again a day later. The
+simulated browser honours Cache-Control max-age/immutable, revalidates
+with If-None-Match and accepts gzip/br. Runs once with the original
+delivery (plain /static URLs, Flask's default no-cache headers) and once
+with the asset pipeline, and reports requests, bytes transferred, server
+time and a modelled page-load time over a slow link. Charts that have not been
+rendered yet (and the missing favicon) show up as 404s in both modes.
+
+Run from the project directory:
+    python benchmarks/bench_assets.py [rtt_ms] [mbit_per_s]
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+PROBE = r"""
+import json, re, time
+import app as app_module
+
+if not app_module.ASSET_PIPELINE:
+    # Flask's defaults before the pipeline: no max-age, so browsers revalidate every asset
+    app_module.app.config['SEND_FILE_MAX_AGE_DEFAULT'] = None
+
+client = app_module.app.test_client()
+cache = {}
+clock = [0.0]
+
+def fetch(url):
+    entry = cache.get(url)
+    if entry and entry['fresh_until'] > clock[0]:
+        return None
+    headers = {'Accept-Encoding': 'gzip, br'}
+    if entry and entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+    start = time.perf_counter()
+    response = client.get(url, headers=headers)
+    body = response.get_data()
+    elapsed = time.perf_counter() - start
+
+    control = response.headers.get('Cache-Control', '')
+    match = re.search(r'max-age=(\d+)', control)
+    max_age = int(match.group(1)) if match and 'no-cache' not in control else 0
+    if response.status_code == 200:
+        cache[url] = {'etag': response.headers.get('ETag'), 'fresh_until': clock[0] + max_age}
+    elif response.status_code == 304:
+        entry['fresh_until'] = clock[0] + max_age
+    header_bytes = sum(len(k) + len(v) + 4 for k, v in response.headers.items())
+    return {'status': response.status_code, 'bytes': len(body) + header_bytes, 'seconds': elapsed, 'body': body}
+
+def visit(page):
+    # Pages are sent without a cache lifetime, so the HTML is always fetched
+    results = [fetch(page)]
+    html = results[0]['body'].decode()
+    for url in dict.fromkeys(re.findall(r'(?:src|href)="(/static/[^"]+)"', html)):
+        results.append(fetch(url))
+    made = [r for r in results if r is not None]
+    return {
+        'requests': len(made),
+        'bytes': sum(r['bytes'] for r in made),
+        'not_modified': sum(1 for r in made if r['status'] == 304),
+        'missing': sum(1 for r in made if r['status'] == 404),
+        'server_seconds': sum(r['seconds'] for r in made),
+        'asset_requests': len(made) - 1,
+        'html_bytes': made[0]['bytes']
+    }
+
+output = {}
+for label, offset in (('cold', 0), ('reload +1min', 60), ('revisit +1day', 86400)):
+    clock[0] = offset
+    for page in ('/dashboard', '/visualizations'):
+        output[f'{page} {label}'] = visit(page)
+print(json.dumps(output))
+"""
+
+def run_probe(pipeline, directory):
+    env = dict(os.environ, ASSET_PIPELINE='1' if pipeline else '0', MODEL_BACKGROUND_LOADING='1')
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=directory, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def modelled_load_ms(result, rtt_ms, mbit_per_s, connections=6):
+    """
+    HTML round trip, then the assets over `connections` parallel connections, plus transfer time
+    """
+    if result['requests'] == 0:
+        return 0.0
+    asset_rounds = -(-result['asset_requests'] // connections)
+    transfer_ms = result['bytes'] * 8 / (mbit_per_s * 1e6) * 1000
+    return (1 + asset_rounds) * rtt_ms + transfer_ms
+
+def main(rtt_ms=50, mbit_per_s=5):
+    directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = {'before': run_probe(False, directory), 'after': run_probe(True, directory)}
+
+    print(f"modelled link: {rtt_ms} ms RTT, {mbit_per_s} Mbit/s, 6 connections")
+    print(f"{'page / visit':<34}{'mode':<8}{'requests':>9}{'304s':>6}{'404s':>6}{'KB':>9}{'server ms':>11}{'load ms':>9}")
+    for key in results['before']:
+        for mode in ('before', 'after'):
+            r = results[mode][key]
+            print(f"{key:<34}{mode:<8}{r['requests']:>9}{r['not_modified']:>6}{r['missing']:>6}{r['bytes'] / 1024:>9.1f}"
+                  f"{r['server_seconds'] * 1000:>11.1f}{modelled_load_ms(r, rtt_ms, mbit_per_s):>9.0f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(*[float(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,93 @@
+"""
+Micro-batching benchmark
+
+Drives the compiled model with 1 to 64 concurrent closed-loop clients,
+once calling predict_one directly from each client thread and once through
+the MicroBatcher at a few window sizes, and prints the throughput-vs-latency
+curve for each. Results are checked against the direct path first.
+
+Run from the project directory after the model has been trained:
+    python benchmarks/bench_batching.py [concurrency ...]
+"""
+
+import os
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batching import MicroBatcher
+from inference import compile_pipeline
+
+DURATION = 2.0
+WINDOWS_MS = [0.5, 2, 5]
+
+def load_records(n=1000):
+    df = pd.read_csv('train_updated.csv').drop(columns=['TenYearCHD'], errors='ignore').head(n)
+    return df.astype(object).where(pd.notna(df), None).to_dict('records')
+
+def run_clients(score, records, concurrency):
+    """
+    Each client scores records back to back for DURATION seconds
+
+    Returns:
+        throughput, p50_ms, p99_ms
+    """
+    latencies = [[] for _ in range(concurrency)]
+    stop = time.perf_counter() + DURATION
+
+    def client(index):
+        i = index
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            score(records[i % len(records)])
+            latencies[index].append(time.perf_counter() - start)
+            i += concurrency
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    merged = np.concatenate([np.array(l) for l in latencies])
+    return len(merged) / elapsed, np.percentile(merged, 50) * 1000, np.percentile(merged, 99) * 1000
+
+def main(*concurrency_levels):
+    concurrency_levels = concurrency_levels or (1, 4, 16, 64)
+    fast_model = compile_pipeline(joblib.load('heart_disease_model.pkl'))
+    records = load_records()
+
+    # Parity: batched results must equal one-at-a-time scoring
+    direct = [fast_model.predict_one(record) for record in records]
+    batched = []
+    for start in range(0, len(records), 64):
+        batched.extend(fast_model.predict_many(records[start:start + 64]))
+    mismatches = sum(1 for a, b in zip(direct, batched) if a[0] != b[0] or a[1] != b[1])
+    print(f"parity: {len(records) - mismatches}/{len(records)} identical")
+
+    modes = [('direct', fast_model.predict_one, None)]
+    for window in WINDOWS_MS:
+        batcher = MicroBatcher(fast_model.predict_many, max_batch_size=64, max_wait=window / 1000)
+        modes.append((f'batched {window:g}ms', batcher.submit, batcher))
+
+    print(f"{'mode':<16}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'rows/batch':>12}")
+    for name, score, batcher in modes:
+        for concurrency in concurrency_levels:
+            before = dict(batcher.stats) if batcher else None
+            throughput, p50, p99 = run_clients(score, records, concurrency)
+            rows_per_batch = ''
+            if batcher:
+                batches = batcher.stats['batches'] - before['batches']
+                rows_per_batch = f"{(batcher.stats['records'] - before['records']) / max(batches, 1):.1f}"
+            print(f"{name:<16}{concurrency:>8}{throughput:>10.0f}{p50:>10.2f}{p99:>10.2f}{rows_per_batch:>12}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
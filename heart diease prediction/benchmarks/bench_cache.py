@@ -0,0 +1,70 @@
+"""
+Prediction cache benchmark
+
+Measures the cost of a cache lookup against scoring a record, then
+replays a workload in which every patient is submitted several times
+through /predict and reports the hit ratio and p50/p99 latency of cache
+hits and misses. Uses a temporary history database and shared cache file.
+
+Run from the project directory after the model has been trained:
+    python benchmarks/bench_cache.py [n_patients] [repeats]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def timed(fn, repeats=2000):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+def main(n_patients=500, repeats=4):
+    tmp = tempfile.mkdtemp()
+    os.environ['HISTORY_DB'] = os.path.join(tmp, 'history.db')
+    os.environ['PREDICTION_CACHE_DB'] = os.path.join(tmp, 'cache.db')
+    import app as app_module
+    app_module.wait_for_model()
+
+    df = pd.read_csv('train_updated.csv').drop(columns=['TenYearCHD'], errors='ignore').dropna().head(n_patients)
+    records = df.astype(object).to_dict('records')
+    cache = app_module.prediction_cache
+
+    record = records[0]
+    key = cache.key(record)
+    cache.put(key, {'prediction': 0, 'probability': 0.0, 'risk_factors': []})
+    print(f"score record (compiled model + risk rules): "
+          f"{timed(lambda: (app_module.fast_model.predict_one(record), app_module.identify_risk_factors(record))):.3f} ms")
+    print(f"cache key + local lookup:                   {timed(lambda: cache.get(cache.key(record))):.3f} ms")
+    print(f"shared cache lookup:                        {timed(lambda: cache.shared.get(key)):.3f} ms")
+    cache.clear()
+
+    # Every patient is submitted `repeats` times in random order
+    workload = records * repeats
+    random.Random(0).shuffle(workload)
+    client = app_module.app.test_client()
+    hit_latencies, miss_latencies = [], []
+    for data in workload:
+        hits_before = cache.counters['hits'] + cache.counters['shared_hits']
+        start = time.perf_counter()
+        client.post('/predict', json=data)
+        elapsed = (time.perf_counter() - start) * 1000
+        hit = cache.counters['hits'] + cache.counters['shared_hits'] > hits_before
+        (hit_latencies if hit else miss_latencies).append(elapsed)
+
+    print(f"\n{len(workload)} requests for {len(records)} patients, hit ratio {len(hit_latencies) / len(workload):.2f}")
+    print(f"{'':<8}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, latencies in (('miss', miss_latencies), ('hit', hit_latencies)):
+        print(f"{name:<8}{len(latencies):>8}{np.percentile(latencies, 50):>10.3f}{np.percentile(latencies, 99):>10.3f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
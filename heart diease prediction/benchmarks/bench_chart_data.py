@@ -0,0 +1,105 @@
+"""
+Chart data benchmark
+
+Compares the JSON chart-data endpoints with rendering the same charts as
+300-dpi PNGs: time to compute each payload cold and to serve it from the
+cache, the response size (raw and gzipped), and the PNG render time and
+file size. PNGs are written to a temporary directory.
+
+Run from the project directory after the model has been trained:
+    python benchmarks/bench_chart_data.py [repeats]
+"""
+
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# JSON chart -> the PNG that draws the same data
+PNG_EQUIVALENTS = {
+    'age_histogram': 'age_distribution.png',
+    'bmi_histogram': 'bmi_distribution.png',
+    'smoking_crosstab': 'smoking_status.png',
+    'diabetes_crosstab': 'diabetes_heart_disease.png',
+    'correlation': 'correlation_heatmap.png',
+    'blood_pressure': 'blood_pressure.png',
+    'roc': 'roc_curve.png',
+    'precision_recall': 'precision_recall_curve.png'
+}
+
+def render_pngs(model, output_dir):
+    import numpy as np
+    from sklearn.metrics import roc_curve, auc, precision_recall_curve
+    import charts
+    from model import load_and_preprocess_data
+
+    X_train, X_test, y_train, y_test, df = load_and_preprocess_data()
+    y_pred_proba = model.predict_proba(X_test)[:, 1]
+    fpr, tpr, _ = roc_curve(y_test, y_pred_proba)
+    precision, recall, _ = precision_recall_curve(y_test, y_pred_proba)
+    tasks = [
+        ('age_distribution.png', charts.age_distribution, {'df': df[['age', 'TenYearCHD']]}),
+        ('bmi_distribution.png', charts.bmi_distribution, {'df': df[['BMI', 'TenYearCHD']]}),
+        ('smoking_status.png', charts.smoking_status, {'df': df[['is_smoking', 'TenYearCHD']]}),
+        ('diabetes_heart_disease.png', charts.diabetes_heart_disease, {'df': df[['diabetes', 'TenYearCHD']]}),
+        ('correlation_heatmap.png', charts.correlation_heatmap, {'df': df.select_dtypes(include=[np.number])}),
+        ('blood_pressure.png', charts.blood_pressure, {'df': df[['sysBP', 'diaBP', 'TenYearCHD']]}),
+        ('roc_curve.png', charts.roc_curve, {'fpr': fpr, 'tpr': tpr, 'roc_auc': float(auc(fpr, tpr))}),
+        ('precision_recall_curve.png', charts.precision_recall_curve, {'precision': precision, 'recall': recall}),
+    ]
+    # Import matplotlib first so its one-off import is not charged to the first chart
+    charts._plotting()
+    report = charts.render_charts(tasks, output_dir=output_dir, workers=1, force=True)
+    return {entry['chart']: entry for entry in report}
+
+def main(repeats=200):
+    import app as app_module
+    from chart_data import ChartData, CHART_NAMES
+    app_module.wait_for_model()
+    client = app_module.app.test_client()
+
+    # A fresh cache, so the first request for each chart computes it
+    app_module.chart_data = ChartData('train_updated.csv')
+    results = {}
+    for name in CHART_NAMES:
+        start = time.perf_counter()
+        response = client.get(f'/api/charts/{name}')
+        cold = time.perf_counter() - start
+        body = response.get_data()
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            client.get(f'/api/charts/{name}')
+        warm = (time.perf_counter() - start) / repeats
+
+        etag = response.headers['ETag']
+        start = time.perf_counter()
+        for _ in range(repeats):
+            client.get(f'/api/charts/{name}', headers={'If-None-Match': etag})
+        revalidate = (time.perf_counter() - start) / repeats
+        results[name] = {'cold': cold, 'warm': warm, 'revalidate': revalidate,
+                         'bytes': len(body), 'gzip_bytes': len(gzip.compress(body))}
+
+    output_dir = tempfile.mkdtemp()
+    pngs = render_pngs(app_module.model, output_dir)
+
+    print(f"{'chart':<20}{'cold ms':>9}{'warm ms':>9}{'304 ms':>8}{'JSON KB':>9}{'gzip KB':>9}"
+          f"{'PNG s':>8}{'PNG KB':>9}")
+    totals = [0.0] * 7
+    for name in CHART_NAMES:
+        r = results[name]
+        png = pngs[PNG_EQUIVALENTS[name]]
+        png_kb = os.path.getsize(os.path.join(output_dir, PNG_EQUIVALENTS[name])) / 1024 if png['status'] == 'rendered' else 0.0
+        row = [r['cold'] * 1000, r['warm'] * 1000, r['revalidate'] * 1000,
+               r['bytes'] / 1024, r['gzip_bytes'] / 1024, png['seconds'], png_kb]
+        totals = [total + value for total, value in zip(totals, row)]
+        print(f"{name:<20}{row[0]:>9.1f}{row[1]:>9.2f}{row[2]:>8.2f}{row[3]:>9.1f}{row[4]:>9.1f}{row[5]:>8.2f}{row[6]:>9.1f}")
+    print(f"{'total':<20}{totals[0]:>9.1f}{totals[1]:>9.2f}{totals[2]:>8.2f}{totals[3]:>9.1f}{totals[4]:>9.1f}"
+          f"{totals[5]:>8.2f}{totals[6]:>9.1f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,78 @@
+"""
+Cohort cube benchmark
+
+Times a few /api/cohorts style queries against the precomputed cohort
+cube and the same breakdowns computed with a pandas groupby over the
+dataset, after checking that both give the same counts, rates and means.
+
+Run from the project directory:
+    python benchmarks/bench_cohorts.py [repeats]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cohorts import CohortCube, DIMENSIONS, AGE_BAND_LABELS
+from dataset import load_dataset, NUMERICAL_FEATURES
+from population import AGE_BAND_EDGES
+
+QUERIES = [
+    ('overall', {}, []),
+    ('by sex', {}, ['sex']),
+    ('men 50-59 by smoking x diabetes', {'sex': [1], 'age_band': ['50-59']}, ['is_smoking', 'diabetes']),
+    ('all 64 cells', {}, DIMENSIONS),
+]
+
+def pandas_query(df, filters, group_by):
+    subset = df
+    for dimension, values in filters.items():
+        subset = subset[subset[dimension].isin(values)]
+    aggregations = {'count': ('TenYearCHD', 'size'), 'chd_rate': ('TenYearCHD', 'mean')}
+    aggregations.update({feature: (feature, 'mean') for feature in NUMERICAL_FEATURES})
+    if not group_by:
+        return subset.assign(_all=0).groupby('_all').agg(**aggregations)
+    return subset.groupby(list(group_by), observed=True).agg(**aggregations)
+
+def timed(fn, repeats):
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+        best = min(best, (time.perf_counter() - start) / repeats)
+    return best * 1e6
+
+def main(repeats=500):
+    start = time.perf_counter()
+    cube = CohortCube.from_dataset()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    df = load_dataset(exact=True)
+    bands = np.searchsorted(AGE_BAND_EDGES, df['age'], side='right')
+    df['age_band'] = pd.Categorical.from_codes(bands, AGE_BAND_LABELS)
+
+    print(f"cube built in {build_ms:.1f} ms ({cube.measures.nbytes / 1024:.1f} KB)")
+    print(f"{'query':<34}{'groups':>7}{'cube us':>10}{'pandas us':>11}")
+    for name, filters, group_by in QUERIES:
+        groups = cube.query(filters, group_by)
+        expected = pandas_query(df, filters, group_by)
+        nonempty = [group for group in groups if group['count']]
+        assert len(nonempty) == len(expected)
+        for group in nonempty:
+            row = expected.loc[tuple(group[d] for d in group_by)] if group_by else expected.iloc[0]
+            assert group['count'] == row['count'] and np.isclose(group['chd_rate'], row['chd_rate'])
+            assert np.allclose([group['means'][f] for f in NUMERICAL_FEATURES], row[NUMERICAL_FEATURES], equal_nan=True)
+
+        cube_us = timed(lambda: cube.query(filters, group_by), repeats)
+        pandas_us = timed(lambda: pandas_query(df, filters, group_by), max(10, repeats // 20))
+        print(f"{name:<34}{len(groups):>7}{cube_us:>10.1f}{pandas_us:>11.1f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
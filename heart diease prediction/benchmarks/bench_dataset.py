@@ -0,0 +1,75 @@
+"""
+Dataset loading benchmark
+
+Compares pd.read_csv on train_updated.csv with the column cache in
+dataset.py: load time (cold, when the cache is built, and warm), peak
+Python memory allocated while loading (tracemalloc) and the size of the
+resulting DataFrame. The dataset is also replicated 10x and 100x to show
+how both paths scale. Temporary copies are used, so the project's own
+cache is left alone.
+
+Run from the project directory:
+    python benchmarks/bench_dataset.py [scale ...]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import load_dataset, load_columns, cache_dir_for
+
+def measure(load, repeats=5):
+    """
+    Best-of-repeats wall time, peak traced allocation and DataFrame size of one load
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = load()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    result = load()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    size = result.memory_usage(deep=True).sum() if isinstance(result, pd.DataFrame) else sum(a.nbytes for a in result.values())
+    return best, peak, size
+
+def main(*scales):
+    scales = scales or (1, 10, 100)
+    source = pd.read_csv('train_updated.csv')
+    tmp = tempfile.mkdtemp()
+    try:
+        print(f"{'rows':>8}  {'loader':<34}{'ms':>9}{'peak MB':>9}{'frame MB':>10}")
+        for scale in scales:
+            path = os.path.join(tmp, f'train_x{scale}.csv')
+            pd.concat([source] * scale, ignore_index=True).to_csv(path, index=False)
+
+            start = time.perf_counter()
+            load_dataset(path)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            rows = len(source) * scale
+            loaders = [
+                ('pd.read_csv', lambda: pd.read_csv(path)),
+                ('load_dataset', lambda: load_dataset(path)),
+                ('load_dataset(exact=True)', lambda: load_dataset(path, exact=True)),
+                ('load_columns (mmap, 2 columns)', lambda: load_columns(path, ['age', 'TenYearCHD'])),
+            ]
+            print(f"{rows:>8}  {'cache build (first load)':<34}{build_ms:>9.1f}")
+            for name, load in loaders:
+                seconds, peak, size = measure(load)
+                print(f"{rows:>8}  {name:<34}{seconds * 1000:>9.2f}{peak / 1e6:>9.2f}{size / 1e6:>10.2f}")
+            shutil.rmtree(cache_dir_for(path), ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,92 @@
+"""
+Bulk scoring throughput benchmark for the compiled forest engine
+
+Checks that forest.CompiledForest reproduces the sklearn forest's
+probabilities (float64 and float32 builds), then reports the latency of
+scoring 1 to 256 rows (the /predict and micro-batching sizes, and the
+SMALL_BATCH_ROWS crossover) and rows/second on 1k, 100k and 1M
+preprocessed rows resampled from the dataset, for sklearn's
+RandomForestClassifier.predict_proba and the compiled engine.
+
+Run from the project directory after the model has been trained:
+    python benchmarks/bench_forest.py [n_rows ...]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import joblib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forest import CompiledForest
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+SMALL_SIZES = [1, 8, 64, 128, 160, 192, 256]
+
+def check_parity(classifier, engines, X):
+    expected = classifier.predict_proba(X)
+    for name, engine, tolerance in engines:
+        difference = np.abs(engine.predict_proba(X) - expected).max()
+        if difference > tolerance or not np.array_equal(engine.predict(X), classifier.predict(X)):
+            raise AssertionError(f"{name}: probabilities differ from sklearn by {difference:.2e}")
+        print(f"Parity: {name:<18} max |dp| = {difference:.2e}")
+
+def throughput(function, X):
+    start = time.perf_counter()
+    function(X)
+    elapsed = time.perf_counter() - start
+    return X.shape[0] / elapsed, elapsed
+
+def latency_ms(function, X, n_rows, repeats=50):
+    timings = []
+    for i in range(repeats):
+        start = (i * n_rows) % (len(X) - n_rows)
+        batch = X[start:start + n_rows]
+        begin = time.perf_counter()
+        function(batch)
+        timings.append(time.perf_counter() - begin)
+    return np.median(timings) * 1000
+
+def main(sizes=None):
+    sizes = sizes or DEFAULT_SIZES
+    model = joblib.load('heart_disease_model.pkl')
+    preprocessor = model.named_steps['preprocessor']
+    classifier = model.named_steps['classifier']
+
+    df = pd.read_csv('train_updated.csv')
+    X_base = np.asarray(preprocessor.transform(df.drop(['id', 'TenYearCHD'], axis=1)), dtype=np.float32)
+
+    engines = [
+        ('compiled float64', CompiledForest(classifier, dtype=np.float64), 1e-12),
+        ('compiled float32', CompiledForest(classifier, dtype=np.float32), 1e-5),
+    ]
+    check_parity(classifier, engines, X_base)
+    for name, engine, _ in engines:
+        print(f"Node arrays: {name:<18} {engine.nbytes / 1e6:.1f} MB")
+
+    print(f"\n{'rows':>10}{'engine':>24}{'p50 ms':>10}")
+    for n_rows in SMALL_SIZES:
+        candidates = [('sklearn', classifier.predict_proba)] + [(name, engine.predict_proba) for name, engine, _ in engines]
+        if n_rows == 1:
+            candidates += [(f'{name} (row)', lambda batch, engine=engine: engine.predict_proba_row(batch[0]))
+                           for name, engine, _ in engines]
+        for name, function in candidates:
+            print(f"{n_rows:>10}{name:>24}{latency_ms(function, X_base, n_rows):>10.3f}")
+
+    rng = np.random.default_rng(42)
+    print(f"\n{'rows':>10}{'engine':>20}{'rows/s':>14}{'seconds':>10}")
+    for n_rows in sizes:
+        X = X_base[rng.integers(0, len(X_base), n_rows)]
+        candidates = [('sklearn', classifier.predict_proba)] + [(name, engine.predict_proba) for name, engine, _ in engines]
+        for name, function in candidates:
+            rate, elapsed = throughput(function, X)
+            print(f"{n_rows:>10}{name:>20}{rate:>14,.0f}{elapsed:>10.3f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main([int(size) for size in sys.argv[1:]]))
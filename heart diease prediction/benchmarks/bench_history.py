@@ -0,0 +1,104 @@
+"""
+History lookup benchmark
+
+Fills a temporary history store to increasing sizes and measures the
+latency of /api/compare_to_population (latest record) and
+/api/generate_report/<id> (record by id) through the Flask test client,
+next to the old approach of parsing the whole prediction_history.json.
+
+Run from the project directory after the model has been trained:
+    python benchmarks/bench_history.py [n_records ...]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from history_store import HistoryStore
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+# Largest history the JSON comparison is run at; beyond this a single load takes seconds
+MAX_JSON_SIZE = 100000
+
+FILL_BATCH = 10000
+
+def make_records(n_records, rng):
+    records = []
+    for _ in range(n_records):
+        records.append({
+            'timestamp': '2024-01-01 12:00:00',
+            'input_data': {'age': rng.randint(30, 70), 'sysBP': rng.uniform(100, 180),
+                           'diaBP': rng.uniform(60, 110), 'totChol': rng.uniform(150, 300),
+                           'is_smoking': rng.randint(0, 1), 'prevalentHyp': 0, 'diabetes': 0},
+            'prediction': rng.randint(0, 1),
+            'probability': rng.random()
+        })
+    return records
+
+def percentiles(timings):
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+def time_requests(client, urls):
+    timings = []
+    for url in urls:
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise AssertionError(f"{url} returned {response.status_code}")
+    return percentiles(timings)
+
+def time_json_lookups(path, ids):
+    timings = []
+    for record_id in ids:
+        start = time.perf_counter()
+        with open(path, 'r') as f:
+            history = json.load(f)
+        history[record_id]
+        timings.append((time.perf_counter() - start) * 1000)
+    return percentiles(timings)
+
+def main(sizes=None, n_requests=200):
+    sizes = sorted(sizes or DEFAULT_SIZES)
+    rng = random.Random(42)
+    client = app_module.app.test_client()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore(os.path.join(directory, 'history.db'), legacy_json_path=None)
+        app_module.history_store = store
+        json_path = os.path.join(directory, 'history.json')
+        json_history = []
+
+        print(f"{'records':>10}{'endpoint':>28}{'p50 ms':>10}{'p99 ms':>10}")
+        for size in sizes:
+            while store.count() < size:
+                batch = make_records(min(FILL_BATCH, size - store.count()), rng)
+                store.append(batch)
+                if size <= MAX_JSON_SIZE:
+                    json_history.extend(batch)
+
+            ids = [rng.randrange(size) for _ in range(n_requests)]
+            results = [
+                ('compare_to_population', time_requests(client, ['/api/compare_to_population'] * n_requests)),
+                ('generate_report/<id>', time_requests(client, [f'/api/generate_report/{i}' for i in ids])),
+            ]
+            if size <= MAX_JSON_SIZE:
+                with open(json_path, 'w') as f:
+                    json.dump(json_history, f)
+                results.append(('json load + index (old)', time_json_lookups(json_path, ids[:10])))
+
+            for name, (p50, p99) in results:
+                print(f"{size:>10}{name:>28}{p50:>10.3f}{p99:>10.3f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main([int(size) for size in sys.argv[1:]]))
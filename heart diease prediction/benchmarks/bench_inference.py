@@ -0,0 +1,88 @@
+"""
+Single-row inference benchmark
+
+Checks that the compiled fast path in inference.py matches the sklearn
+pipeline on every dataset row, then compares per-request latency of the
+original DataFrame + predict + predict_proba path against the fast path.
+
+Run from the project directory after the model has been trained:
+    python benchmarks/bench_inference.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import joblib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference import CompiledPipeline
+
+FEATURE_COLUMNS = ['age', 'education', 'sex', 'is_smoking', 'cigsPerDay', 'BPMeds',
+                   'prevalentStroke', 'prevalentHyp', 'diabetes', 'totChol', 'sysBP',
+                   'diaBP', 'BMI', 'heartRate', 'glucose']
+
+def load_records(file_path='train_updated.csv'):
+    df = pd.read_csv(file_path)[FEATURE_COLUMNS]
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+def sklearn_predict(model, data):
+    """
+    The original /predict scoring path
+    """
+    input_data = pd.DataFrame({feature: [data.get(feature)] for feature in FEATURE_COLUMNS})
+    prediction = model.predict(input_data)
+    prediction_proba = model.predict_proba(input_data)
+    return int(prediction[0]), float(prediction_proba[0][1])
+
+def check_parity(model, compiled, records, tolerance=1e-9):
+    """
+    Compare the fast path with the sklearn pipeline on every record
+
+    Returns:
+        max_difference: Largest absolute probability difference observed
+    """
+    frame = pd.DataFrame(records, columns=FEATURE_COLUMNS)
+    expected_proba = model.predict_proba(frame)[:, 1]
+    expected_labels = model.predict(frame)
+
+    max_difference = 0.0
+    for data, label, proba in zip(records, expected_labels, expected_proba):
+        fast_label, fast_proba = compiled.predict_one(data)
+        max_difference = max(max_difference, abs(fast_proba - proba))
+        if fast_label != label or abs(fast_proba - proba) > tolerance:
+            raise AssertionError(f"Parity mismatch for {data}: sklearn=({label}, {proba}) fast=({fast_label}, {fast_proba})")
+    return max_difference
+
+def time_calls(function, records):
+    timings = []
+    for data in records:
+        start = time.perf_counter()
+        function(data)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+def main(n_requests=500):
+    model = joblib.load('heart_disease_model.pkl')
+    compiled = CompiledPipeline(model)
+    records = load_records()
+
+    max_difference = check_parity(model, compiled, records)
+    print(f"Parity: {len(records)} records match (max |dp| = {max_difference:.2e})")
+
+    sample = records[:n_requests]
+    sklearn_p50, sklearn_p99 = time_calls(lambda data: sklearn_predict(model, data), sample)
+    fast_p50, fast_p99 = time_calls(compiled.predict_one, sample)
+
+    print(f"\nLatency over {len(sample)} single-row requests (ms)")
+    print(f"{'path':<20}{'p50':>10}{'p99':>10}")
+    print(f"{'sklearn pipeline':<20}{sklearn_p50:>10.3f}{sklearn_p99:>10.3f}")
+    print(f"{'compiled fast path':<20}{fast_p50:>10.3f}{fast_p99:>10.3f}")
+    print(f"Speedup at p50: {sklearn_p50 / fast_p50:.1f}x")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
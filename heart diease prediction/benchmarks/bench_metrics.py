@@ -0,0 +1,153 @@
+"""
+Metrics overhead benchmark
+
+Measures what the /metrics instrumentation adds to a request:
+  - the cost of each primitive (a counter increment, a histogram
+    observation and a stage lap) in isolation
+  - /predict and /healthz latency through the Flask test client with the
+    instrumentation on and off (request hooks removed, stage laps made
+    no-ops), in interleaved rounds that alternate which side goes first
+  - the time to render /metrics once every route and stage has samples,
+    for this process alone and merged from snapshot files of 16 workers
+
+The /predict result cache is off and the history goes to a temporary
+database, so every request is scored and written.
+
+Run from the project directory:
+    python benchmarks/bench_metrics.py [requests_per_round] [rounds]
+"""
+
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+directory = tempfile.mkdtemp()
+os.environ['HISTORY_DB'] = os.path.join(directory, 'history.db')
+os.environ['PREDICTION_CACHE_SIZE'] = '0'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+from metrics import Registry, StageTimer
+
+RECORD = {'age': 64, 'education': 2, 'sex': 0, 'is_smoking': 1, 'cigsPerDay': 3, 'BPMeds': 0,
+          'prevalentStroke': 0, 'prevalentHyp': 0, 'diabetes': 0, 'totChol': 221, 'sysBP': 148,
+          'diaBP': 85, 'BMI': 25.4, 'heartRate': 90, 'glucose': 80}
+
+class NullTimer:
+    def __init__(self, histogram):
+        pass
+
+    def lap(self, stage):
+        pass
+
+def per_call_ns(function, n=200000):
+    start = time.perf_counter()
+    for _ in range(n):
+        function()
+    return (time.perf_counter() - start) / n * 1e9
+
+def primitives():
+    registry = Registry()
+    counter = registry.counter('c_total', 'c', ('route', 'method', 'status'))
+    histogram = registry.histogram('h_seconds', 'h', ('route', 'method'))
+    timer = StageTimer(registry.histogram('s_seconds', 's', ('stage',)))
+    print(f"{'primitive':<24}{'ns/call':>10}")
+    for name, function in [('counter inc', lambda: counter.inc(('/predict', 'POST', '200'))),
+                           ('histogram observe', lambda: histogram.observe(0.0012, ('/predict', 'POST'))),
+                           ('stage lap', lambda: timer.lap('transform'))]:
+        print(f"{name:<24}{per_call_ns(function):>10.0f}")
+    print()
+
+def latencies(client, method, path, n, **kwargs):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = getattr(client, method)(path, **kwargs)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return samples
+
+def set_instrumentation(enabled, hooks):
+    app = app_module.app
+    if enabled:
+        app.before_request_funcs.setdefault(None, []).append(hooks[0])
+        app.after_request_funcs.setdefault(None, []).append(hooks[1])
+        app_module.StageTimer = StageTimer
+    else:
+        app.before_request_funcs[None].remove(hooks[0])
+        app.after_request_funcs[None].remove(hooks[1])
+        app_module.StageTimer = NullTimer
+
+def overhead(n, rounds):
+    client = app_module.app.test_client()
+    hooks = (app_module.start_request_timer, app_module.record_request_metrics)
+    endpoints = [('/predict', 'post', {'json': RECORD}), ('/healthz', 'get', {})]
+    results = {(path, enabled): [] for path, _, _ in endpoints for enabled in (True, False)}
+    # Warm-up
+    for path, method, kwargs in endpoints:
+        latencies(client, method, path, 50, **kwargs)
+    for round_index in range(rounds):
+        # Alternate which side goes first, as the history database grows during the run
+        for enabled in ((False, True) if round_index % 2 == 0 else (True, False)):
+            if not enabled:
+                set_instrumentation(False, hooks)
+            for path, method, kwargs in endpoints:
+                results[(path, enabled)].append(latencies(client, method, path, n, **kwargs))
+            if not enabled:
+                set_instrumentation(True, hooks)
+
+    print(f"{'endpoint':<12}{'p50 off ms':>12}{'p50 on ms':>11}{'p99 off ms':>12}{'p99 on ms':>11}{'added us':>10}")
+    for path, _, _ in endpoints:
+        # p50 is the median of the per-round medians, which is steadier than the pooled median
+        p50_off, p50_on = [statistics.median([statistics.median(samples) for samples in results[(path, enabled)]])
+                           for enabled in (False, True)]
+        off, on = [sorted(sample for samples in results[(path, enabled)] for sample in samples)
+                   for enabled in (False, True)]
+        p99_off, p99_on = off[int(len(off) * 0.99)], on[int(len(on) * 0.99)]
+        print(f"{path:<12}{p50_off * 1000:>12.3f}{p50_on * 1000:>11.3f}{p99_off * 1000:>12.3f}"
+              f"{p99_on * 1000:>11.3f}{(p50_on - p50_off) * 1e6:>10.1f}")
+    print()
+
+def scrape(n=200, workers=16):
+    client = app_module.app.test_client()
+    # Give every route a sample so the exposition is as long as it gets
+    for rule in app_module.app.url_map.iter_rules():
+        app_module.http_requests.inc((rule.rule, 'GET', '200'))
+        app_module.http_request_seconds.observe(0.001, (rule.rule, 'GET'))
+    samples = latencies(client, 'get', '/metrics', n)
+    size = len(client.get('/metrics').get_data())
+
+    registry = app_module.metrics_registry
+    snapshot = registry.snapshot()
+    registry.directory = os.path.join(directory, 'metrics')
+    os.makedirs(registry.directory)
+    for pid in range(workers):
+        with open(os.path.join(registry.directory, f'metrics-{pid}.json'), 'w') as f:
+            json.dump(snapshot, f)
+    merged = latencies(client, 'get', '/metrics', n)
+    merged_size = len(client.get('/metrics').get_data())
+    registry.directory = None
+
+    print(f"{'scrape':<28}{'p50 ms':>9}{'bytes':>9}")
+    print(f"{'this process':<28}{statistics.median(samples) * 1000:>9.3f}{size:>9}")
+    print(f"{f'merged from {workers} workers':<28}{statistics.median(merged) * 1000:>9.3f}{merged_size:>9}")
+
+def main(n=200, rounds=20):
+    try:
+        if not app_module.wait_for_model():
+            print(f"Model not available: {app_module.model_status['error']}")
+            return 1
+        primitives()
+        overhead(n, rounds)
+        scrape()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,73 @@
+"""
+Population percentile benchmark
+
+Builds the PercentileIndex used by /api/compare_to_population over the
+dataset and over 100x and 1000x copies of it, and reports the build time
+and the latency of one comparison (every numerical feature, overall and
+within the patient's cohort) next to computing the same percentiles by
+scanning the population with NumPy.
+
+Run from the project directory:
+    python benchmarks/bench_population.py [scale ...]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import load_columns, NUMERICAL_FEATURES
+from population import PercentileIndex, AGE_BAND_EDGES
+
+RECORD = {'age': 52, 'education': 2, 'sex': 1, 'is_smoking': 1, 'cigsPerDay': 20, 'BPMeds': 0,
+          'prevalentStroke': 0, 'prevalentHyp': 1, 'diabetes': 0, 'totChol': 250, 'sysBP': 145,
+          'diaBP': 92, 'BMI': 27.5, 'heartRate': 80, 'glucose': 90}
+
+def scan_compare(columns, record):
+    """
+    The same percentiles computed with a full pass over the population per feature
+    """
+    band = np.searchsorted(AGE_BAND_EDGES, columns['age'], side='right')
+    cohort = (columns['sex'] == record['sex']) & (band == np.searchsorted(AGE_BAND_EDGES, record['age'], side='right'))
+    result = {}
+    for feature in NUMERICAL_FEATURES:
+        values = columns[feature]
+        value = record[feature]
+        present = ~np.isnan(values)
+        result[feature] = [100.0 * ((subset < value).sum() + (subset <= value).sum()) / 2 / len(subset)
+                           for subset in (values[present], values[present & cohort])]
+    return result
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+def main(*scales):
+    scales = scales or (1, 100, 1000)
+    base = {name: np.asarray(values, dtype=np.float64)
+            for name, values in load_columns(columns=NUMERICAL_FEATURES + ['sex'], exact=True).items()}
+    print(f"{'population':>11}{'build ms':>10}{'index compare ms':>18}{'scan compare ms':>17}")
+    for scale in scales:
+        columns = {name: np.tile(values, scale) for name, values in base.items()}
+        start = time.perf_counter()
+        index = PercentileIndex(columns)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # Both paths must agree before their timings mean anything
+        fast = index.compare(RECORD)['features']
+        slow = scan_compare(columns, RECORD)
+        for feature in NUMERICAL_FEATURES:
+            assert np.allclose([fast[feature]['percentile'], fast[feature]['cohort_percentile']], slow[feature])
+
+        index_ms = timed(lambda: index.compare(RECORD), 2000)
+        scan_ms = timed(lambda: scan_compare(columns, RECORD), max(3, 300 // scale))
+        print(f"{index.size:>11}{build_ms:>10.1f}{index_ms:>18.3f}{scan_ms:>17.3f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
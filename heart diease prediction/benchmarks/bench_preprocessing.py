@@ -0,0 +1,97 @@
+"""
+Preprocessing cache benchmark
+
+Runs the grid search three ways on the training split:
+  - GridSearchCV over the full pipeline, which refits and reapplies the
+    ColumnTransformer for every candidate on every fold
+  - grid_search with an empty TransformCache (each fold preprocessed once)
+  - grid_search again with a new TransformCache on the same directory, as
+    a later search or retraining on unchanged data would
+and the default model's 5-fold cross-validation plus refit with
+cross_val_score and pipeline.fit, then through the cold and warm cache.
+
+It checks that every run picks the same parameters with the same score,
+then prints a timing breakdown: total wall time, time spent in
+preprocessing (fitting, transforming and cache lookups), what per-fit
+preprocessing costs without the cache, the time saved, and the rest of
+the wall time (fitting and scoring forests). The cache lives in a
+temporary directory.
+
+Run from the project directory:
+    python benchmarks/bench_preprocessing.py [n_estimators ...]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import GridSearchCV, cross_val_score
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import load_and_preprocess_data, create_preprocessing_pipeline
+from search import grid_search, fit_pipeline, cross_val_roc_auc, PARAM_GRID
+from transform_cache import TransformCache
+
+def main(*n_estimators):
+    param_grid = dict(PARAM_GRID, classifier__n_estimators=list(n_estimators)) if n_estimators else PARAM_GRID
+    X_train, X_test, y_train, y_test, _ = load_and_preprocess_data()
+    pipeline = Pipeline(steps=[
+        ('preprocessor', create_preprocessing_pipeline()),
+        ('classifier', RandomForestClassifier(random_state=42))
+    ])
+    directory = tempfile.mkdtemp()
+    # (run, wall seconds, preprocessing seconds, preprocessing seconds without the cache)
+    rows = []
+    try:
+        start = time.perf_counter()
+        reference = GridSearchCV(pipeline, param_grid, cv=5, scoring='roc_auc', n_jobs=-1)
+        reference.fit(X_train, y_train)
+        grid_wall = time.perf_counter() - start
+
+        for name in ['grid, cold cache', 'grid, warm cache']:
+            _, report = grid_search(pipeline, X_train, y_train, param_grid, cache=TransformCache(directory))
+            assert report['best_params'] == reference.best_params_
+            assert np.isclose(report['best_score'], reference.best_score_)
+            preprocessing = report['preprocessing']
+            rows.append((name, report['wall_time'], preprocessing['seconds'], preprocessing['without_cache_seconds']))
+        # GridSearchCV preprocesses once per fit, which is what the estimate counts
+        rows.insert(0, ('grid, GridSearchCV', grid_wall, rows[0][3], rows[0][3]))
+
+        # Default model: 5-fold cross-validation and the final fit
+        default = pipeline.set_params(classifier__n_estimators=100)
+        start = time.perf_counter()
+        expected = cross_val_score(default, X_train, y_train, cv=5, scoring='roc_auc')
+        default.fit(X_train, y_train)
+        pipeline_wall = time.perf_counter() - start
+
+        shutil.rmtree(directory)
+        for name in ['cv + fit, cold cache', 'cv + fit, warm cache']:
+            cache = TransformCache(directory)
+            start = time.perf_counter()
+            scores = cross_val_roc_auc(default, X_train, y_train, cache=cache)
+            fit_pipeline(default, X_train, y_train, cache)
+            wall = time.perf_counter() - start
+            assert np.allclose(scores, expected)
+            stats = cache.stats
+            # Every entry is preprocessed once either way; a hit recalls its original cost
+            uncached = stats['transform_seconds'] + stats['saved_seconds'] + stats['lookup_seconds'] * (stats['hits'] > 0)
+            rows.append((name, wall, stats['transform_seconds'] + stats['lookup_seconds'], uncached))
+        rows.insert(3, ('cv + fit, pipeline', pipeline_wall, rows[3][3], rows[3][3]))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"best: {reference.best_params_} CV ROC AUC {reference.best_score_:.4f}\n")
+    print(f"{'run':<24}{'wall s':>9}{'preproc s':>11}{'uncached s':>12}{'saved s':>9}{'forests s':>11}")
+    for name, wall, preprocessing, uncached in rows:
+        print(f"{name:<24}{wall:>9.2f}{preprocessing:>11.3f}{uncached:>12.3f}"
+              f"{uncached - preprocessing:>9.3f}{wall - preprocessing:>11.2f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,54 @@
+"""
+Hyperparameter search benchmark
+
+Runs the exhaustive grid search from train_model and the successive
+halving searches in search.py on the same training split and folds, and
+reports wall-clock time, forest fits, trees fitted, the best
+cross-validated ROC AUC and the ROC AUC of each tuned model on the
+held-out test split. Nothing is saved.
+
+Run from the project directory:
+    python benchmarks/bench_search.py [time_budget_seconds]
+"""
+
+import os
+import sys
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import load_and_preprocess_data, create_preprocessing_pipeline
+from search import run_search
+
+def main(time_budget=10.0):
+    X_train, X_test, y_train, y_test, _ = load_and_preprocess_data()
+    pipeline = Pipeline(steps=[
+        ('preprocessor', create_preprocessing_pipeline()),
+        ('classifier', RandomForestClassifier(random_state=42))
+    ])
+    runs = [
+        ('grid (108 x 5 folds)', 'grid', {}),
+        ('halving (36 candidates)', 'halving', {}),
+        ('random (16 candidates)', 'random', {}),
+        (f'random, {time_budget:g}s budget', 'random', {'n_candidates': 36, 'time_budget': time_budget}),
+    ]
+
+    results = []
+    for name, method, options in runs:
+        model, report = run_search(method, pipeline, X_train, y_train, **options)
+        test_auc = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+        results.append((name, report, test_auc))
+        print(f"{name}: {report['best_params']}")
+
+    grid_time = results[0][1]['wall_time']
+    print(f"\n{'search':<26}{'seconds':>9}{'speedup':>9}{'fits':>7}{'trees':>8}{'CV AUC':>9}{'test AUC':>10}")
+    for name, report, test_auc in results:
+        print(f"{name:<26}{report['wall_time']:>9.1f}{grid_time / report['wall_time']:>8.1f}x{report['fits']:>7}"
+              f"{report['trees_fitted']:>8}{report['best_score']:>9.4f}{test_auc:>10.4f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(*[float(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,113 @@
+"""
+Serving benchmark
+
+Starts the Flask development runner (run_app.py) and gunicorn with
+gunicorn.conf.py at several worker counts, waits for /readyz, then drives
+concurrent /predict requests over keep-alive connections and reports
+requests/second and p50/p99 latency for each. Every server writes to its
+own temporary history database.
+
+Run from the project directory after the model has been trained:
+    python benchmarks/bench_serving.py [n_workers ...]
+"""
+
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+HOST = '127.0.0.1'
+PORT = 8765
+DEV_PORT = 5000
+CLIENTS = 16
+REQUESTS_PER_CLIENT = 200
+
+ROW = dict(age=64, education=2.0, sex=0, is_smoking=1, cigsPerDay=3.0, BPMeds=0.0, prevalentStroke=0,
+           prevalentHyp=0, diabetes=0, totChol=221.0, sysBP=148.0, diaBP=85.0, BMI=25.0,
+           heartRate=90.0, glucose=80.0)
+
+def wait_until_ready(process, port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection(HOST, port, timeout=1)
+            connection.request('GET', '/readyz')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('Server did not become ready')
+
+def client(port, latencies, errors):
+    body = json.dumps(ROW)
+    headers = {'Content-Type': 'application/json'}
+    connection = http.client.HTTPConnection(HOST, port, timeout=30)
+    for _ in range(REQUESTS_PER_CLIENT):
+        start = time.perf_counter()
+        try:
+            connection.request('POST', '/predict', body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except OSError as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection(HOST, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+def drive_load(port):
+    latencies, errors = [], []
+    threads = [threading.Thread(target=client, args=(port, latencies, errors)) for _ in range(CLIENTS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000, len(errors)
+
+def run_server(label, command, port, env, directory):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(env, HISTORY_DB=os.path.join(tmp, 'history.db'))
+        # Own process group so the reloader's child and gunicorn's workers are stopped too
+        process = subprocess.Popen(command, cwd=directory, env=env, start_new_session=True,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(process, port)
+            drive_load(port)  # warm-up
+            throughput, p50, p99, errors = drive_load(port)
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=60)
+    print(f"{label:<24}{throughput:>10.0f}{p50:>10.2f}{p99:>10.2f}{errors:>8}")
+
+def main(*worker_counts):
+    directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    worker_counts = worker_counts or (1, 2, 4)
+    print(f"cpu cores: {os.cpu_count()}, {CLIENTS} clients x {REQUESTS_PER_CLIENT} requests")
+    print(f"{'server':<24}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+
+    # run_app.py binds to port 5000 with the debugger and reloader
+    run_server('flask dev (run_app.py)', [sys.executable, 'run_app.py'], DEV_PORT, dict(os.environ), directory)
+
+    for workers in worker_counts:
+        env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f'{HOST}:{PORT}', LOG_LEVEL='warning')
+        run_server(f'gunicorn {workers} worker(s)',
+                   [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'], PORT, env, directory)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
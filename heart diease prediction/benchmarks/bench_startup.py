@@ -0,0 +1,62 @@
+"""
+Startup benchmark
+
+Starts a fresh interpreter per run and measures how long `import app`
+takes, how long until /readyz reports ready, and the time to the first
+successful /predict, with background model loading on and off.
+
+Run from the project directory after the model has been trained:
+    python benchmarks/bench_startup.py [runs]
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+plotting_loaded = 'matplotlib' in sys.modules or 'seaborn' in sys.modules
+
+client = app.app.test_client()
+row = dict(age=64, education=2.0, sex=0, is_smoking=1, cigsPerDay=3.0, BPMeds=0.0, prevalentStroke=0,
+           prevalentHyp=0, diabetes=0, totChol=221.0, sysBP=148.0, diaBP=85.0, BMI=25.0,
+           heartRate=90.0, glucose=80.0)
+
+ready = None
+while True:
+    if ready is None and client.get('/readyz').status_code == 200:
+        ready = time.perf_counter() - start
+    if client.post('/predict', json=row).status_code == 200:
+        first_prediction = time.perf_counter() - start
+        break
+    time.sleep(0.005)
+
+print(json.dumps({'import': imported, 'ready': ready or first_prediction,
+                  'first_prediction': first_prediction, 'plotting_loaded': plotting_loaded}))
+"""
+
+def run_probe(background, directory):
+    env = dict(os.environ, MODEL_BACKGROUND_LOADING='1' if background else '0')
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=directory, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(runs=5):
+    directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{'mode':<12}{'import s':>10}{'ready s':>10}{'first /predict s':>18}{'plotting imported':>19}")
+    for background in (True, False):
+        results = [run_probe(background, directory) for _ in range(runs)]
+        median = {key: np.median([r[key] for r in results]) for key in ('import', 'ready', 'first_prediction')}
+        plotting = any(r['plotting_loaded'] for r in results)
+        mode = 'background' if background else 'synchronous'
+        print(f"{mode:<12}{median['import']:>10.3f}{median['ready']:>10.3f}{median['first_prediction']:>18.3f}{str(plotting):>19}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,374 @@
+"""
+Serving benchmark suite with regression gating
+
+Drives /predict, /api/user_statistics, /api/compare_to_population and
+/history through the Flask test client (in this process) and through a
+gunicorn server started with gunicorn.conf.py. Each endpoint is run at
+several history sizes and concurrency levels, and the suite reports
+throughput and p50/p95/p99 latency for each run.
+
+Runs are reproducible:
+- /predict bodies are a fixed, seeded sample of dataset rows.
+- Each history size starts from the same seeded database, copied for
+  every target.
+- The /predict result cache is disabled, so every request is scored.
+
+Every run is repeated, each repeat against a freshly started server and
+a fresh copy of the history, with the repeats interleaved across
+endpoints and targets so a passing slowdown of the machine or one slow
+server instance hits only one repeat. A run reports the median of its
+repeats and their range. Results are written as JSON
+together with the environment they were measured in.
+
+If a baseline file exists, every run is compared with it. A run regresses
+when its median p50 or p95 latency is more than --threshold slower (and
+at least --min-ms milliseconds slower), or its median throughput is more
+than --threshold lower. The ranges must also not overlap: the best repeat
+has to be worse than the baseline's worst. Regressions and failed
+requests make the script exit with status 1.
+
+Run from the project directory after the model has been trained:
+    python benchmarks/bench_suite.py                   # measure, compare with the baseline if there is one
+    python benchmarks/bench_suite.py --save-baseline   # measure and make this run the baseline
+    python benchmarks/bench_suite.py --quick           # fewer requests, smaller histories
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+# Every /predict is scored rather than answered from the result cache, and the
+# model is loaded before the app module finishes importing
+os.environ['PREDICTION_CACHE_SIZE'] = '0'
+os.environ['MODEL_BACKGROUND_LOADING'] = '0'
+
+RESULTS_DIR = os.path.join(PROJECT_DIR, 'benchmarks', 'results')
+DEFAULT_OUTPUT = os.path.join(RESULTS_DIR, 'latest.json')
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, 'baseline.json')
+
+ENDPOINTS = {
+    'predict': ('POST', '/predict'),
+    'user_statistics': ('GET', '/api/user_statistics'),
+    'compare_to_population': ('GET', '/api/compare_to_population'),
+    'history': ('GET', '/history'),
+}
+
+TARGETS = ['test_client', 'gunicorn']
+
+HOST = '127.0.0.1'
+PORT = 8766
+GUNICORN_WORKERS = 2
+
+SEED = 42
+BODIES = 500
+WARMUP_REQUESTS = 20
+
+FULL = {'history_sizes': [100, 10000, 100000], 'concurrency': [1, 8], 'requests': 400, 'repeats': 5}
+QUICK = {'history_sizes': [100, 10000], 'concurrency': [1, 4], 'requests': 100, 'repeats': 3}
+
+# Metrics summarised over repeats; latencies regress upwards, throughput downwards
+METRICS = ['throughput', 'p50_ms', 'p95_ms', 'p99_ms']
+
+def predict_bodies(n, seed=SEED):
+    """
+    JSON bodies of a seeded sample of the complete dataset rows, so every request is valid
+    """
+    from dataset import load_dataset
+    df = load_dataset(exact=True).drop(columns=['id', 'TenYearCHD']).dropna()
+    rows = df.sample(n, replace=len(df) < n, random_state=seed).to_dict('records')
+    return [json.dumps(row) for row in rows]
+
+def build_history(path, size, bodies, seed=SEED):
+    """
+    History database with size seeded records made from the request bodies
+    """
+    from history_store import HistoryStore
+    rng = np.random.RandomState(seed)
+    store = HistoryStore(path, legacy_json_path=None)
+    for start in range(0, size, 10000):
+        records = []
+        for _ in range(min(10000, size - start)):
+            probability = float(rng.random_sample())
+            records.append({
+                'timestamp': '2024-01-01 12:00:00',
+                'input_data': json.loads(bodies[rng.randint(len(bodies))]),
+                'prediction': int(probability >= 0.5),
+                'probability': probability
+            })
+        store.append(records)
+    return store
+
+def copy_history(source, path):
+    """
+    Copy a history database, including changes still in its write-ahead log
+    """
+    with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(path)) as dst:
+        src.backup(dst)
+
+def test_client_session(app):
+    client = app.test_client()
+
+    def send(method, path, body):
+        response = client.open(path, method=method, data=body, content_type='application/json')
+        return response.status_code
+    return send
+
+def http_session(port):
+    connection = [http.client.HTTPConnection(HOST, port, timeout=30)]
+    headers = {'Content-Type': 'application/json'}
+
+    def send(method, path, body):
+        try:
+            connection[0].request(method, path, body=body, headers=headers)
+            response = connection[0].getresponse()
+            response.read()
+            return response.status
+        except OSError as e:
+            connection[0].close()
+            connection[0] = http.client.HTTPConnection(HOST, port, timeout=30)
+            return str(e)
+    return send
+
+def run(make_session, endpoint, concurrency, n_requests, bodies):
+    """
+    Send n_requests to one endpoint from concurrency threads
+
+    Returns:
+        result: Dictionary with requests, errors, throughput and p50/p95/p99 latency in ms
+    """
+    method, path = ENDPOINTS[endpoint]
+    per_thread = max(1, n_requests // concurrency)
+    latencies = [[] for _ in range(concurrency)]
+    errors = []
+    barrier = threading.Barrier(concurrency + 1)
+
+    def worker(index):
+        send = make_session()
+        for i in range(WARMUP_REQUESTS // concurrency + 1):
+            send(method, path, bodies[(index + i) % len(bodies)] if method == 'POST' else None)
+        barrier.wait()
+        for i in range(per_thread):
+            body = bodies[(index * per_thread + i) % len(bodies)] if method == 'POST' else None
+            start = time.perf_counter()
+            status = send(method, path, body)
+            latencies[index].append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    timings = np.concatenate([np.asarray(t) for t in latencies]) * 1000
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {'requests': int(len(timings)), 'errors': len(errors), 'throughput': len(timings) / elapsed,
+            'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99)}
+
+def summarise(runs):
+    """
+    Median of each metric over the repeats of a run, with the range of the repeats
+    """
+    result = {'requests': sum(r['requests'] for r in runs), 'errors': sum(r['errors'] for r in runs),
+              'repeats': len(runs)}
+    for metric in METRICS:
+        values = [r[metric] for r in runs]
+        result[metric] = float(np.median(values))
+        result[f'{metric}_range'] = [float(min(values)), float(max(values))]
+    return result
+
+def wait_until_ready(process, port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection(HOST, port, timeout=1)
+            connection.request('GET', '/readyz')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('Server did not become ready')
+
+def start_gunicorn(history_db):
+    env = dict(os.environ, HISTORY_DB=history_db, WEB_CONCURRENCY=str(GUNICORN_WORKERS),
+               BIND=f'{HOST}:{PORT}', LOG_LEVEL='warning')
+    # Own process group so the workers are stopped with the master
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                               cwd=PROJECT_DIR, env=env, start_new_session=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(process, PORT)
+    except Exception:
+        stop_server(process)
+        raise
+    return process
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait(timeout=60)
+
+def environment():
+    """
+    What the results were measured on, stored with them
+    """
+    import flask
+    import sklearn
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'flask': flask.__version__, 'sklearn': sklearn.__version__, 'numpy': np.__version__,
+            'commit': commit, 'gunicorn_workers': GUNICORN_WORKERS}
+
+def run_suite(config, targets):
+    """
+    Every (target, history size, endpoint, concurrency) run
+
+    Each repeat starts a fresh server on a fresh copy of the history, so a slow
+    server instance or a history grown by earlier /predict calls only affects
+    one repeat.
+
+    Returns:
+        results: Dictionary of 'target/history/endpoint/cN' -> run result
+    """
+    bodies = predict_bodies(BODIES)
+    repeats = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in config['history_sizes']:
+            template = os.path.join(directory, f'history-{size}.db')
+            build_history(template, size, bodies)
+            for repeat in range(config['repeats']):
+                for target in targets:
+                    history_db = os.path.join(directory, f'{target}-{size}-{repeat}.db')
+                    copy_history(template, history_db)
+                    if target == 'test_client':
+                        import app as app_module
+                        from history_store import HistoryStore
+                        app_module.history_store = HistoryStore(history_db, legacy_json_path=None)
+                        make_session, server = (lambda: test_client_session(app_module.app)), None
+                    else:
+                        server = start_gunicorn(history_db)
+                        make_session = lambda: http_session(PORT)
+                    try:
+                        for endpoint in ENDPOINTS:
+                            for concurrency in config['concurrency']:
+                                result = run(make_session, endpoint, concurrency, config['requests'], bodies)
+                                repeats.setdefault((target, size, endpoint, concurrency), []).append(result)
+                    finally:
+                        if server is not None:
+                            stop_server(server)
+
+    results = {}
+    for (target, size, endpoint, concurrency), runs in repeats.items():
+        key = f'{target}/{size}/{endpoint}/c{concurrency}'
+        result = summarise(runs)
+        results[key] = dict(result, target=target, history_size=size, endpoint=endpoint, concurrency=concurrency)
+        print(f"{key:<48}{result['throughput']:>9.0f}{result['p50_ms']:>9.2f}"
+              f"{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}{result['errors']:>7}")
+    return results
+
+def compare(results, baseline, threshold, min_ms):
+    """
+    Runs that regressed against the baseline
+
+    Returns:
+        regressions: List of (key, metric, baseline value, current value)
+    """
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if (current[metric] > base[metric] * (1 + threshold) and current[metric] - base[metric] > min_ms and
+                    current[f'{metric}_range'][0] > base[f'{metric}_range'][1]):
+                regressions.append((key, metric, base[metric], current[metric]))
+        if (current['throughput'] < base['throughput'] / (1 + threshold) and
+                current['throughput_range'][1] < base['throughput_range'][0]):
+            regressions.append((key, 'throughput', base['throughput'], current['throughput']))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serving benchmark suite with regression gating')
+    parser.add_argument('--quick', action='store_true', help='fewer requests and smaller histories')
+    parser.add_argument('--targets', default=','.join(TARGETS), help='comma-separated: test_client,gunicorn')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='where to write the results')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='results to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown, e.g. 0.25 for 25%%')
+    parser.add_argument('--min-ms', type=float, default=0.5, help='ignore latency changes smaller than this')
+    args = parser.parse_args(argv)
+
+    targets = [target for target in args.targets.split(',') if target]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets {sorted(unknown)}, expected {TARGETS}")
+    config = QUICK if args.quick else FULL
+
+    print(f"cpu cores: {os.cpu_count()}, {config['requests']} requests per run, "
+          f"median of {config['repeats']} repeats")
+    print(f"{'run':<48}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>7}")
+    results = run_suite(config, targets)
+    report = {'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'config': config,
+              'environment': environment(), 'results': results}
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    failed = sum(result['errors'] for result in results.values())
+    if failed:
+        print(f"{failed} requests failed")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        shutil.copy(args.output, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 1 if failed else 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 1 if failed else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('environment', {}).get('cpu_count') != os.cpu_count():
+        print("Warning: the baseline was measured on a machine with a different number of cores")
+    regressions = compare(results, baseline['results'], args.threshold, args.min_ms)
+    compared = sum(key in baseline['results'] for key in results)
+    print(f"Compared {compared} runs with the baseline from {baseline.get('created_at')} "
+          f"(threshold {args.threshold:.0%}, at least {args.min_ms} ms)")
+    for key, metric, before, after in regressions:
+        print(f"  REGRESSION {key} {metric}: {before:.2f} -> {after:.2f} ({after / before - 1:+.0%})")
+    if not regressions:
+        print("No regressions")
+    return 1 if regressions or failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
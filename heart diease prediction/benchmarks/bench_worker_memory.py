@@ -0,0 +1,95 @@
+"""
+Per-worker memory benchmark for model loading strategies
+
+Forks 1, 4 and 16 worker processes the way a pre-forking server does and
+reports resident (RSS) and proportional (PSS) memory per worker once each
+has scored a few requests. PSS splits shared pages between the processes
+that map them, so it shows how much memory each worker really adds.
+
+Modes:
+    pickle          every worker joblib.loads heart_disease_model.pkl
+    pickle+preload  the parent loads the pickle before forking
+    mmap            every worker maps heart_disease_model.arrays
+    mmap+preload    the parent maps the array store before forking
+
+Linux only (reads /proc/<pid>/smaps_rollup). Run from the project
+directory after the model has been trained:
+    python benchmarks/bench_worker_memory.py [n_workers ...]
+"""
+
+import multiprocessing
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forest import load_model_arrays, model_arrays_current, save_model_arrays
+from inference import CompiledPipeline
+
+MODEL_PATH = 'heart_disease_model.pkl'
+ARRAYS_DIR = 'heart_disease_model.arrays'
+DEFAULT_WORKERS = [1, 4, 16]
+MODES = ['pickle', 'pickle+preload', 'mmap', 'mmap+preload']
+
+def load(mode):
+    if mode.startswith('mmap'):
+        return load_model_arrays(ARRAYS_DIR, mmap_mode='r')
+    return joblib.load(MODEL_PATH)
+
+def memory_kb(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0][:-1]] = int(parts[1])
+    return values
+
+def worker(mode, preloaded, records, results, done):
+    model = preloaded if preloaded is not None else load(mode)
+    compiled = CompiledPipeline(model)
+    for data in records:
+        compiled.predict_one(data)
+    # Score a batch too, so every tree page has been touched
+    model.predict_proba(pd.DataFrame(records))
+    results.put(os.getpid())
+    done.wait()
+
+def run(mode, n_workers, records):
+    context = multiprocessing.get_context('fork')
+    preloaded = load(mode) if mode.endswith('preload') else None
+    results, done = context.Queue(), context.Event()
+    processes = [context.Process(target=worker, args=(mode, preloaded, records, results, done))
+                 for _ in range(n_workers)]
+    for process in processes:
+        process.start()
+    pids = [results.get() for _ in processes]
+
+    # Measure while every worker is still alive, so shared pages are split between all of them
+    usage = [memory_kb(pid) for pid in pids]
+    done.set()
+    for process in processes:
+        process.join()
+    return np.mean([u['Rss'] for u in usage]) / 1024, np.mean([u['Pss'] for u in usage]) / 1024
+
+def main(worker_counts=None):
+    worker_counts = worker_counts or DEFAULT_WORKERS
+    if not model_arrays_current(MODEL_PATH, ARRAYS_DIR):
+        save_model_arrays(joblib.load(MODEL_PATH), MODEL_PATH, ARRAYS_DIR)
+
+    df = pd.read_csv('train_updated.csv').drop(['id', 'TenYearCHD'], axis=1).head(200)
+    records = df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+    print(f"{'mode':<16}{'workers':>8}{'RSS/worker MB':>15}{'PSS/worker MB':>15}")
+    for mode in MODES:
+        for n_workers in worker_counts:
+            rss, pss = run(mode, n_workers, records)
+            print(f"{mode:<16}{n_workers:>8}{rss:>15.1f}{pss:>15.1f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main([int(n) for n in sys.argv[1:]]))
@@ -0,0 +1,212 @@
+"""
+Pre-aggregated chart data for client-side rendering
+
+Instead of 300-dpi PNGs, the dashboards can fetch the few hundred numbers
+each chart actually shows: binned histograms, crosstabs, the correlation
+matrix, a binned blood pressure scatter and downsampled ROC/PR curves.
+Payloads are computed once per dataset version (and model version, for
+the evaluation curves) and cached.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dataset import load_dataset, dataset_version
+
+DATASET_PATH = 'train_updated.csv'
+TARGET = 'TenYearCHD'
+
+# Columns that are not patient measurements, left out of the charts
+ID_COLUMNS = ['id']
+
+HISTOGRAM_BINS = 20
+SCATTER_BINS = 30
+
+# Curves are downsampled to at most this many points
+MAX_CURVE_POINTS = 200
+
+CLASS_LABELS = ['No Heart Disease', 'Heart Disease']
+
+def _round(values, digits=4):
+    return [round(float(v), digits) for v in values]
+
+def histogram(df, column, bins=HISTOGRAM_BINS):
+    """
+    Counts per class over equal-width bins of one column (missing values dropped)
+
+    Returns:
+        payload: {'column', 'edges', 'series': [{'label', 'counts'}], 'missing'}
+    """
+    values = df[[column, TARGET]].dropna()
+    edges = np.histogram_bin_edges(values[column], bins=bins)
+    series = []
+    for target, label in enumerate(CLASS_LABELS):
+        counts, _ = np.histogram(values.loc[values[TARGET] == target, column], bins=edges)
+        series.append({'label': label, 'counts': counts.tolist()})
+    return {'column': column, 'edges': _round(edges, 2), 'series': series,
+            'missing': int(df[column].isna().sum())}
+
+def crosstab(df, column, index_labels):
+    """
+    Counts and row percentages of heart disease for each value of a binary column
+
+    Returns:
+        payload: {'column', 'categories', 'columns', 'counts', 'percentages'}
+    """
+    table = pd.crosstab(df[column], df[TARGET]).reindex(index=[0, 1], columns=[0, 1], fill_value=0)
+    percentages = table.div(table.sum(axis=1).replace(0, np.nan), axis=0).fillna(0) * 100
+    return {
+        'column': column,
+        'categories': index_labels,
+        'columns': CLASS_LABELS,
+        'counts': table.values.tolist(),
+        'percentages': [_round(row, 1) for row in percentages.values]
+    }
+
+def correlation(df):
+    """
+    Pearson correlation matrix of the numerical features and the target
+
+    Returns:
+        payload: {'columns', 'matrix'}
+    """
+    corr = df.drop(columns=ID_COLUMNS, errors='ignore').select_dtypes(include=[np.number]).corr()
+    return {'columns': list(corr.columns), 'matrix': [_round(row, 3) for row in corr.values]}
+
+def binned_scatter(df, x, y, bins=SCATTER_BINS):
+    """
+    2-D binned counts per class instead of one point per patient
+
+    Returns:
+        payload: {'x', 'y', 'x_edges', 'y_edges', 'cells': [[x_bin, y_bin, negatives, positives], ...]}
+            with only non-empty cells listed
+    """
+    values = df[[x, y, TARGET]].dropna()
+    x_edges = np.histogram_bin_edges(values[x], bins=bins)
+    y_edges = np.histogram_bin_edges(values[y], bins=bins)
+    counts = []
+    for target in (0, 1):
+        subset = values[values[TARGET] == target]
+        grid, _, _ = np.histogram2d(subset[x], subset[y], bins=[x_edges, y_edges])
+        counts.append(grid.astype(int))
+    cells = [[int(i), int(j), int(counts[0][i, j]), int(counts[1][i, j])]
+             for i, j in zip(*np.nonzero(counts[0] + counts[1]))]
+    return {'x': x, 'y': y, 'x_edges': _round(x_edges, 1), 'y_edges': _round(y_edges, 1), 'cells': cells}
+
+def downsample_curve(x, y, max_points=MAX_CURVE_POINTS):
+    """
+    Keep at most max_points points of a curve, always including both ends
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if len(x) <= max_points:
+        return _round(x), _round(y)
+    index = np.unique(np.linspace(0, len(x) - 1, max_points).round().astype(int))
+    return _round(x[index]), _round(y[index])
+
+def evaluation_curves(model):
+    """
+    ROC and precision-recall curves of a fitted model on the held-out test split
+
+    Returns:
+        roc, pr: Payloads for the 'roc' and 'precision_recall' charts
+    """
+    from sklearn.metrics import roc_curve, auc, precision_recall_curve, average_precision_score
+    from model import load_and_preprocess_data
+
+    X_train, X_test, y_train, y_test, df = load_and_preprocess_data()
+    y_pred_proba = model.predict_proba(X_test)[:, list(model.classes_).index(1)]
+
+    fpr, tpr, _ = roc_curve(y_test, y_pred_proba)
+    precision, recall, _ = precision_recall_curve(y_test, y_pred_proba)
+    fpr_points, tpr_points = downsample_curve(fpr, tpr)
+    recall_points, precision_points = downsample_curve(recall, precision)
+    roc = {'fpr': fpr_points, 'tpr': tpr_points, 'auc': round(float(auc(fpr, tpr)), 4),
+           'test_size': int(len(y_test))}
+    pr = {'recall': recall_points, 'precision': precision_points,
+          'average_precision': round(float(average_precision_score(y_test, y_pred_proba)), 4),
+          'test_size': int(len(y_test))}
+    return roc, pr
+
+# Dataset charts: name -> function of the dataframe
+DATASET_CHARTS = {
+    'age_histogram': lambda df: histogram(df, 'age'),
+    'bmi_histogram': lambda df: histogram(df, 'BMI'),
+    'smoking_crosstab': lambda df: crosstab(df, 'is_smoking', ['Non-Smoker', 'Smoker']),
+    'diabetes_crosstab': lambda df: crosstab(df, 'diabetes', ['No Diabetes', 'Diabetes']),
+    'correlation': correlation,
+    'blood_pressure': lambda df: binned_scatter(df, 'sysBP', 'diaBP')
+}
+
+# Charts computed from the model's predictions on the test split
+MODEL_CHARTS = ['roc', 'precision_recall']
+
+CHART_NAMES = list(DATASET_CHARTS) + MODEL_CHARTS
+
+class ChartData:
+    """
+    Computes chart payloads once per dataset (and model) version and caches them
+    """
+
+    def __init__(self, dataset_path=DATASET_PATH):
+        """
+        Args:
+            dataset_path: CSV file the dataset charts are computed from
+        """
+        self.dataset_path = dataset_path
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def dataset_version(self):
+        """
+        Content hash of the dataset file
+        """
+        return dataset_version(self.dataset_path)
+
+    def get(self, name, model=None, model_version=None):
+        """
+        Payload of one chart
+
+        Args:
+            name: One of CHART_NAMES
+            model: Fitted pipeline, required for the ROC and precision-recall charts
+            model_version: Version of that model
+
+        Returns:
+            version, payload: Version string (usable as an ETag) and the chart data
+
+        Raises:
+            KeyError: If the chart name is unknown
+            LookupError: If a model chart is requested without a model
+        """
+        if name not in CHART_NAMES:
+            raise KeyError(name)
+        version = self.dataset_version()
+        if name in MODEL_CHARTS:
+            if model is None:
+                raise LookupError('Model not available')
+            version = f'{version}-{model_version}'
+
+        key = (name, version)
+        payload = self._cache.get(key)
+        if payload is None:
+            with self._lock:
+                payload = self._cache.get(key)
+                if payload is None:
+                    payload = self._compute(name, model, version)
+        return version, payload
+
+    def _compute(self, name, model, version):
+        # Older versions are dropped so the cache holds one entry per chart
+        self._cache = {key: value for key, value in self._cache.items() if key[0] != name or key[1] == version}
+        if name in MODEL_CHARTS:
+            roc, pr = evaluation_curves(model)
+            self._cache[('roc', version)] = roc
+            self._cache[('precision_recall', version)] = pr
+            return roc if name == 'roc' else pr
+
+        df = load_dataset(self.dataset_path)
+        for chart, compute in DATASET_CHARTS.items():
+            self._cache[(chart, version)] = compute(df)
+        return self._cache[(name, version)]
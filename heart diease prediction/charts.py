@@ -0,0 +1,355 @@
+"""
+Chart rendering for the heart disease dataset and model evaluation
+
+Every chart is an independent task: a module-level render function plus
+the data it draws. Tasks run in a process pool, and each PNG is tagged
+(in a PNG text chunk) with a hash of its inputs: the data, the chart
+parameters and the render function's source. Charts whose inputs have not
+changed since the file was written are skipped.
+
+Matplotlib and seaborn are only imported by the processes that actually
+render a chart.
+"""
+
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from profiler import reset_peak_rss, peak_rss_mb
+
+CHART_DPI = 300
+OUTPUT_DIR = 'static'
+
+# PNG text chunk holding the hash of the inputs a chart was rendered from
+HASH_KEY = 'inputs-hash'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+CLASS_PALETTE = ['#4CAF50', '#F44336']
+
+_pyplot = None
+
+def _plotting():
+    """
+    Import and style matplotlib/seaborn once per process
+    """
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        matplotlib.use('Agg')  # Use non-interactive backend
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        # Set the style for all plots
+        sns.set_style('whitegrid')
+        plt.rcParams['font.family'] = 'sans-serif'
+        plt.rcParams['font.sans-serif'] = ['Arial']
+        plt.rcParams['axes.labelsize'] = 12
+        plt.rcParams['axes.titlesize'] = 14
+        plt.rcParams['xtick.labelsize'] = 10
+        plt.rcParams['ytick.labelsize'] = 10
+        _pyplot = (plt, sns)
+    return _pyplot
+
+def age_distribution(df):
+    plt, sns = _plotting()
+    plt.figure(figsize=(10, 6))
+    sns.histplot(data=df, x='age', hue='TenYearCHD', kde=True, bins=20, palette=CLASS_PALETTE)
+    plt.title('Age Distribution by Heart Disease Risk')
+    plt.xlabel('Age')
+    plt.ylabel('Count')
+
+def correlation_heatmap(df):
+    plt, sns = _plotting()
+    plt.figure(figsize=(12, 10))
+    correlation = df.corr()
+    mask = np.triu(correlation)
+    cmap = sns.diverging_palette(230, 20, as_cmap=True)
+    sns.heatmap(correlation, annot=True, cmap=cmap, fmt='.2f', mask=mask, linewidths=0.5)
+    plt.title('Correlation Heatmap of Numerical Features')
+
+def blood_pressure(df):
+    plt, sns = _plotting()
+    plt.figure(figsize=(10, 6))
+    scatter = sns.scatterplot(data=df, x='sysBP', y='diaBP', hue='TenYearCHD',
+                              palette=CLASS_PALETTE, alpha=0.7, s=80)
+    plt.title('Blood Pressure by Heart Disease Risk')
+    plt.xlabel('Systolic Blood Pressure (mmHg)')
+    plt.ylabel('Diastolic Blood Pressure (mmHg)')
+
+    # Add a line for hypertension threshold
+    plt.axhline(y=90, color='#FF9800', linestyle='--', alpha=0.7, label='Hypertension Threshold (90 mmHg)')
+    plt.axvline(x=140, color='#FF9800', linestyle='--', alpha=0.7, label='Hypertension Threshold (140 mmHg)')
+
+    # Add legend
+    handles, labels = scatter.get_legend_handles_labels()
+    plt.legend(handles=handles, labels=['No Heart Disease', 'Heart Disease', 'Hypertension Threshold'])
+
+def feature_importance(feature_names, importances):
+    plt, _ = _plotting()
+    # Sort features by importance
+    indices = np.argsort(importances)[-10:]  # Top 10 features
+
+    plt.figure(figsize=(10, 8))
+    plt.barh(range(len(indices)), importances[indices], align='center', color='#2196F3')
+    plt.yticks(range(len(indices)), [feature_names[i] for i in indices])
+    plt.xlabel('Relative Importance')
+    plt.title('Top 10 Most Important Features for Heart Disease Prediction')
+
+def _stacked_percentages(crosstab, title, xlabel, figsize):
+    plt, _ = _plotting()
+    plt.figure(figsize=figsize)
+    ax = crosstab.plot(kind='bar', stacked=True, color=CLASS_PALETTE)
+
+    # Add percentage labels
+    for i, (no_hd, hd) in enumerate(zip(crosstab['No Heart Disease'], crosstab['Heart Disease'])):
+        total = no_hd + hd
+        pct_no_hd = no_hd / total * 100
+        pct_hd = hd / total * 100
+
+        ax.text(i, no_hd/2, f"{pct_no_hd:.1f}%", ha='center', va='center', color='white', fontweight='bold')
+        ax.text(i, no_hd + hd/2, f"{pct_hd:.1f}%", ha='center', va='center', color='white', fontweight='bold')
+
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel('Count')
+
+def smoking_status(df):
+    smoking_chd = pd.crosstab(df['is_smoking'], df['TenYearCHD'])
+    smoking_chd.columns = ['No Heart Disease', 'Heart Disease']
+    smoking_chd.index = ['Non-Smoker', 'Smoker']
+    _stacked_percentages(smoking_chd, 'Smoking Status by Heart Disease Risk', 'Smoking Status', (10, 6))
+
+def roc_curve(fpr, tpr, roc_auc):
+    plt, _ = _plotting()
+    plt.figure(figsize=(8, 8))
+    plt.plot(fpr, tpr, color='#2196F3', lw=2, label=f'ROC curve (AUC = {roc_auc:.2f})')
+    plt.plot([0, 1], [0, 1], color='#9E9E9E', lw=2, linestyle='--', label='Random Guess')
+    plt.xlim([0.0, 1.0])
+    plt.ylim([0.0, 1.05])
+    plt.xlabel('False Positive Rate')
+    plt.ylabel('True Positive Rate')
+    plt.title('Receiver Operating Characteristic (ROC) Curve')
+    plt.legend(loc='lower right')
+    plt.grid(True, linestyle='--', alpha=0.7)
+
+def precision_recall_curve(precision, recall):
+    plt, _ = _plotting()
+    plt.figure(figsize=(8, 8))
+    plt.plot(recall, precision, color='#FF9800', lw=2)
+    plt.xlabel('Recall')
+    plt.ylabel('Precision')
+    plt.title('Precision-Recall Curve')
+    plt.grid(True, linestyle='--', alpha=0.7)
+
+def age_vs_cholesterol(df):
+    plt, sns = _plotting()
+    plt.figure(figsize=(10, 6))
+    scatter = sns.scatterplot(data=df, x='age', y='totChol', hue='TenYearCHD',
+                              palette=CLASS_PALETTE, alpha=0.7, s=80)
+    plt.title('Age vs. Total Cholesterol by Heart Disease Risk')
+    plt.xlabel('Age')
+    plt.ylabel('Total Cholesterol (mg/dL)')
+
+    # Add a line for high cholesterol threshold
+    plt.axhline(y=240, color='#FF9800', linestyle='--', alpha=0.7, label='High Cholesterol Threshold (240 mg/dL)')
+
+    # Add legend
+    handles, labels = scatter.get_legend_handles_labels()
+    plt.legend(handles=handles, labels=['No Heart Disease', 'Heart Disease', 'High Cholesterol Threshold'])
+
+def bmi_distribution(df):
+    plt, sns = _plotting()
+    plt.figure(figsize=(10, 6))
+    sns.histplot(data=df, x='BMI', hue='TenYearCHD', kde=True, bins=20, palette=CLASS_PALETTE)
+
+    # Add vertical lines for BMI categories
+    plt.axvline(x=18.5, color='#2196F3', linestyle='--', alpha=0.7, label='Underweight/Normal')
+    plt.axvline(x=25, color='#FF9800', linestyle='--', alpha=0.7, label='Normal/Overweight')
+    plt.axvline(x=30, color='#F44336', linestyle='--', alpha=0.7, label='Overweight/Obese')
+
+    plt.title('BMI Distribution by Heart Disease Risk')
+    plt.xlabel('Body Mass Index (BMI)')
+    plt.ylabel('Count')
+    plt.legend(title='Heart Disease Risk')
+
+def diabetes_heart_disease(df):
+    diabetes_chd = pd.crosstab(df['diabetes'], df['TenYearCHD'])
+    diabetes_chd.columns = ['No Heart Disease', 'Heart Disease']
+    diabetes_chd.index = ['No Diabetes', 'Diabetes']
+    _stacked_percentages(diabetes_chd, 'Diabetes Status by Heart Disease Risk', 'Diabetes Status', (8, 6))
+
+def _update_hash(hasher, value):
+    """
+    Feed one chart input into the hash in a stable, content-based way
+    """
+    if isinstance(value, pd.DataFrame):
+        hasher.update(json.dumps([str(c) for c in value.columns]).encode())
+        hasher.update(json.dumps([str(t) for t in value.dtypes]).encode())
+        hasher.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, (np.ndarray, list, tuple)):
+        array = np.asarray(value)
+        hasher.update(f'{array.dtype.str}{array.shape}'.encode())
+        hasher.update(array.tobytes() if array.dtype != object else repr(array.tolist()).encode())
+    else:
+        hasher.update(repr(value).encode())
+
+def inputs_hash(render, inputs, params):
+    """
+    Hash of everything a chart depends on
+
+    Args:
+        render: The chart's render function (its source is part of the hash)
+        inputs: Keyword arguments passed to render
+        params: Output parameters such as the file name and dpi
+
+    Returns:
+        digest: Hex digest
+    """
+    hasher = hashlib.sha256()
+    # Shared styling and helpers count as part of every chart
+    for function in (_plotting, _stacked_percentages, render):
+        hasher.update(inspect.getsource(function).encode())
+    hasher.update(json.dumps(params, sort_keys=True).encode())
+    for name in sorted(inputs):
+        hasher.update(name.encode())
+        _update_hash(hasher, inputs[name])
+    return hasher.hexdigest()
+
+def read_png_text(path):
+    """
+    Text chunks of a PNG file, read without decoding the image
+
+    Returns:
+        text: Dictionary of keyword -> text, empty if the file is missing or not a PNG
+    """
+    text = {}
+    try:
+        with open(path, 'rb') as f:
+            if f.read(8) != PNG_SIGNATURE:
+                return text
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    break
+                length, kind = struct.unpack('>I4s', header)
+                if kind == b'tEXt':
+                    keyword, _, value = f.read(length).partition(b'\0')
+                    text[keyword.decode('latin-1')] = value.decode('latin-1')
+                    f.seek(4, os.SEEK_CUR)
+                elif kind in (b'IDAT', b'IEND'):
+                    # Text chunks written by matplotlib come before the image data
+                    break
+                else:
+                    f.seek(length + 4, os.SEEK_CUR)
+    except OSError:
+        pass
+    return text
+
+def _render_task(render, inputs, path, dpi, digest):
+    """
+    Draw one chart and write it atomically, tagged with its inputs hash
+
+    Returns:
+        timing: Dictionary with the wall and CPU seconds spent rendering and saving, and the
+            rendering process's peak resident memory in MB while it did
+    """
+    # One-time matplotlib import and styling is not counted against the chart
+    plt, _ = _plotting()
+    reset_peak_rss()
+    cpu = time.process_time()
+    start = time.perf_counter()
+    try:
+        render(**inputs)
+        plt.tight_layout()
+        temporary = f'{path}.tmp.{os.getpid()}.png'
+        plt.savefig(temporary, dpi=dpi, bbox_inches='tight', metadata={HASH_KEY: digest})
+        os.replace(temporary, path)
+    finally:
+        plt.close('all')
+    return {'seconds': time.perf_counter() - start, 'cpu_seconds': time.process_time() - cpu,
+            'peak_rss_mb': peak_rss_mb()}
+
+def render_charts(tasks, output_dir=OUTPUT_DIR, dpi=CHART_DPI, workers=None, force=False):
+    """
+    Render the charts whose inputs changed, in parallel
+
+    Args:
+        tasks: List of (file name, render function, inputs dict) tuples
+        output_dir: Directory the PNG files are written to
+        dpi: Output resolution
+        workers: Number of worker processes (defaults to the CPU count; 1 renders in this process)
+        force: Re-render every chart even if its inputs are unchanged
+
+    Returns:
+        report: List of {'chart', 'status', 'seconds', 'cpu_seconds', 'peak_rss_mb'} dictionaries
+            in task order, where status is 'rendered', 'unchanged' or 'failed' (failed entries also
+            carry 'error')
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    report, pending = [], []
+    for filename, render, inputs in tasks:
+        path = os.path.join(output_dir, filename)
+        digest = inputs_hash(render, inputs, {'file': filename, 'dpi': dpi})
+        entry = {'chart': filename, 'status': 'unchanged', 'seconds': 0.0, 'cpu_seconds': 0.0, 'peak_rss_mb': None}
+        report.append(entry)
+        if force or read_png_text(path).get(HASH_KEY) != digest:
+            pending.append((entry, (render, inputs, path, dpi, digest)))
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    if workers <= 1:
+        for entry, args in pending:
+            _record(entry, _call(_render_task, args))
+    else:
+        # Spawned workers import only this module, not the caller's Flask app or training state
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [(entry, pool.submit(_call, _render_task, args)) for entry, args in pending]
+            for entry, future in futures:
+                _record(entry, future.result())
+    return report
+
+def _call(function, args):
+    """
+    Run a task, returning (result, None) or (None, error message) instead of raising
+    """
+    try:
+        return function(*args), None
+    except Exception as e:
+        return None, str(e)
+
+def _record(entry, outcome):
+    timing, error = outcome
+    if error is None:
+        entry['status'] = 'rendered'
+        entry.update(timing)
+    else:
+        entry['status'] = 'failed'
+        entry['error'] = error
+
+def print_report(report, wall_seconds=None):
+    """
+    Print the per-chart timing report
+
+    Args:
+        report: List returned by render_charts
+        wall_seconds: Elapsed time of the whole run, printed if given
+    """
+    print(f"{'chart':<32}{'status':<11}{'seconds':>8}{'cpu s':>8}{'peak MB':>9}")
+    for entry in report:
+        peak = f"{entry['peak_rss_mb']:>9.1f}" if entry.get('peak_rss_mb') is not None else ''
+        print(f"{entry['chart']:<32}{entry['status']:<11}{entry['seconds']:>8.2f}"
+              f"{entry.get('cpu_seconds', 0.0):>8.2f}{peak}")
+        if entry['status'] == 'failed':
+            print(f"  {entry['error']}")
+    print(f"{'total render time':<43}{sum(entry['seconds'] for entry in report):>8.2f}")
+    if wall_seconds is not None:
+        print(f"{'wall time':<43}{wall_seconds:>8.2f}")
@@ -1,13 +1,14 @@
-import pandas as pd
+from dataset import load_dataset
 
 # Load the dataset
-df = pd.read_csv('train_updated.csv')
+df = load_dataset('train_updated.csv')
 
 # Print basic information
 print(f"Dataset shape: {df.shape}")
-print("\nColumn names:")
+print(f"Memory usage: {df.memory_usage(deep=True).sum() / 1024:.1f} KB")
+print("\nColumns and dtypes:")
 for col in df.columns:
-    print(f"- {col}")
+    print(f"- {col}: {df[col].dtype}")
 
 print("\nMissing values:")
 print(df.isnull().sum())
@@ -0,0 +1,212 @@
+"""
+Materialized cohort aggregate cube
+
+The dataset is aggregated once into a small dense cube over age band ×
+sex × smoking × hypertension × diabetes (4 × 2 × 2 × 2 × 2 = 64 cells).
+Each cell holds the patient count, the number of heart disease cases and,
+per numerical feature, the sum and count of non-missing values. Any
+slice or roll-up is a sum over a few axes of these arrays, and rates and
+means are derived from the summed counts, so they stay exact after
+rolling up. Training saves the cube next to the model
+(heart_disease_model.cohorts.npz), so workers load it instead of
+aggregating the dataset.
+"""
+
+import itertools
+import os
+
+import numpy as np
+
+from dataset import load_columns, DATASET_PATH, NUMERICAL_FEATURES
+from population import AGE_BAND_EDGES, TARGET, age_band, save_arrays, load_arrays
+
+DEFAULT_COHORTS_PATH = 'heart_disease_model.cohorts.npz'
+
+AGE_BAND_LABELS = [age_band(edge)[1] for edge in [AGE_BAND_EDGES[0] - 1] + AGE_BAND_EDGES]
+
+# Cube axes in order, and the values along each one
+DIMENSIONS = ['age_band', 'sex', 'is_smoking', 'prevalentHyp', 'diabetes']
+DIMENSION_VALUES = {
+    'age_band': AGE_BAND_LABELS,
+    'sex': [0, 1],
+    'is_smoking': [0, 1],
+    'prevalentHyp': [0, 1],
+    'diabetes': [0, 1]
+}
+
+class CohortCube:
+    """
+    Patient counts, heart disease cases and feature sums per cohort
+    """
+
+    def __init__(self, columns, features=NUMERICAL_FEATURES, version=None):
+        """
+        Args:
+            columns: Dictionary of column name -> array with the dimension columns ('age'
+                for the age band), the target and the features
+            features: Numerical features whose means are kept
+            version: Dataset version the cube was built from
+        """
+        self.features = list(features)
+        self.version = version
+        age = np.asarray(columns['age'], dtype=np.float64)
+        codes = [np.searchsorted(AGE_BAND_EDGES, age, side='right')]
+        codes += [np.asarray(columns[dimension], dtype=np.float64) for dimension in DIMENSIONS[1:]]
+        # Rows missing a dimension value belong to no cohort. searchsorted puts a
+        # missing age in the last band, so the age is checked before banding.
+        valid = ~np.isnan(age) & np.all([~np.isnan(code) for code in codes[1:]], axis=0)
+        self.excluded = int(len(valid) - valid.sum())
+
+        shape = tuple(len(DIMENSION_VALUES[dimension]) for dimension in DIMENSIONS)
+        cells = np.ravel_multi_index([code[valid].astype(np.intp) for code in codes], shape)
+        size = int(np.prod(shape))
+
+        # All measures stacked on the last axis: count, cases, then the sum and the
+        # non-missing count of each feature, so a query is one take and one sum
+        n = len(self.features)
+        self.measures = np.zeros(shape + (2 + 2 * n,))
+        self.measures[..., 0] = np.bincount(cells, minlength=size).reshape(shape)
+        target = np.asarray(columns[TARGET], dtype=np.float64)[valid]
+        self.measures[..., 1] = np.bincount(cells, weights=target, minlength=size).reshape(shape)
+        for i, feature in enumerate(self.features):
+            values = np.asarray(columns[feature], dtype=np.float64)[valid]
+            present = ~np.isnan(values)
+            self.measures[..., 2 + i] = np.bincount(cells, weights=np.where(present, values, 0.0),
+                                                    minlength=size).reshape(shape)
+            self.measures[..., 2 + n + i] = np.bincount(cells, weights=present, minlength=size).reshape(shape)
+
+    @classmethod
+    def from_dataset(cls, dataset_path=DATASET_PATH, version=None, features=NUMERICAL_FEATURES):
+        """
+        Build the cube from the dataset's column cache
+        """
+        names = list(dict.fromkeys(['age'] + DIMENSIONS[1:] + [TARGET] + list(features)))
+        return cls(load_columns(dataset_path, names, exact=True), features, version)
+
+    def save(self, path=DEFAULT_COHORTS_PATH, model_path='heart_disease_model.pkl'):
+        """
+        Write the cube next to the model it was built for
+        """
+        save_arrays({
+            'measures': self.measures,
+            'features': np.array(self.features),
+            'version': np.array(self.version or ''),
+            'excluded': np.array(self.excluded)
+        }, path, model_path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_COHORTS_PATH, model_path='heart_disease_model.pkl'):
+        """
+        The cube saved for the current model artifact, or None
+        """
+        arrays = load_arrays(path, model_path)
+        if arrays is None:
+            return None
+        cube = cls.__new__(cls)
+        cube.measures = arrays['measures']
+        cube.features = arrays['features'].tolist()
+        cube.version = str(arrays['version']) or None
+        cube.excluded = int(arrays['excluded'])
+        return cube
+
+    @staticmethod
+    def parse_filters(raw):
+        """
+        Validate filters given as strings, e.g. from query parameters
+
+        Args:
+            raw: Dictionary of dimension -> list of value strings
+
+        Returns:
+            filters: Dictionary of dimension -> list of values
+
+        Raises:
+            ValueError: For unknown dimensions or values
+        """
+        filters = {}
+        for dimension, values in raw.items():
+            if dimension not in DIMENSION_VALUES:
+                raise ValueError(f"Unknown dimension '{dimension}', expected one of {DIMENSIONS}")
+            allowed = DIMENSION_VALUES[dimension]
+            parsed = []
+            for value in values:
+                if dimension == 'age_band':
+                    # An unescaped '+' in a query string arrives as a space ('60+' -> '60 ')
+                    value = value.replace(' ', '+')
+                elif value in ('0', '1'):
+                    value = int(value)
+                if value not in allowed:
+                    raise ValueError(f"'{dimension}' must be one of {allowed}")
+                parsed.append(value)
+            # Repeated values would be summed twice; keep each once, in axis order
+            filters[dimension] = [value for value in allowed if value in parsed]
+        return filters
+
+    def query(self, filters=None, group_by=()):
+        """
+        Aggregate the cohorts that match the filters, grouped by some dimensions
+
+        Args:
+            filters: Dictionary of dimension -> list of values to keep (others are summed over)
+            group_by: Dimensions to break the result down by; all others are rolled up
+
+        Returns:
+            groups: List of {dimension values..., 'count', 'cases', 'chd_rate', 'means'} dictionaries,
+                one per combination of the group_by values
+        """
+        filters = filters or {}
+        for dimension in group_by:
+            if dimension not in DIMENSION_VALUES:
+                raise ValueError(f"Unknown dimension '{dimension}', expected one of {DIMENSIONS}")
+
+        data = self.measures
+        for axis, dimension in enumerate(DIMENSIONS):
+            if dimension in filters:
+                data = data.take([DIMENSION_VALUES[dimension].index(v) for v in filters[dimension]], axis=axis)
+        kept = [d for d in DIMENSIONS if d in group_by]
+        data = data.sum(axis=tuple(axis for axis, d in enumerate(DIMENSIONS) if d not in group_by))
+
+        n = len(self.features)
+        data = data.reshape(-1, 2 + 2 * n)
+        counts, cases = data[:, 0], data[:, 1]
+        sums, present = data[:, 2:2 + n], data[:, 2 + n:]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates = (cases / counts).tolist()
+            means = (sums / present).tolist()
+        empty = (present == 0).any(axis=1).tolist()
+
+        labels = [filters.get(d, DIMENSION_VALUES[d]) for d in kept]
+        groups = []
+        for i, values in enumerate(itertools.product(*labels)):
+            group = dict(zip(kept, values))
+            group['count'] = int(counts[i])
+            group['cases'] = int(cases[i])
+            group['chd_rate'] = rates[i] if counts[i] else None
+            if empty[i]:
+                # No values to average: null rather than NaN, which is not valid JSON
+                group['means'] = {f: (m if p else None) for f, m, p in zip(self.features, means[i], present[i])}
+            else:
+                group['means'] = dict(zip(self.features, means[i]))
+            groups.append(group)
+        return groups
+
+def load_or_build_cube(path=DEFAULT_COHORTS_PATH, model_path='heart_disease_model.pkl',
+                       dataset_path=DATASET_PATH, version=None):
+    """
+    Load the cohort cube, rebuilding it from the dataset if it belongs to another model
+
+    Like the statistics snapshot, a rebuilt cube is saved only when the model exists.
+
+    Args:
+        version: Dataset version recorded in a rebuilt cube
+
+    Returns:
+        cube: CohortCube
+    """
+    cube = CohortCube.load(path, model_path)
+    if cube is not None:
+        return cube
+    cube = CohortCube.from_dataset(dataset_path, version=version)
+    if os.path.exists(model_path):
+        cube.save(path, model_path)
+    return cube
@@ -0,0 +1,286 @@
+"""
+Columnar cache of the heart disease dataset
+
+train_updated.csv is parsed once and written as one .npy file per column
+with explicit compact dtypes (int8 flags, float32 measurements) into
+train_updated.columns/. Later loads memory-map those files instead of
+re-parsing the CSV and inferring float64/int64 for everything. The cache
+records a hash of the CSV it was built from and is rebuilt when the CSV
+changes.
+
+float32 is only used for a column if its values come back exactly when
+widened to float64 and rounded to the column's number of decimal places,
+which load_dataset(exact=True) does for model training and evaluation:
+the forest's split thresholds sit between neighbouring training values,
+so even a one-ulp difference from the CSV's float64 values changes
+predictions.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+DATASET_PATH = 'train_updated.csv'
+
+# Storage dtype of each known column. Integer columns that contain missing
+# values are stored as float32 instead, so NaN survives the round trip, and
+# so are integer columns with fractional values; values outside the dtype's
+# range move the column to the next wider integer type instead of wrapping.
+# Unknown columns keep the dtype pandas infers.
+COLUMN_DTYPES = {
+    'id': np.int32,
+    'age': np.int8,
+    'education': np.int8,
+    'sex': np.int8,
+    'is_smoking': np.int8,
+    'cigsPerDay': np.float32,
+    'BPMeds': np.int8,
+    'prevalentStroke': np.int8,
+    'prevalentHyp': np.int8,
+    'diabetes': np.int8,
+    'totChol': np.float32,
+    'sysBP': np.float32,
+    'diaBP': np.float32,
+    'BMI': np.float32,
+    'heartRate': np.float32,
+    'glucose': np.float32,
+    'TenYearCHD': np.int8
+}
+
+# Model inputs by type, as preprocessed by model.create_preprocessing_pipeline()
+CATEGORICAL_FEATURES = ['education', 'sex', 'is_smoking', 'prevalentStroke', 'prevalentHyp', 'diabetes']
+NUMERICAL_FEATURES = ['age', 'cigsPerDay', 'BPMeds', 'totChol', 'sysBP', 'diaBP', 'BMI', 'heartRate', 'glucose']
+
+# Most decimal places a float32 column may have
+MAX_DECIMALS = 6
+
+# Integer storage dtypes, narrowest first
+INTEGER_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+
+def cache_dir_for(csv_path):
+    """
+    Directory of the column cache for a CSV file (train_updated.csv -> train_updated.columns)
+    """
+    return os.path.splitext(csv_path)[0] + '.columns'
+
+def source_hash(path):
+    """
+    SHA-256 of a file's contents, truncated to 16 hex characters
+    """
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(block)
+    return hasher.hexdigest()[:16]
+
+def _restore(values, decimals):
+    return np.round(values.astype(np.float64), decimals)
+
+def _float32_decimals(values):
+    """
+    Decimal places that make a float32 copy of values exact again, or None if there are none
+    """
+    values = np.asarray(values, dtype=np.float64)
+    compact = values.astype(np.float32)
+    for decimals in range(MAX_DECIMALS + 1):
+        if np.array_equal(_restore(compact, decimals), values, equal_nan=True):
+            return decimals
+    return None
+
+def _integer_dtype(values, dtype):
+    """
+    Narrowest integer dtype, no narrower than dtype, that holds every value exactly
+
+    Returns:
+        dtype: The integer dtype, or None if the values are not all whole numbers
+    """
+    if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return None
+    if pd.api.types.is_float_dtype(values) and not (values % 1 == 0).all():
+        return None
+    low, high = values.min(), values.max()
+    for candidate in INTEGER_DTYPES[INTEGER_DTYPES.index(dtype):]:
+        limits = np.iinfo(candidate)
+        if limits.min <= low and high <= limits.max:
+            return candidate
+    return None
+
+def _storage(column, values):
+    """
+    Storage dtype of a column and, for float32 columns, its decimal places
+    """
+    dtype = COLUMN_DTYPES.get(column)
+    if dtype is None:
+        return values.dtype, None
+    if np.issubdtype(dtype, np.integer):
+        if not pd.api.types.is_numeric_dtype(values):
+            # Not numbers at all, keep what pandas parsed
+            return values.dtype, None
+        if values.isna().any():
+            dtype = np.float32
+        else:
+            dtype = _integer_dtype(values, dtype) or np.float32
+    if dtype != np.float32:
+        return dtype, None
+    decimals = _float32_decimals(values)
+    if decimals is None:
+        # float32 would lose precision, keep the parsed float64 values
+        return np.float64, None
+    return dtype, decimals
+
+def build_column_cache(csv_path=DATASET_PATH, cache_dir=None):
+    """
+    Parse the CSV and write its columns as .npy files with compact dtypes
+
+    The cache is built in a temporary directory next to the destination and
+    swapped in with os.replace, so readers never see a partial cache. A
+    previous cache is moved aside first and removed afterwards; processes
+    that still memory-map its files keep reading them.
+
+    Args:
+        csv_path: Source CSV file
+        cache_dir: Destination directory (defaults to cache_dir_for(csv_path))
+
+    Returns:
+        source: The recorded source signature (hash, size and mtime of the CSV)
+    """
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    stat = os.stat(csv_path)
+    source = {'sha256': source_hash(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    df = pd.read_csv(csv_path)
+
+    parent = os.path.dirname(os.path.abspath(cache_dir))
+    staging = tempfile.mkdtemp(prefix=os.path.basename(cache_dir) + '.tmp', dir=parent)
+    retired = staging + '.old'
+    try:
+        decimals = {}
+        for index, column in enumerate(df.columns):
+            dtype, places = _storage(column, df[column])
+            np.save(os.path.join(staging, f'{index:03d}.npy'), df[column].to_numpy(dtype=dtype))
+            if places is not None:
+                decimals[column] = places
+        _write_source(staging, dict(source, columns=list(df.columns), decimals=decimals))
+
+        # os.replace cannot overwrite a non-empty directory, so the old cache is
+        # moved aside and the new one takes its name, each in a single rename
+        if os.path.exists(cache_dir):
+            os.replace(cache_dir, retired)
+        os.replace(staging, cache_dir)
+    except OSError:
+        # Another process may have published the cache first
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.exists(cache_dir):
+            raise
+    finally:
+        shutil.rmtree(retired, ignore_errors=True)
+    return source
+
+def _write_source(directory, source):
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix='.source-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(source, f)
+    os.replace(temporary, os.path.join(directory, 'source.json'))
+
+def _read_source(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'source.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def column_cache_current(csv_path=DATASET_PATH, cache_dir=None):
+    """
+    Whether the column cache exists and was built from the current CSV
+
+    Size and mtime are checked first; the file is only hashed when they
+    differ (for example after a fresh checkout), so an unchanged CSV with a
+    new timestamp does not force a rebuild.
+    """
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    source = _read_source(cache_dir)
+    if source is None:
+        return False
+    stat = os.stat(csv_path)
+    if (stat.st_size, stat.st_mtime_ns) == (source['size'], source['mtime_ns']):
+        return True
+    if stat.st_size != source['size'] or source_hash(csv_path) != source['sha256']:
+        return False
+    # Same contents: remember the new mtime so the file is not hashed again
+    try:
+        _write_source(cache_dir, dict(source, mtime_ns=stat.st_mtime_ns))
+    except OSError:
+        pass
+    return True
+
+def dataset_version(csv_path=DATASET_PATH, cache_dir=None):
+    """
+    Content hash of the CSV, taken from the column cache when it is current
+    """
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    if column_cache_current(csv_path, cache_dir):
+        return _read_source(cache_dir)['sha256']
+    return source_hash(csv_path)
+
+def load_columns(csv_path=DATASET_PATH, columns=None, cache_dir=None, mmap_mode='r', exact=False):
+    """
+    Memory-mapped column arrays, building or rebuilding the cache first if needed
+
+    Args:
+        csv_path: Source CSV file
+        columns: Names of the columns to load (defaults to all of them)
+        cache_dir: Cache directory (defaults to cache_dir_for(csv_path))
+        mmap_mode: np.load memory-mapping mode; None reads the arrays into memory
+        exact: Return float32 columns as float64 arrays with exactly the CSV's values
+            (new in-memory arrays rather than memory maps)
+
+    Returns:
+        arrays: Dictionary of column name -> array, in the requested order
+    """
+    cache_dir = cache_dir or cache_dir_for(csv_path)
+    if not column_cache_current(csv_path, cache_dir):
+        build_column_cache(csv_path, cache_dir)
+    source = _read_source(cache_dir)
+    stored = source['columns']
+
+    wanted = stored if columns is None else columns
+    missing = [column for column in wanted if column not in stored]
+    if missing:
+        raise KeyError(f"Columns not in {csv_path}: {missing}")
+    arrays = {column: np.load(os.path.join(cache_dir, f'{stored.index(column):03d}.npy'), mmap_mode=mmap_mode)
+              for column in wanted}
+    if exact:
+        for column, decimals in source['decimals'].items():
+            if column in arrays:
+                arrays[column] = _restore(arrays[column], decimals)
+    return arrays
+
+def load_dataset(csv_path=DATASET_PATH, columns=None, cache_dir=None, exact=False):
+    """
+    Load the dataset as a DataFrame from the column cache
+
+    Replaces pd.read_csv(csv_path), with the compact dtypes of COLUMN_DTYPES
+    and without parsing the CSV after the first load. The frame is built
+    without copying the column arrays, so its columns stay memory-mapped
+    (read-only) unless exact=True widened them into new arrays.
+
+    Args:
+        csv_path: Source CSV file
+        columns: Names of the columns to load (defaults to all of them)
+        cache_dir: Cache directory (defaults to cache_dir_for(csv_path))
+        exact: Widen float32 columns back to the CSV's exact float64 values,
+            for training and scoring the model
+
+    Returns:
+        df: DataFrame with one column per loaded array
+    """
+    # copy=False also keeps pandas from consolidating the columns into 2D blocks
+    return pd.DataFrame(load_columns(csv_path, columns, cache_dir, exact=exact), copy=False)
+
+if __name__ == '__main__':
+    source = build_column_cache()
+    print(f"Built column cache {cache_dir_for(DATASET_PATH)} from {DATASET_PATH} ({source['sha256']})")
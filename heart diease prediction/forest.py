@@ -0,0 +1,408 @@
+"""
+Array-backed RandomForest inference engine
+
+All trees of a fitted RandomForestClassifier are flattened into contiguous
+node arrays (feature, threshold, children, leaf class probabilities), and
+rows are pushed through them one tree level per step using vectorized
+NumPy gathers instead of sklearn's per-estimator Python loop and joblib
+dispatch.
+
+That dispatch is what dominates small inputs: sklearn's predict_proba
+costs about 10 ms for one row, while walking all trees together costs
+about 0.3 ms, and stays cheaper up to about 160 rows (SMALL_BATCH_ROWS).
+/predict scores through predict_proba_row (see inference.py),
+micro-batches go through predict_proba_rows, and predict_proba uses the
+same path for small inputs. For larger matrices sklearn's Cython tree
+walk is faster than the tree-major NumPy traversal (about 58k against
+34k rows/s at 100k rows), so the app scores larger batches with the
+sklearn forest even when it serves from the memory-mapped array store.
+
+The node arrays can be saved as one .npy file per array and loaded back
+with memory mapping, so every worker process serving the model shares a
+single physical copy through the page cache.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+
+# Array store written next to heart_disease_model.pkl
+DEFAULT_ARRAYS_DIR = 'heart_disease_model.arrays'
+
+# Node arrays saved by CompiledForest.save(), one .npy file each
+ARRAY_NAMES = ['feature', 'threshold', 'children', 'is_leaf', 'value', 'roots']
+
+# Number of rows traversed together; keeps the per-tree working set in cache
+DEFAULT_CHUNK_SIZE = 16384
+
+# Tree levels between compactions of the set of rows still descending
+COMPACT_EVERY = 4
+
+# Inputs up to this many rows walk all trees together (predict_proba_rows); measured
+# crossover with sklearn's predict_proba, see benchmarks/bench_forest.py
+SMALL_BATCH_ROWS = 160
+
+class CompiledForest:
+    """
+    Flattened RandomForestClassifier that scores preprocessed feature matrices
+    """
+
+    def __init__(self, classifier, dtype=np.float64):
+        """
+        Args:
+            classifier: Fitted RandomForestClassifier
+            dtype: np.float64 or np.float32 for thresholds and leaf probabilities.
+                float32 shrinks the threshold and leaf arrays; split decisions stay
+                identical to sklearn, probabilities agree to float32 precision.
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in (np.dtype(np.float64), np.dtype(np.float32)):
+            raise ValueError('dtype must be float64 or float32')
+
+        trees = [estimator.tree_ for estimator in classifier.estimators_]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError('Only single-output forests are supported')
+
+        n_classes = int(classifier.n_classes_)
+        node_counts = np.array([tree.node_count for tree in trees], dtype=np.intp)
+        offsets = np.concatenate([[0], np.cumsum(node_counts)[:-1]]).astype(np.intp)
+
+        features, thresholds, children, leaves, values = [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            leaf = tree.children_left == -1
+            node = np.arange(tree.node_count) + offset
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            # Children interleaved as [left, right] per node so one gather picks the branch;
+            # leaves point to themselves and stay put once reached
+            pair = np.empty(2 * tree.node_count, dtype=np.intp)
+            pair[0::2] = np.where(leaf, node, tree.children_left + offset)
+            pair[1::2] = np.where(leaf, node, tree.children_right + offset)
+            children.append(pair)
+            leaves.append(leaf)
+            # Leaf class distributions, normalized per node as in DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :n_classes]
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+        threshold = np.concatenate(thresholds)
+        if dtype == np.float32:
+            # Round thresholds down to the nearest float32 so `x > t` on float32
+            # inputs gives exactly the same split decisions as the float64 threshold
+            threshold32 = threshold.astype(np.float32)
+            too_high = threshold32.astype(np.float64) > threshold
+            threshold32[too_high] = np.nextafter(threshold32[too_high], np.float32(-np.inf))
+            threshold = threshold32
+
+        self.feature = np.ascontiguousarray(np.concatenate(features), dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold)
+        self.children = np.ascontiguousarray(np.concatenate(children), dtype=np.intp)
+        self.is_leaf = np.concatenate(leaves)
+        self.value = np.ascontiguousarray(np.concatenate(values), dtype=dtype)
+        self.roots = offsets
+        self.depths = [int(tree.max_depth) for tree in trees]
+        self.max_depth = max(self.depths)
+        self.n_trees = len(trees)
+        self.n_features_in_ = int(classifier.n_features_in_)
+        self.classes_ = classifier.classes_
+        self.dtype = dtype
+
+    @property
+    def nbytes(self):
+        """
+        Total size of the flattened node arrays in bytes
+        """
+        return sum(array.nbytes for array in (self.feature, self.threshold, self.children,
+                                                self.is_leaf, self.value))
+
+    def _traverse(self, X_flat, row_offsets, root, depth):
+        """
+        Push all rows through one tree, one level per step
+
+        Returns:
+            nodes: Global leaf index reached by each row
+        """
+        current = np.full(row_offsets.size, root, dtype=np.intp)
+        nodes, active = current, None
+        for level in range(depth):
+            if level and level % COMPACT_EVERY == 0:
+                # Drop rows that already sit on a leaf from the working set
+                keep = np.flatnonzero(~self.is_leaf[current])
+                if active is None:
+                    nodes, active = current, keep
+                else:
+                    nodes[active] = current
+                    active = active[keep]
+                current = current[keep]
+                row_offsets = row_offsets[keep]
+                if current.size == 0:
+                    return nodes
+            go_right = X_flat[row_offsets + self.feature[current]] > self.threshold[current]
+            current = self.children[(current << 1) + go_right]
+        if active is None:
+            return current
+        nodes[active] = current
+        return nodes
+
+    def predict_proba_row(self, x):
+        """
+        Class probabilities for a single preprocessed row, walking all trees together
+
+        Args:
+            x: float32 array of shape (n_features,)
+
+        Returns:
+            proba: Array of shape (n_classes,)
+        """
+        nodes = self.roots.copy()
+        for level in range(self.max_depth):
+            if level and level % COMPACT_EVERY == 0 and self.is_leaf[nodes].all():
+                break
+            # Leaves point to themselves, so finished trees simply stay put
+            nodes = self.children[(nodes << 1) + (x[self.feature[nodes]] > self.threshold[nodes])]
+        # cumsum adds the trees in order, matching sklearn's accumulation exactly
+        return np.cumsum(self.value[nodes], axis=0, dtype=np.float64)[-1] / self.n_trees
+
+    def predict_proba_rows(self, X):
+        """
+        Class probabilities for a small batch of preprocessed rows, walking all trees together
+
+        Cheaper per row than predict_proba_row for a few dozen rows; for
+        large matrices the tree-major predict_proba is faster.
+
+        Args:
+            X: float32 array of shape (n_rows, n_features)
+
+        Returns:
+            proba: Array of shape (n_rows, n_classes)
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        X_flat = X.ravel()
+        row_offsets = (np.arange(X.shape[0], dtype=np.intp) * X.shape[1])[:, np.newaxis]
+        nodes = np.repeat(self.roots[np.newaxis, :], X.shape[0], axis=0)
+        for level in range(self.max_depth):
+            if level and level % COMPACT_EVERY == 0 and self.is_leaf[nodes].all():
+                break
+            go_right = X_flat[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[(nodes << 1) + go_right]
+        return np.cumsum(self.value[nodes], axis=1, dtype=np.float64)[:, -1] / self.n_trees
+
+    def save(self, directory):
+        """
+        Write the node arrays as uncompressed .npy files plus a small metadata file
+
+        Args:
+            directory: Existing directory to write into
+        """
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        meta = {
+            'depths': self.depths,
+            'n_features_in': self.n_features_in_,
+            'classes': self.classes_.tolist(),
+            'dtype': self.dtype.name
+        }
+        with open(os.path.join(directory, 'forest.json'), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Load node arrays written by save()
+
+        Args:
+            directory: Directory containing the .npy files
+            mmap_mode: np.load memory-mapping mode, or None to read the arrays into memory
+
+        Returns:
+            forest: CompiledForest backed by the mapped files
+        """
+        with open(os.path.join(directory, 'forest.json'), 'r') as f:
+            meta = json.load(f)
+
+        forest = cls.__new__(cls)
+        for name in ARRAY_NAMES:
+            # asarray drops the np.memmap subclass but keeps the mapped buffer
+            setattr(forest, name, np.asarray(np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)))
+        forest.depths = meta['depths']
+        forest.max_depth = max(forest.depths)
+        forest.n_trees = len(forest.depths)
+        forest.n_features_in_ = meta['n_features_in']
+        forest.classes_ = np.array(meta['classes'])
+        forest.dtype = np.dtype(meta['dtype'])
+        return forest
+
+    def apply(self, X):
+        """
+        Leaf node index reached by every row in every tree
+
+        Args:
+            X: float32 array of shape (n_rows, n_features)
+
+        Returns:
+            leaves: Array of shape (n_rows, n_trees) of global node indices
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        row_offsets = np.arange(X.shape[0], dtype=np.intp) * X.shape[1]
+        leaves = np.empty((X.shape[0], self.n_trees), dtype=np.intp)
+        for t, (root, depth) in enumerate(zip(self.roots, self.depths)):
+            leaves[:, t] = self._traverse(X.ravel(), row_offsets, root, depth)
+        return leaves
+
+    def predict_proba(self, X, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Class probabilities averaged over all trees
+
+        Args:
+            X: Preprocessed feature matrix of shape (n_rows, n_features)
+            chunk_size: Number of rows traversed at once
+
+        Returns:
+            proba: Array of shape (n_rows, n_classes)
+        """
+        if hasattr(X, 'toarray'):
+            X = X.toarray()
+        # Same input precision as sklearn's tree traversal
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected input with {self.n_features_in_} features")
+
+        if X.shape[0] <= SMALL_BATCH_ROWS:
+            return self.predict_proba_rows(X)
+
+        proba = np.zeros((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_size):
+            X_chunk = X[start:start + chunk_size]
+            X_flat = X_chunk.ravel()
+            row_offsets = np.arange(X_chunk.shape[0], dtype=np.intp) * X_chunk.shape[1]
+            chunk_proba = proba[start:start + chunk_size]
+            # Trees are visited one at a time so each tree's nodes stay in cache
+            for root, depth in zip(self.roots, self.depths):
+                chunk_proba += self.value[self._traverse(X_flat, row_offsets, root, depth)]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Predicted class labels
+
+        Args:
+            X: Preprocessed feature matrix of shape (n_rows, n_features)
+            chunk_size: Number of rows traversed at once
+
+        Returns:
+            labels: Array of shape (n_rows,)
+        """
+        return self.classes_.take(np.argmax(self.predict_proba(X, chunk_size), axis=1))
+
+class CompiledForestPipeline:
+    """
+    Fitted preprocessor followed by a CompiledForest, for scoring raw feature frames
+
+    named_steps mirrors sklearn's Pipeline so code that looks up
+    'preprocessor' and 'classifier' works with either.
+    """
+
+    def __init__(self, preprocessor, forest):
+        """
+        Args:
+            preprocessor: Fitted ColumnTransformer
+            forest: CompiledForest
+        """
+        self.preprocessor = preprocessor
+        self.forest = forest
+        self.classes_ = forest.classes_
+        self.named_steps = {'preprocessor': preprocessor, 'classifier': forest}
+
+    @classmethod
+    def from_pipeline(cls, pipeline, dtype=np.float64):
+        """
+        Args:
+            pipeline: Fitted Pipeline with 'preprocessor' and 'classifier' steps
+            dtype: Precision of the compiled forest, see CompiledForest
+        """
+        return cls(pipeline.named_steps['preprocessor'],
+                   CompiledForest(pipeline.named_steps['classifier'], dtype=dtype))
+
+    def predict_proba(self, X, chunk_size=DEFAULT_CHUNK_SIZE):
+        return self.forest.predict_proba(self.preprocessor.transform(X), chunk_size)
+
+    def predict(self, X, chunk_size=DEFAULT_CHUNK_SIZE):
+        return self.forest.predict(self.preprocessor.transform(X), chunk_size)
+
+def load_compiled_forest(model_path='heart_disease_model.pkl', dtype=np.float64):
+    """
+    Load the joblib model artifact and compile it for bulk scoring
+
+    Args:
+        model_path: Path to the saved sklearn pipeline
+        dtype: Precision of the compiled forest
+
+    Returns:
+        compiled: CompiledForestPipeline
+    """
+    return CompiledForestPipeline.from_pipeline(joblib.load(model_path), dtype=dtype)
+
+def _source_signature(model_path):
+    stat = os.stat(model_path)
+    return {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+def save_model_arrays(pipeline, model_path='heart_disease_model.pkl', directory=DEFAULT_ARRAYS_DIR):
+    """
+    Write the memory-mappable array store for a fitted pipeline
+
+    The store holds the preprocessor (small, joblib) and the flattened forest
+    (.npy per array). It records the size and mtime of model_path so a stale
+    store is detected after retraining. The store is built in a temporary
+    directory and renamed into place, so readers never see a partial store.
+
+    Args:
+        pipeline: Fitted Pipeline with 'preprocessor' and 'classifier' steps
+        model_path: The joblib artifact the store was built from
+        directory: Destination directory
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    staging = tempfile.mkdtemp(prefix='.arrays-', dir=parent)
+    try:
+        joblib.dump(pipeline.named_steps['preprocessor'], os.path.join(staging, 'preprocessor.pkl'))
+        CompiledForest(pipeline.named_steps['classifier']).save(staging)
+        with open(os.path.join(staging, 'source.json'), 'w') as f:
+            json.dump(_source_signature(model_path), f)
+
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.rename(staging, directory)
+    except OSError:
+        # Another process may have published the store first
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.exists(directory):
+            raise
+
+def model_arrays_current(model_path='heart_disease_model.pkl', directory=DEFAULT_ARRAYS_DIR):
+    """
+    Whether the array store exists and was built from the current model artifact
+    """
+    try:
+        with open(os.path.join(directory, 'source.json'), 'r') as f:
+            return json.load(f) == _source_signature(model_path)
+    except (OSError, ValueError):
+        return False
+
+def load_model_arrays(directory=DEFAULT_ARRAYS_DIR, mmap_mode='r'):
+    """
+    Load the array store as a CompiledForestPipeline with memory-mapped forest arrays
+
+    Args:
+        directory: Directory written by save_model_arrays()
+        mmap_mode: np.load memory-mapping mode
+
+    Returns:
+        compiled: CompiledForestPipeline
+    """
+    preprocessor = joblib.load(os.path.join(directory, 'preprocessor.pkl'))
+    return CompiledForestPipeline(preprocessor, CompiledForest.load(directory, mmap_mode=mmap_mode))
@@ -0,0 +1,203 @@
+// Charts.js - Small SVG charts drawn from the /api/charts/<name> JSON data
+const CHART_API = '/api/charts';
+const CHART_COLORS = ['#0d6efd', '#dc3545'];
+const CHART_WIDTH = 480;
+const CHART_HEIGHT = 300;
+const CHART_MARGIN = { top: 20, right: 20, bottom: 45, left: 50 };
+
+// Fetch one chart's data; the browser revalidates it with the ETag the API sends
+const useChartData = (name) => {
+    const [state, setState] = React.useState({ data: null, error: null });
+    React.useEffect(() => {
+        let cancelled = false;
+        fetch(`${CHART_API}/${name}`)
+            .then(response => response.ok ? response.json() : Promise.reject(new Error(`HTTP ${response.status}`)))
+            .then(body => { if (!cancelled) setState({ data: body.data, error: null }); })
+            .catch(error => { if (!cancelled) setState({ data: null, error: error.message }); });
+        return () => { cancelled = true; };
+    }, [name]);
+    return state;
+};
+
+const linearScale = (domainMin, domainMax, rangeMin, rangeMax) => (value) =>
+    rangeMin + (value - domainMin) / ((domainMax - domainMin) || 1) * (rangeMax - rangeMin);
+
+const innerWidth = CHART_WIDTH - CHART_MARGIN.left - CHART_MARGIN.right;
+const innerHeight = CHART_HEIGHT - CHART_MARGIN.top - CHART_MARGIN.bottom;
+
+const ChartFrame = ({ xLabel, yLabel, children }) => (
+    <svg viewBox={`0 0 ${CHART_WIDTH} ${CHART_HEIGHT}`} className="viz-img" role="img">
+        <g transform={`translate(${CHART_MARGIN.left},${CHART_MARGIN.top})`}>
+            {children}
+            <line x1={0} y1={innerHeight} x2={innerWidth} y2={innerHeight} stroke="#333" />
+            <line x1={0} y1={0} x2={0} y2={innerHeight} stroke="#333" />
+            <text x={innerWidth / 2} y={innerHeight + 38} textAnchor="middle" fontSize="12">{xLabel}</text>
+            <text transform={`translate(-38,${innerHeight / 2}) rotate(-90)`} textAnchor="middle" fontSize="12">{yLabel}</text>
+        </g>
+    </svg>
+);
+
+const Ticks = ({ values, scale, axis, format = (v) => v }) => values.map((value, i) => (
+    axis === 'x'
+        ? <text key={i} x={scale(value)} y={innerHeight + 16} textAnchor="middle" fontSize="10">{format(value)}</text>
+        : <text key={i} x={-6} y={scale(value) + 3} textAnchor="end" fontSize="10">{format(value)}</text>
+));
+
+const Legend = ({ labels }) => (
+    <div className="small text-center">
+        {labels.map((label, i) => (
+            <span key={label} className="me-3">
+                <span style={{ display: 'inline-block', width: 10, height: 10, background: CHART_COLORS[i], marginRight: 4 }}></span>
+                {label}
+            </span>
+        ))}
+    </div>
+);
+
+const ChartStatus = ({ error }) => (
+    <div className="viz-img bg-light p-5 text-center">
+        {error
+            ? <p className="text-danger mb-0"><i className="bi bi-exclamation-triangle"></i> Could not load chart data ({error})</p>
+            : <div className="spinner-border text-danger" role="status"><span className="visually-hidden">Loading...</span></div>}
+    </div>
+);
+
+const evenTicks = (min, max, count = 5) => Array.from({ length: count + 1 }, (_, i) => min + (max - min) * i / count);
+
+// Histogram with the two outcome classes stacked in each bin
+const StackedHistogram = ({ name, xLabel }) => {
+    const { data, error } = useChartData(name);
+    if (!data) return <ChartStatus error={error} />;
+    const totals = data.series[0].counts.map((count, i) => count + data.series[1].counts[i]);
+    const x = linearScale(data.edges[0], data.edges[data.edges.length - 1], 0, innerWidth);
+    const y = linearScale(0, Math.max(...totals), innerHeight, 0);
+    return (
+        <>
+            <ChartFrame xLabel={xLabel} yLabel="Count">
+                {data.series.map((series, s) => series.counts.map((count, i) => {
+                    const base = s === 0 ? 0 : data.series[0].counts[i];
+                    return <rect key={`${s}-${i}`} x={x(data.edges[i])} width={Math.max(x(data.edges[i + 1]) - x(data.edges[i]) - 1, 0)}
+                                 y={y(base + count)} height={y(base) - y(base + count)} fill={CHART_COLORS[s]} opacity={0.8}>
+                        <title>{`${series.label}, ${data.edges[i]}-${data.edges[i + 1]}: ${count}`}</title>
+                    </rect>;
+                }))}
+                <Ticks values={evenTicks(data.edges[0], data.edges[data.edges.length - 1])} scale={x} axis="x" format={(v) => Math.round(v)} />
+                <Ticks values={evenTicks(0, Math.max(...totals))} scale={y} axis="y" format={(v) => Math.round(v)} />
+            </ChartFrame>
+            <Legend labels={data.series.map(series => series.label)} />
+        </>
+    );
+};
+
+// 100% stacked bars of the outcome for each category of a binary risk factor
+const StackedPercentBars = ({ name, xLabel }) => {
+    const { data, error } = useChartData(name);
+    if (!data) return <ChartStatus error={error} />;
+    const band = innerWidth / data.categories.length;
+    const y = linearScale(0, 100, innerHeight, 0);
+    return (
+        <>
+            <ChartFrame xLabel={xLabel} yLabel="Percentage">
+                {data.percentages.map((row, c) => {
+                    let base = 0;
+                    return row.map((percentage, s) => {
+                        const bar = (
+                            <g key={`${c}-${s}`}>
+                                <rect x={c * band + band * 0.2} width={band * 0.6} y={y(base + percentage)}
+                                      height={y(base) - y(base + percentage)} fill={CHART_COLORS[s]} opacity={0.8}>
+                                    <title>{`${data.categories[c]}, ${data.columns[s]}: ${data.counts[c][s]}`}</title>
+                                </rect>
+                                <text x={c * band + band / 2} y={y(base + percentage / 2) + 4} textAnchor="middle" fontSize="11" fill="#fff">
+                                    {`${percentage.toFixed(1)}%`}
+                                </text>
+                            </g>
+                        );
+                        base += percentage;
+                        return bar;
+                    });
+                })}
+                {data.categories.map((category, c) => (
+                    <text key={category} x={c * band + band / 2} y={innerHeight + 16} textAnchor="middle" fontSize="11">{category}</text>
+                ))}
+                <Ticks values={evenTicks(0, 100)} scale={y} axis="y" />
+            </ChartFrame>
+            <Legend labels={data.columns} />
+        </>
+    );
+};
+
+// Diverging red/blue heatmap of the correlation matrix
+const CorrelationHeatmap = () => {
+    const { data, error } = useChartData('correlation');
+    if (!data) return <ChartStatus error={error} />;
+    const size = data.columns.length;
+    const labelSpace = 80;
+    const cell = (CHART_WIDTH - labelSpace) / size;
+    const color = (value) => value >= 0
+        ? `rgba(220, 53, 69, ${Math.abs(value)})`
+        : `rgba(13, 110, 253, ${Math.abs(value)})`;
+    return (
+        <svg viewBox={`0 0 ${CHART_WIDTH} ${CHART_WIDTH}`} className="viz-img" role="img">
+            {data.columns.map((column, i) => (
+                <g key={column}>
+                    <text x={labelSpace - 4} y={labelSpace + i * cell + cell / 2 + 3} textAnchor="end" fontSize="8">{column}</text>
+                    <text transform={`translate(${labelSpace + i * cell + cell / 2},${labelSpace - 4}) rotate(-60)`} fontSize="8">{column}</text>
+                    {data.matrix[i].map((value, j) => (
+                        <rect key={j} x={labelSpace + j * cell} y={labelSpace + i * cell} width={cell - 1} height={cell - 1} fill={color(value)}>
+                            <title>{`${column} / ${data.columns[j]}: ${value.toFixed(2)}`}</title>
+                        </rect>
+                    ))}
+                </g>
+            ))}
+        </svg>
+    );
+};
+
+// Binned scatter: one circle per non-empty cell, sized by patients and coloured by the share with heart disease
+const BinnedScatter = ({ name, xLabel, yLabel }) => {
+    const { data, error } = useChartData(name);
+    if (!data) return <ChartStatus error={error} />;
+    const x = linearScale(data.x_edges[0], data.x_edges[data.x_edges.length - 1], 0, innerWidth);
+    const y = linearScale(data.y_edges[0], data.y_edges[data.y_edges.length - 1], innerHeight, 0);
+    const largest = Math.max(...data.cells.map(([, , negatives, positives]) => negatives + positives));
+    return (
+        <>
+            <ChartFrame xLabel={xLabel} yLabel={yLabel}>
+                {data.cells.map(([i, j, negatives, positives]) => {
+                    const total = negatives + positives;
+                    const cx = x((data.x_edges[i] + data.x_edges[i + 1]) / 2);
+                    const cy = y((data.y_edges[j] + data.y_edges[j + 1]) / 2);
+                    return (
+                        <circle key={`${i}-${j}`} cx={cx} cy={cy} r={1.5 + 6 * Math.sqrt(total / largest)}
+                                fill={positives / total > 0.5 ? CHART_COLORS[1] : CHART_COLORS[0]} opacity={0.3 + 0.7 * positives / total}>
+                            <title>{`${total} patients, ${positives} with heart disease`}</title>
+                        </circle>
+                    );
+                })}
+                <Ticks values={evenTicks(data.x_edges[0], data.x_edges[data.x_edges.length - 1])} scale={x} axis="x" format={(v) => Math.round(v)} />
+                <Ticks values={evenTicks(data.y_edges[0], data.y_edges[data.y_edges.length - 1])} scale={y} axis="y" format={(v) => Math.round(v)} />
+            </ChartFrame>
+            <p className="small text-center mb-0">Larger circles hold more patients; darker red cells have a higher share with heart disease</p>
+        </>
+    );
+};
+
+// ROC or precision-recall curve from the model's held-out test split
+const CurveChart = ({ name, xKey, yKey, xLabel, yLabel, summary }) => {
+    const { data, error } = useChartData(name);
+    if (!data) return <ChartStatus error={error} />;
+    const x = linearScale(0, 1, 0, innerWidth);
+    const y = linearScale(0, 1, innerHeight, 0);
+    const points = data[xKey].map((value, i) => `${x(value)},${y(data[yKey][i])}`).join(' ');
+    return (
+        <>
+            <ChartFrame xLabel={xLabel} yLabel={yLabel}>
+                {name === 'roc' && <line x1={x(0)} y1={y(0)} x2={x(1)} y2={y(1)} stroke="#999" strokeDasharray="4 4" />}
+                <polyline points={points} fill="none" stroke={CHART_COLORS[1]} strokeWidth={2} />
+                <Ticks values={evenTicks(0, 1)} scale={x} axis="x" format={(v) => v.toFixed(1)} />
+                <Ticks values={evenTicks(0, 1)} scale={y} axis="y" format={(v) => v.toFixed(1)} />
+            </ChartFrame>
+            <p className="small text-center mb-0">{summary(data)}</p>
+        </>
+    );
+};
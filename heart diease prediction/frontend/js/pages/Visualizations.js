@@ -22,7 +22,7 @@ const Visualizations = () => {
                 <div className="col-md-6">
                     <div className="viz-container">
                         <h4 className="mb-3"><i className="bi bi-bar-chart"></i> Age Distribution by Heart Disease Risk</h4>
-                        <img src="images/age_distribution.png" alt="Age Distribution" className="viz-img" />
+                        <StackedHistogram name="age_histogram" xLabel="Age" />
                         <div className="mt-3">
                             <h5>Key Insights:</h5>
                             <ul>
@@ -36,7 +36,7 @@ const Visualizations = () => {
                 <div className="col-md-6">
                     <div className="viz-container">
                         <h4 className="mb-3"><i className="bi bi-heart-pulse"></i> Blood Pressure and Heart Disease</h4>
-                        <img src="images/blood_pressure.png" alt="Blood Pressure Analysis" className="viz-img" />
+                        <BinnedScatter name="blood_pressure" xLabel="Systolic BP (mmHg)" yLabel="Diastolic BP (mmHg)" />
                         <div className="mt-3">
                             <h5>Key Insights:</h5>
                             <ul>
@@ -67,7 +67,7 @@ const Visualizations = () => {
                 <div className="col-md-6">
                     <div className="viz-container">
                         <h4 className="mb-3"><i className="bi bi-lungs"></i> Impact of Smoking on Heart Disease</h4>
-                        <img src="images/smoking_status.png" alt="Smoking Impact" className="viz-img" />
+                        <StackedPercentBars name="smoking_crosstab" xLabel="Smoking Status" />
                         <div className="mt-3">
                             <h5>Key Insights:</h5>
                             <ul>
@@ -112,6 +112,42 @@ const Visualizations = () => {
                 </div>
             </div>
             
+            <div className="row mb-4">
+                <div className="col-md-6">
+                    <div className="viz-container">
+                        <h4 className="mb-3"><i className="bi bi-person"></i> BMI Distribution by Heart Disease Risk</h4>
+                        <StackedHistogram name="bmi_histogram" xLabel="BMI" />
+                    </div>
+                </div>
+                <div className="col-md-6">
+                    <div className="viz-container">
+                        <h4 className="mb-3"><i className="bi bi-capsule"></i> Diabetes and Heart Disease</h4>
+                        <StackedPercentBars name="diabetes_crosstab" xLabel="Diabetes Status" />
+                    </div>
+                </div>
+            </div>
+            
+            <div className="row mb-4">
+                <div className="col-md-6">
+                    <div className="viz-container">
+                        <h4 className="mb-3"><i className="bi bi-grid-3x3"></i> Correlation Between Features</h4>
+                        <CorrelationHeatmap />
+                    </div>
+                </div>
+                <div className="col-md-6">
+                    <div className="viz-container">
+                        <h4 className="mb-3"><i className="bi bi-graph-up"></i> Model ROC Curve</h4>
+                        <CurveChart name="roc" xKey="fpr" yKey="tpr" xLabel="False Positive Rate" yLabel="True Positive Rate"
+                                    summary={(data) => `AUC = ${data.auc.toFixed(3)} on ${data.test_size} held-out patients`} />
+                    </div>
+                    <div className="viz-container mt-4">
+                        <h4 className="mb-3"><i className="bi bi-bullseye"></i> Model Precision-Recall Curve</h4>
+                        <CurveChart name="precision_recall" xKey="recall" yKey="precision" xLabel="Recall" yLabel="Precision"
+                                    summary={(data) => `Average precision = ${data.average_precision.toFixed(3)}`} />
+                    </div>
+                </div>
+            </div>
+            
             <div className="content-container mb-4">
                 <h3 className="mb-3"><i className="bi bi-clipboard-data"></i> Risk Factor Interactions</h3>
                 <p>
@@ -0,0 +1,99 @@
+"""
+Gunicorn configuration for serving the Heart Disease Prediction app in production
+
+Usage (from the project directory):
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden with an environment variable:
+    BIND                 Address to listen on (default 0.0.0.0:8000)
+    WEB_CONCURRENCY      Worker processes (default: one per CPU core)
+    THREADS              Threads per worker (default 2)
+    KEEPALIVE            Seconds to hold idle keep-alive connections (default 5)
+    TIMEOUT              Seconds before a silent worker is killed and restarted (default 30)
+    GRACEFUL_TIMEOUT     Seconds workers get to finish in-flight requests on reload/shutdown (default 30)
+    MAX_REQUESTS         Recycle a worker after this many requests, 0 to disable (default 10000)
+    LOG_LEVEL            Gunicorn log level (default info)
+
+Graceful reload: `kill -HUP <master pid>` re-reads this file and replaces the
+workers one by one, letting in-flight requests finish. Because the app is
+preloaded in the master, picking up new code or a retrained model needs
+`kill -USR2 <master pid>` (start a new master) followed by
+`kill -TERM <old master pid>`.
+"""
+
+import gc
+import multiprocessing
+import os
+
+# Pin native thread pools to one thread per worker *before* NumPy, scikit-learn
+# or joblib are imported, so N workers do not each spin up N BLAS/OpenMP threads
+for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS'):
+    os.environ.setdefault(variable, '1')
+os.environ.setdefault('LOKY_MAX_CPU_COUNT', '1')
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+# Scoring is CPU bound: one process per core, a couple of threads to overlap I/O
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('THREADS', 2))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+keepalive = int(os.environ.get('KEEPALIVE', 5))
+timeout = int(os.environ.get('TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 30))
+
+# Restart workers periodically to bound memory growth, staggered so they do not all restart at once
+max_requests = int(os.environ.get('MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# Load the app (and the model) once in the master; workers share its memory copy-on-write
+preload_app = True
+
+# Heartbeat files on tmpfs so a slow disk cannot make healthy workers look stuck
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+loglevel = os.environ.get('LOG_LEVEL', 'info')
+accesslog = '-'
+errorlog = '-'
+
+def when_ready(server):
+    """
+    Finish loading the model in the master before any worker is forked
+    """
+    import app
+
+    if not app.wait_for_model():
+        server.log.error(f"Model failed to load: {app.model_status['error']}")
+    else:
+        server.log.info(f"Model loaded in {app.model_status['load_seconds']:.2f}s")
+
+    # Counters start from zero with the new workers
+    app.metrics_registry.clear_snapshots()
+
+    # Move everything allocated so far out of the collector's reach so the
+    # garbage collector does not dirty (and un-share) the preloaded pages
+    gc.collect()
+    gc.freeze()
+
+def worker_exit(server, worker):
+    """
+    Write the exiting worker's final metrics snapshot, including requests since the last flush
+    """
+    import app
+
+    try:
+        app.metrics_registry.flush()
+    except Exception as e:
+        server.log.error(f"Error writing metrics of worker {worker.pid}: {e}")
+
+def child_exit(server, worker):
+    """
+    Fold an exited worker's metrics snapshot into the exited workers' totals (in the master)
+    """
+    import app
+
+    try:
+        app.metrics_registry.fold_snapshot(worker.pid)
+    except Exception as e:
+        server.log.error(f"Error folding metrics of worker {worker.pid}: {e}")
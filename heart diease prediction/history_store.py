@@ -0,0 +1,350 @@
+"""
+Prediction history storage
+
+Predictions are stored in an embedded SQLite database in WAL mode. Appends
+are single-row inserts inside one transaction, so they cost the same no
+matter how much history exists, and several worker processes can write
+concurrently without losing records. The old prediction_history.json file
+is imported once on first use.
+
+Running aggregates for /api/user_statistics are kept in the same database
+and updated in the same transaction as each append, so they stay
+consistent across processes and can be read in constant time.
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+
+DEFAULT_DB_PATH = 'prediction_history.db'
+LEGACY_JSON_PATH = 'prediction_history.json'
+
+# Seconds a writer waits for another process's lock before giving up
+BUSY_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    prediction INTEGER NOT NULL,
+    probability REAL NOT NULL,
+    input_data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions (timestamp);
+CREATE INDEX IF NOT EXISTS idx_predictions_prediction ON predictions (prediction, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aggregates (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total INTEGER NOT NULL,
+    high_risk INTEGER NOT NULL,
+    sum_age REAL NOT NULL,
+    sum_sysBP REAL NOT NULL,
+    sum_diaBP REAL NOT NULL,
+    sum_totChol REAL NOT NULL,
+    smokers INTEGER NOT NULL,
+    hypertension INTEGER NOT NULL,
+    diabetes INTEGER NOT NULL
+);
+"""
+
+# Columns of the aggregates row, in table order
+AGGREGATE_FIELDS = ['total', 'high_risk', 'sum_age', 'sum_sysBP', 'sum_diaBP', 'sum_totChol',
+                    'smokers', 'hypertension', 'diabetes']
+
+# Columns read back into history records; id is the SQLite rowid
+RECORD_COLUMNS = 'id, timestamp, prediction, probability, input_data'
+
+def _row_to_record(row):
+    # Record ids are zero-based positions in insertion order
+    return {
+        'id': row[0] - 1,
+        'timestamp': row[1],
+        'input_data': json.loads(row[4]),
+        'prediction': row[2],
+        'probability': row[3]
+    }
+
+def _record_to_row(record):
+    return (
+        record['timestamp'],
+        int(record['prediction']),
+        float(record['probability']),
+        json.dumps(record.get('input_data', {}))
+    )
+
+def _number(value):
+    # Missing or non-finite inputs (JSON allows NaN) count as zero in the sums
+    if isinstance(value, (int, float)) and math.isfinite(value):
+        return value
+    return 0
+
+def _aggregate_deltas(records):
+    """
+    Contribution of a list of records to each running aggregate
+
+    Returns:
+        deltas: Tuple of values in AGGREGATE_FIELDS order
+    """
+    deltas = [0] * len(AGGREGATE_FIELDS)
+    for record in records:
+        input_data = record.get('input_data') or {}
+        deltas[0] += 1
+        deltas[1] += 1 if int(record['prediction']) == 1 else 0
+        deltas[2] += _number(input_data.get('age'))
+        deltas[3] += _number(input_data.get('sysBP'))
+        deltas[4] += _number(input_data.get('diaBP'))
+        deltas[5] += _number(input_data.get('totChol'))
+        deltas[6] += 1 if input_data.get('is_smoking') == 1 else 0
+        deltas[7] += 1 if input_data.get('prevalentHyp') == 1 else 0
+        deltas[8] += 1 if input_data.get('diabetes') == 1 else 0
+    return tuple(deltas)
+
+class HistoryStore:
+    """
+    Append-only store of prediction records backed by SQLite
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, legacy_json_path=LEGACY_JSON_PATH):
+        """
+        Args:
+            db_path: Path of the SQLite database file
+            legacy_json_path: Old JSON history file to import on first use, or None
+        """
+        self.db_path = db_path
+        self.legacy_json_path = legacy_json_path
+        self._local = threading.local()
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self):
+        """
+        Connection for the current thread and process
+
+        Connections are never shared across threads or carried over a fork.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        connection = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._initialize(connection)
+                    self._initialized = True
+        return connection
+
+    def _initialize(self, connection):
+        connection.executescript(SCHEMA)
+        if connection.execute('SELECT 1 FROM aggregates WHERE id = 1').fetchone() is None:
+            # New database, or one created before aggregates existed
+            self._rebuild_aggregates(connection)
+        self._migrate_legacy_json(connection)
+
+    def _migrate_legacy_json(self, connection):
+        """
+        Import the old JSON history file exactly once, even with several workers starting together
+        """
+        if not self.legacy_json_path or not os.path.exists(self.legacy_json_path):
+            return
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            done = connection.execute("SELECT value FROM meta WHERE key = 'legacy_json_migrated'").fetchone()
+            if done is None and os.path.exists(self.legacy_json_path):
+                with open(self.legacy_json_path, 'r') as f:
+                    history = json.load(f)
+                self._insert(connection, history)
+                connection.execute("INSERT INTO meta (key, value) VALUES ('legacy_json_migrated', ?)",
+                                   (str(len(history)),))
+                print(f"Migrated {len(history)} records from {self.legacy_json_path}")
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        # Keep the old file around under a new name rather than deleting it
+        if os.path.exists(self.legacy_json_path):
+            os.replace(self.legacy_json_path, self.legacy_json_path + '.migrated')
+
+    def _insert(self, connection, records):
+        connection.executemany(
+            'INSERT INTO predictions (timestamp, prediction, probability, input_data) VALUES (?, ?, ?, ?)',
+            [_record_to_row(record) for record in records]
+        )
+        assignments = ', '.join(f'{field} = {field} + ?' for field in AGGREGATE_FIELDS)
+        connection.execute(f'UPDATE aggregates SET {assignments} WHERE id = 1', _aggregate_deltas(records))
+
+    def _rebuild_aggregates(self, connection):
+        """
+        Recompute the aggregates row from the raw history inside a write transaction
+        """
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = connection.execute(f'SELECT {RECORD_COLUMNS} FROM predictions')
+            deltas = _aggregate_deltas(_row_to_record(row) for row in rows)
+            placeholders = ', '.join('?' for _ in AGGREGATE_FIELDS)
+            connection.execute(f'INSERT OR REPLACE INTO aggregates (id, {", ".join(AGGREGATE_FIELDS)}) '
+                               f'VALUES (1, {placeholders})', deltas)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def append(self, records):
+        """
+        Append prediction records in a single transaction
+
+        Args:
+            records: List of {'timestamp', 'input_data', 'prediction', 'probability'} dictionaries
+        """
+        if not records:
+            return
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._insert(connection, records)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def all(self):
+        """
+        All records, oldest first
+        """
+        rows = self._connect().execute(
+            f'SELECT {RECORD_COLUMNS} FROM predictions ORDER BY id'
+        )
+        return [_row_to_record(row) for row in rows]
+
+    def page(self, cursor=None, limit=50, start=None, end=None, prediction=None):
+        """
+        One page of records, newest first, using keyset pagination on the record id
+
+        Args:
+            cursor: Only return records with an id below this (the previous page's next_cursor)
+            limit: Maximum number of records to return
+            start: Earliest timestamp to include ('YYYY-MM-DD HH:MM:SS'), or None
+            end: Latest timestamp to include, or None
+            prediction: Only return records with this predicted class, or None
+
+        Returns:
+            records, next_cursor: The page and the cursor for the following page (None on the last page)
+        """
+        where, params = self._filters(start, end, prediction)
+        if cursor is not None:
+            where.append('id < ?')
+            params.append(cursor + 1)
+        sql = f'SELECT {RECORD_COLUMNS} FROM predictions'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        rows = self._connect().execute(sql + ' ORDER BY id DESC LIMIT ?', params + [limit + 1]).fetchall()
+
+        records = [_row_to_record(row) for row in rows[:limit]]
+        next_cursor = records[-1]['id'] if len(rows) > limit else None
+        return records, next_cursor
+
+    def iter_records(self, start=None, end=None, prediction=None, chunk_size=1000):
+        """
+        Yield every matching record, oldest first, reading chunk_size rows at a time
+
+        Only one chunk is held in memory, and no read transaction stays open
+        between chunks, so a full export does not block writers.
+        """
+        where, params = self._filters(start, end, prediction)
+        sql = f'SELECT {RECORD_COLUMNS} FROM predictions WHERE ' + ' AND '.join(where + ['id > ?'])
+        sql += ' ORDER BY id LIMIT ?'
+        last_rowid = 0
+        while True:
+            rows = self._connect().execute(sql, params + [last_rowid, chunk_size]).fetchall()
+            for row in rows:
+                yield _row_to_record(row)
+            if len(rows) < chunk_size:
+                return
+            last_rowid = rows[-1][0]
+
+    @staticmethod
+    def _filters(start, end, prediction):
+        where, params = [], []
+        if start is not None:
+            where.append('timestamp >= ?')
+            params.append(start)
+        if end is not None:
+            where.append('timestamp <= ?')
+            params.append(end)
+        if prediction is not None:
+            where.append('prediction = ?')
+            params.append(int(prediction))
+        return where, params
+
+    def count(self):
+        return self._connect().execute('SELECT total FROM aggregates WHERE id = 1').fetchone()[0]
+
+    def aggregates(self):
+        """
+        Running totals over all stored records, read in constant time
+
+        Returns:
+            aggregates: Dictionary keyed by AGGREGATE_FIELDS
+        """
+        row = self._connect().execute(
+            f'SELECT {", ".join(AGGREGATE_FIELDS)} FROM aggregates WHERE id = 1'
+        ).fetchone()
+        return dict(zip(AGGREGATE_FIELDS, row))
+
+    def rebuild_aggregates(self):
+        """
+        Recompute the running aggregates from the raw history
+        """
+        self._rebuild_aggregates(self._connect())
+
+    def get(self, record_id):
+        """
+        Record by id through a primary-key lookup, or None
+
+        Records are only ever appended or cleared all at once, so SQLite
+        assigns contiguous rowids from 1 and record id N is the (N+1)th
+        prediction, matching its position in the old JSON list.
+        """
+        if record_id < 0:
+            return None
+        row = self._connect().execute(
+            f'SELECT {RECORD_COLUMNS} FROM predictions WHERE id = ?',
+            (record_id + 1,)
+        ).fetchone()
+        return _row_to_record(row) if row else None
+
+    def latest(self):
+        """
+        Most recently stored record, or None, read from the end of the rowid index
+        """
+        row = self._connect().execute(
+            f'SELECT {RECORD_COLUMNS} FROM predictions ORDER BY id DESC LIMIT 1'
+        ).fetchone()
+        return _row_to_record(row) if row else None
+
+    def clear(self):
+        """
+        Delete all records
+        """
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('DELETE FROM predictions')
+            assignments = ', '.join(f'{field} = 0' for field in AGGREGATE_FIELDS)
+            connection.execute(f'UPDATE aggregates SET {assignments} WHERE id = 1')
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
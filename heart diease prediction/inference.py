@@ -0,0 +1,205 @@
+"""
+Low-latency inference for the heart disease prediction pipeline
+
+The fitted scikit-learn pipeline is precompiled into plain NumPy arrays so a
+single request can be scored without building a DataFrame or running the
+ColumnTransformer, and the forest is evaluated once for both the label and
+the probability by walking all trees of the flattened forest together.
+"""
+
+import math
+
+import numpy as np
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+from forest import CompiledForest
+
+def _as_float(value):
+    """
+    Convert a request value to float, mapping missing values to NaN
+    """
+    if value is None:
+        return np.nan
+    return float(value)
+
+def _category_key(value):
+    """
+    Normalize a categorical value so request values and fitted categories compare equal
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float, np.number)):
+        value = float(value)
+        return None if math.isnan(value) else value
+    return value
+
+class CompiledPipeline:
+    """
+    NumPy-only scoring path compiled from a fitted preprocessing + RandomForest pipeline
+
+    Supports the layout produced by model.create_preprocessing_pipeline():
+    numerical columns imputed and standardized, categorical columns imputed
+    and one-hot encoded.
+    """
+
+    def __init__(self, pipeline):
+        """
+        Args:
+            pipeline: Fitted Pipeline with 'preprocessor' and 'classifier' steps, or a
+                forest.CompiledForestPipeline (e.g. loaded from the memory-mapped array store)
+
+        Raises:
+            ValueError: If the pipeline contains steps this compiler does not support
+        """
+        preprocessor = pipeline.named_steps['preprocessor']
+        classifier = pipeline.named_steps['classifier']
+        forest = classifier if isinstance(classifier, CompiledForest) else CompiledForest(classifier)
+
+        num_names, num_index, num_fill, num_mean, num_scale = [], [], [], [], []
+        self.categorical = []
+        offset = 0
+
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            if transformer == 'passthrough' or not hasattr(transformer, 'steps'):
+                raise ValueError(f"Unsupported transformer '{name}'")
+
+            imputer, encoder = [step for _, step in transformer.steps]
+            if not isinstance(imputer, SimpleImputer) or imputer.add_indicator:
+                raise ValueError(f"Unsupported imputer in transformer '{name}'")
+
+            if isinstance(encoder, StandardScaler):
+                mean = encoder.mean_ if encoder.with_mean else np.zeros(len(columns))
+                scale = encoder.scale_ if encoder.with_std else np.ones(len(columns))
+                for i, column in enumerate(columns):
+                    num_names.append(column)
+                    num_index.append(offset + i)
+                    num_fill.append(float(imputer.statistics_[i]))
+                    num_mean.append(float(mean[i]))
+                    num_scale.append(float(scale[i]))
+                offset += len(columns)
+            elif isinstance(encoder, OneHotEncoder):
+                if encoder.drop_idx_ is not None:
+                    raise ValueError(f"OneHotEncoder with drop is not supported in transformer '{name}'")
+                if encoder.handle_unknown != 'ignore':
+                    raise ValueError(f"OneHotEncoder must use handle_unknown='ignore' in transformer '{name}'")
+                for i, column in enumerate(columns):
+                    categories = encoder.categories_[i]
+                    lookup = {_category_key(category): offset + j for j, category in enumerate(categories)}
+                    self.categorical.append((column, _category_key(imputer.statistics_[i]), lookup))
+                    offset += len(categories)
+            else:
+                raise ValueError(f"Unsupported encoder in transformer '{name}'")
+
+        if offset != forest.n_features_in_:
+            raise ValueError(f"Compiled layout has {offset} features, classifier expects {forest.n_features_in_}")
+
+        self.num_names = num_names
+        self.num_index = np.array(num_index, dtype=np.intp)
+        self.num_fill = np.array(num_fill, dtype=np.float64)
+        self.num_mean = np.array(num_mean, dtype=np.float64)
+        self.num_scale = np.array(num_scale, dtype=np.float64)
+        self.n_features_out = offset
+
+        self.forest = forest
+        self.classes_ = forest.classes_
+
+    def transform_one(self, data):
+        """
+        Build the model input vector directly from a request dictionary
+
+        Args:
+            data: Dictionary of input features
+
+        Returns:
+            row: float32 array of shape (1, n_features_out)
+        """
+        values = np.array([_as_float(data.get(name)) for name in self.num_names], dtype=np.float64)
+        missing = np.isnan(values)
+        values[missing] = self.num_fill[missing]
+
+        row = np.zeros(self.n_features_out, dtype=np.float64)
+        row[self.num_index] = (values - self.num_mean) / self.num_scale
+
+        for name, fill, lookup in self.categorical:
+            key = _category_key(data.get(name))
+            index = lookup.get(fill if key is None else key)
+            # Unknown categories encode as all zeros, like handle_unknown='ignore'
+            if index is not None:
+                row[index] = 1.0
+
+        return row.astype(np.float32).reshape(1, -1)
+
+    def predict_proba_one(self, data):
+        """
+        Class probabilities for a single record from one pass over the forest
+
+        Args:
+            data: Dictionary of input features
+
+        Returns:
+            proba: Array of shape (n_classes,)
+        """
+        return self.forest.predict_proba_row(self.transform_one(data)[0])
+
+    def predict_one(self, data):
+        """
+        Predicted label and positive-class probability for a single record
+
+        Args:
+            data: Dictionary of input features
+
+        Returns:
+            prediction, probability: The class label and the probability of class 1
+        """
+        return self.predict_row(self.transform_one(data)[0])
+
+    def predict_row(self, row):
+        """
+        Predicted label and positive-class probability for one row built by transform_one()
+
+        Args:
+            row: float32 array of shape (n_features_out,)
+
+        Returns:
+            prediction, probability: The class label and the probability of class 1
+        """
+        proba = self.forest.predict_proba_row(row)
+        prediction = self.classes_[int(np.argmax(proba))]
+        return prediction, float(proba[list(self.classes_).index(1)])
+
+    def predict_many(self, records):
+        """
+        Predicted label and positive-class probability for a small batch of records
+
+        Args:
+            records: List of input feature dictionaries
+
+        Returns:
+            results: List of (prediction, probability) tuples in input order
+        """
+        X = np.vstack([self.transform_one(data) for data in records])
+        proba = self.forest.predict_proba_rows(X)
+        labels = self.classes_.take(np.argmax(proba, axis=1))
+        positive = proba[:, list(self.classes_).index(1)]
+        return [(label, float(probability)) for label, probability in zip(labels, positive)]
+
+def compile_pipeline(pipeline):
+    """
+    Compile a fitted pipeline, returning None if it cannot be compiled
+
+    Args:
+        pipeline: Fitted sklearn Pipeline
+
+    Returns:
+        compiled: CompiledPipeline or None
+    """
+    if pipeline is None:
+        return None
+    try:
+        return CompiledPipeline(pipeline)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        print(f"Falling back to the sklearn pipeline for inference: {e}")
+        return None
@@ -0,0 +1,255 @@
+"""
+Background jobs with status polling
+
+Long-running work (such as re-rendering the charts) runs in its own
+process, so request workers are never blocked by it. Job state lives in a
+small SQLite database, so any worker process can report on a job started
+by another, and submitting a job while one of the same kind is queued or
+running returns the existing job instead of starting a second one. A job
+that runs for longer than RUNNING_TIMEOUT is terminated and marked failed,
+so a hung process cannot hold on to its kind.
+"""
+
+import importlib
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+
+DEFAULT_DB_PATH = 'jobs.db'
+
+# Job kinds and the 'module:function' each one runs; the function's return value is the job result
+JOB_KINDS = {
+    'visualizations': 'model:regenerate_visualizations'
+}
+
+ACTIVE_STATES = ('queued', 'running')
+
+# Seconds a job may stay queued without a process before it is treated as lost
+QUEUED_TIMEOUT = 60
+
+# Seconds a job process may run before it is terminated as hung
+RUNNING_TIMEOUT = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    state TEXT NOT NULL,
+    pid INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_kind_state ON jobs (kind, state);
+"""
+
+JOB_COLUMNS = 'id, kind, state, pid, created_at, started_at, finished_at, result, error'
+
+def _timestamp(seconds):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(seconds)) if seconds else None
+
+def _row_to_job(row):
+    return {
+        'job_id': row[0],
+        'kind': row[1],
+        'state': row[2],
+        'created_at': _timestamp(row[4]),
+        'started_at': _timestamp(row[5]),
+        'finished_at': _timestamp(row[6]),
+        'duration_seconds': row[6] - row[5] if row[5] and row[6] else None,
+        'result': json.loads(row[7]) if row[7] else None,
+        'error': row[8]
+    }
+
+def _terminate(pid):
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class JobStore:
+    """
+    Job records shared by every worker process on the host
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        """
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connect(self):
+        # One connection per thread and process, as in history_store
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _transaction(self, work):
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = work(connection)
+            connection.execute('COMMIT')
+            return result
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def submit(self, kind):
+        """
+        Create a queued job, or return the active job of the same kind
+
+        Args:
+            kind: Key of JOB_KINDS
+
+        Returns:
+            job, created: The job dictionary and whether a new job was created
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}'")
+
+        def work(connection):
+            placeholders = ', '.join('?' for _ in ACTIVE_STATES)
+            rows = connection.execute(
+                f'SELECT {JOB_COLUMNS} FROM jobs WHERE kind = ? AND state IN ({placeholders}) ORDER BY created_at',
+                (kind,) + ACTIVE_STATES
+            ).fetchall()
+            for row in rows:
+                # A job whose process died (or never started) without reporting back is not active any more
+                lost = not _process_alive(row[3]) if row[3] is not None else time.time() - row[4] > QUEUED_TIMEOUT
+                if lost:
+                    connection.execute("UPDATE jobs SET state = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                                       (time.time(), 'Job process exited unexpectedly', row[0]))
+                    continue
+                # Neither is one that has run for too long; its worker may be gone, so stop it here
+                if row[3] is not None and time.time() - (row[5] or row[4]) > RUNNING_TIMEOUT:
+                    _terminate(row[3])
+                    connection.execute("UPDATE jobs SET state = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                                       (time.time(), f'Job timed out after {RUNNING_TIMEOUT} seconds', row[0]))
+                    continue
+                return _row_to_job(row), False
+
+            job_id = uuid.uuid4().hex
+            connection.execute("INSERT INTO jobs (id, kind, state, created_at) VALUES (?, ?, 'queued', ?)",
+                               (job_id, kind, time.time()))
+            return self._get(connection, job_id), True
+
+        return self._transaction(work)
+
+    def _get(self, connection, job_id):
+        row = connection.execute(f'SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def get(self, job_id):
+        """
+        Job by id, or None
+        """
+        return self._get(self._connect(), job_id)
+
+    def latest(self, kind):
+        """
+        Most recently submitted job of a kind, or None
+        """
+        row = self._connect().execute(
+            f'SELECT {JOB_COLUMNS} FROM jobs WHERE kind = ? ORDER BY created_at DESC LIMIT 1', (kind,)
+        ).fetchone()
+        return _row_to_job(row) if row else None
+
+    def set_pid(self, job_id, pid):
+        self._connect().execute('UPDATE jobs SET pid = ? WHERE id = ?', (pid, job_id))
+
+    def mark_running(self, job_id):
+        self._connect().execute("UPDATE jobs SET state = 'running', pid = ?, started_at = ? WHERE id = ?",
+                                (os.getpid(), time.time(), job_id))
+
+    def mark_succeeded(self, job_id, result):
+        self._connect().execute("UPDATE jobs SET state = 'succeeded', finished_at = ?, result = ? WHERE id = ?",
+                                (time.time(), json.dumps(result), job_id))
+
+    def mark_failed(self, job_id, error):
+        """
+        Record a failure unless the job already finished
+        """
+        placeholders = ', '.join('?' for _ in ACTIVE_STATES)
+        self._connect().execute(
+            f"UPDATE jobs SET state = 'failed', finished_at = ?, error = ? WHERE id = ? AND state IN ({placeholders})",
+            (time.time(), error, job_id) + ACTIVE_STATES
+        )
+
+def _run_job(db_path, job_id, kind, target):
+    """
+    Entry point of the job process
+    """
+    store = JobStore(db_path)
+    store.mark_running(job_id)
+    try:
+        module_name, function_name = target.split(':')
+        result = getattr(importlib.import_module(module_name), function_name)()
+        store.mark_succeeded(job_id, result)
+    except Exception as e:
+        print(f"Job {job_id} ({kind}) failed: {e}")
+        store.mark_failed(job_id, str(e))
+
+def start_job(store, kind):
+    """
+    Submit a job and, if it is new, start it in a separate process
+
+    Args:
+        store: JobStore
+        kind: Key of JOB_KINDS
+
+    Returns:
+        job, created: The job dictionary and whether a new job was started
+    """
+    job, created = store.submit(kind)
+    if not created:
+        return job, False
+
+    # A fresh interpreter, so the job shares no threads or locks with the web worker
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=_run_job,
+                              args=(store.db_path, job['job_id'], kind, JOB_KINDS[kind]),
+                              name=f'job-{kind}', daemon=False)
+    try:
+        process.start()
+    except Exception as e:
+        store.mark_failed(job['job_id'], f'Could not start job process: {e}')
+        raise
+    store.set_pid(job['job_id'], process.pid)
+
+    def reap():
+        # Wait for the process so it does not linger as a zombie, and catch crashes and hangs
+        process.join(RUNNING_TIMEOUT)
+        if process.is_alive():
+            store.mark_failed(job['job_id'], f'Job timed out after {RUNNING_TIMEOUT} seconds')
+            process.terminate()
+            process.join()
+        if process.exitcode != 0:
+            store.mark_failed(job['job_id'], f'Job process exited with code {process.exitcode}')
+
+    threading.Thread(target=reap, name=f'job-reaper-{kind}', daemon=True).start()
+    return store.get(job['job_id']), True
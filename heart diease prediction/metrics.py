@@ -0,0 +1,382 @@
+"""
+Prometheus metrics for the web app, without a client library
+
+Counters and histograms are kept in plain dictionaries keyed by label
+values, each behind its own lock, so recording a request costs a dict
+lookup, a bisect over the bucket bounds and a few additions. Gauges are
+callbacks evaluated only when /metrics is scraped. Registry.render()
+writes the Prometheus text exposition format (version 0.0.4).
+
+Every gunicorn worker counts its own requests. When a metrics directory
+is given, each worker also writes a snapshot of its counters and
+histograms there every few seconds (and right before it answers a
+scrape), and the scraped worker adds up the snapshots of all workers, so
+totals do not depend on which worker Prometheus reaches. When a worker
+exits, gunicorn's child_exit hook folds its snapshot into a single
+metrics-exited.json and deletes it, so counters never go backwards and
+recycled workers do not leave a file each behind.
+"""
+
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds in seconds, from 100 microseconds (a cached /predict) to 10 seconds (a large export)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Finer bounds for the stages of a single request, which mostly take microseconds
+STAGE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+                 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+# Snapshot name (metrics-exited.json) holding the totals of workers that have exited
+EXITED = 'exited'
+
+# Workers whose snapshots went into the exited totals, remembered so a scrape racing a fold skips them
+MAX_FOLDED_WORKERS = 1024
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    """
+    Monotonically increasing count per combination of label values
+    """
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        """
+        Args:
+            labels: Tuple of label values, in labelnames order
+            amount: Non-negative increment
+        """
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(labels), value] for labels, value in self.values.items()]
+
+    def merge(self, samples, totals):
+        for labels, value in samples:
+            labels = tuple(labels)
+            totals[labels] = totals.get(labels, 0) + value
+
+    def samples(self, totals):
+        return [[list(labels), value] for labels, value in totals.items()]
+
+    def lines(self, samples):
+        totals = {}
+        self.merge(samples, totals)
+        for labels in sorted(totals):
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_format_value(totals[labels])}'
+
+class Histogram:
+    """
+    Distribution of observed values in fixed buckets per combination of label values
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: [count in each bucket (not cumulative) and above the last bound, sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        """
+        Args:
+            value: Observed value (seconds for the latency histograms)
+            labels: Tuple of label values, in labelnames order
+        """
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(labels), list(counts), total] for labels, (counts, total) in self.values.items()]
+
+    def merge(self, samples, totals):
+        for labels, counts, total in samples:
+            labels = tuple(labels)
+            entry = totals.setdefault(labels, [[0] * len(counts), 0.0])
+            for i, count in enumerate(counts):
+                entry[0][i] += count
+            entry[1] += total
+
+    def samples(self, totals):
+        return [[list(labels), counts, total] for labels, (counts, total) in totals.items()]
+
+    def lines(self, samples):
+        totals = {}
+        self.merge(samples, totals)
+        for labels in sorted(totals):
+            counts, total = totals[labels]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, ("le", _format_value(bound)))} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_format_value(total)}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+class Gauge:
+    """
+    Value read from a callback at scrape time
+
+    The callback returns a number, a dictionary of {label values tuple: number},
+    or None when the value is not known yet.
+    """
+    type = 'gauge'
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def lines(self, samples=None):
+        try:
+            value = self.callback()
+        except Exception as e:
+            print(f"Error reading metric {self.name}: {e}")
+            return
+        if value is None:
+            return
+        if not isinstance(value, dict):
+            value = {(): value}
+        for labels in sorted(value):
+            if value[labels] is not None:
+                yield f'{self.name}{_labels(self.labelnames, labels)} {_format_value(value[labels])}'
+
+class StageTimer:
+    """
+    Records the time between consecutive laps of one request in a histogram labelled by stage
+
+    Usage:
+        timer = StageTimer(histogram)
+        data = parse()
+        timer.lap('parse')
+    """
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        """
+        Record the time since the previous lap (or since the timer was created) as stage
+        """
+        now = time.perf_counter()
+        self.histogram.observe(now - self.last, (stage,))
+        self.last = now
+
+class Registry:
+    """
+    The metrics of one process, with optional aggregation across worker processes
+    """
+
+    def __init__(self, directory=None, flush_interval=5.0):
+        """
+        Args:
+            directory: Directory where every worker writes its snapshot, or None to report
+                this process only
+            flush_interval: Seconds between snapshot writes
+        """
+        self.metrics = []
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._flusher_pid = None
+        self._flush_lock = threading.Lock()
+        self._worker_pid = None
+        self._worker = None
+
+    def _register(self, metric):
+        if any(existing.name == metric.name for existing in self.metrics):
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback, labelnames=()):
+        return self._register(Gauge(name, documentation, callback, labelnames))
+
+    def clear_snapshots(self):
+        """
+        Remove the snapshots left in the metrics directory by an earlier server
+        """
+        if self.directory is None or not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.startswith('metrics-') and name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
+
+    def snapshot(self):
+        """
+        Counters and histograms of this process as a JSON-serialisable dictionary
+        """
+        return {metric.name: metric.snapshot() for metric in self.metrics if metric.type != 'gauge'}
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def _write(self, data, path):
+        os.makedirs(self.directory, exist_ok=True)
+        # Written to a temporary file first, so a scrape never reads a partial snapshot
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(temporary, path)
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def flush(self):
+        """
+        Write this process's snapshot to the metrics directory
+        """
+        if self.directory is None:
+            return
+        with self._flush_lock:
+            pid = os.getpid()
+            if self._worker_pid != pid:
+                # Unlike the pid, never reused by a later worker
+                self._worker_pid, self._worker = pid, f'{pid}-{time.time_ns()}'
+            self._write(dict(self.snapshot(), worker=self._worker), self._snapshot_path(pid))
+
+    def fold_snapshot(self, pid):
+        """
+        Add an exited worker's snapshot to the exited workers' totals and delete it
+
+        Called by one process (the gunicorn master) at a time. The totals and
+        the list of workers they include are replaced in one write, so a scrape
+        never counts the worker twice or not at all.
+
+        Args:
+            pid: Process id of the exited worker
+        """
+        if self.directory is None:
+            return
+        path = self._snapshot_path(pid)
+        snapshot = self._read(path)
+        if snapshot is None:
+            return
+        exited_path = self._snapshot_path(EXITED)
+        exited = self._read(exited_path) or {'workers': [], 'metrics': {}}
+        metrics = {}
+        for metric in self.metrics:
+            if metric.type == 'gauge':
+                continue
+            totals = {}
+            metric.merge(exited['metrics'].get(metric.name, []) + snapshot.get(metric.name, []), totals)
+            metrics[metric.name] = metric.samples(totals)
+        workers = exited['workers']
+        if 'worker' in snapshot:
+            workers = (workers + [snapshot['worker']])[-MAX_FOLDED_WORKERS:]
+        self._write({'workers': workers, 'metrics': metrics}, exited_path)
+        os.remove(path)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing metrics snapshot: {e}")
+
+    def ensure_flushing(self):
+        """
+        Start this process's snapshot writer thread if it is not running yet
+
+        Cheap enough to call on every request; threads do not survive a fork,
+        so each worker starts its own.
+        """
+        if self.directory is None or self._flusher_pid == os.getpid():
+            return
+        with self._flush_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_periodically, name='metrics-flusher', daemon=True).start()
+
+    def _snapshots(self):
+        """
+        The snapshots to report: every worker's with a metrics directory, else this process's
+        """
+        if self.directory is None:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith('metrics-') and name.endswith('.json')) or name == f'metrics-{EXITED}.json':
+                continue
+            snapshot = self._read(os.path.join(self.directory, name))
+            if snapshot is not None:
+                snapshots.append(snapshot)
+        # Read last: a worker folded in after its file was read is already in the
+        # totals, so its own snapshot is dropped rather than counted twice
+        exited = self._read(self._snapshot_path(EXITED))
+        if exited is None:
+            return snapshots
+        folded = set(exited['workers'])
+        snapshots = [snapshot for snapshot in snapshots if snapshot.get('worker') not in folded]
+        snapshots.append(exited['metrics'])
+        return snapshots
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format
+        """
+        snapshots = self._snapshots()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            samples = [] if metric.type == 'gauge' else [
+                sample for snapshot in snapshots for sample in snapshot.get(metric.name, [])]
+            lines.extend(metric.lines(samples))
+        return '\n'.join(lines) + '\n'
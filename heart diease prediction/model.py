@@ -1,6 +1,6 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, GridSearchCV, cross_val_score
+from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.compose import ColumnTransformer
@@ -9,10 +9,19 @@ from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, roc_curve, auc, precision_recall_curve
 import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
+import argparse
 import json
+import time
+import charts
+from assets import build_assets
+from forest import save_model_arrays
+from dataset import load_dataset, CATEGORICAL_FEATURES, NUMERICAL_FEATURES
+from population import compute_stats, save_stats, PercentileIndex
+from cohorts import CohortCube
+from search import run_search, fit_pipeline, cross_val_roc_auc, SEARCH_METHODS
+from transform_cache import TransformCache, DEFAULT_CACHE_DIR
+from profiler import TrainingProfiler, PROFILERS
 
 def load_and_preprocess_data(file_path='train_updated.csv'):
     """
@@ -24,8 +33,9 @@ def load_and_preprocess_data(file_path='train_updated.csv'):
     Returns:
         X_train, X_test, y_train, y_test, df: Training and test data, and the full dataframe
     """
-    # Load the dataset
-    df = pd.read_csv(file_path)
+    # Load the dataset from its column cache (parsed from the CSV on first use), with the
+    # CSV's exact values so the split thresholds match the ones scoring sees
+    df = load_dataset(file_path, exact=True)
     
     # Drop the ID column as it's not a feature
     df = df.drop('id', axis=1)
@@ -47,8 +57,8 @@ def create_preprocessing_pipeline():
         preprocessor: A ColumnTransformer for preprocessing the data
     """
     # Define categorical and numerical features
-    categorical_features = ['education', 'sex', 'is_smoking', 'prevalentStroke', 'prevalentHyp', 'diabetes']
-    numerical_features = ['age', 'cigsPerDay', 'BPMeds', 'totChol', 'sysBP', 'diaBP', 'BMI', 'heartRate', 'glucose']
+    categorical_features = CATEGORICAL_FEATURES
+    numerical_features = NUMERICAL_FEATURES
     
     # Create transformers for categorical and numerical features
     categorical_transformer = Pipeline(steps=[
@@ -70,82 +80,109 @@ def create_preprocessing_pipeline():
     
     return preprocessor
 
-def train_model(perform_grid_search=False):
+def train_model(perform_grid_search=False, search=None, search_options=None, profile=None,
+                cross_validate=False, cache_dir=None):
     """
     Train a machine learning model for heart disease prediction
     
+    Wall time, CPU time and peak memory of every stage and every chart are
+    written to training_profile.json.
+    
     Args:
         perform_grid_search: Whether to perform grid search for hyperparameter tuning
+            (the same as search='grid')
+        search: Hyperparameter search method, one of search.SEARCH_METHODS, or None for
+            the default parameters
+        search_options: Keyword arguments for the search, e.g. time_budget or max_fits
+        profile: 'cprofile' or 'pyinstrument' to also save a profile of the slowest stage
+            (training_profile.prof or .html), or None for timings only
+        cross_validate: Whether to also report the 5-fold cross-validated ROC AUC of the
+            default model (a search always cross-validates)
+        cache_dir: Directory that keeps preprocessed matrices across runs, e.g.
+            transform_cache.DEFAULT_CACHE_DIR, or None to cache them for this run only
         
     Returns:
         model: The trained model
     """
+    profiler = TrainingProfiler(profile)
+    
     print("Loading and preprocessing data...")
     # Load and preprocess data
-    X_train, X_test, y_train, y_test, df = load_and_preprocess_data()
+    with profiler.stage('load_data'):
+        X_train, X_test, y_train, y_test, df = load_and_preprocess_data()
     
     # Create preprocessing pipeline
     preprocessor = create_preprocessing_pipeline()
     
-    if perform_grid_search:
-        print("Performing grid search for hyperparameter tuning...")
-        # Define the parameter grid
-        param_grid = {
-            'classifier__n_estimators': [50, 100, 200],
-            'classifier__max_depth': [None, 10, 20, 30],
-            'classifier__min_samples_split': [2, 5, 10],
-            'classifier__min_samples_leaf': [1, 2, 4]
-        }
-        
+    # Preprocessed folds and training matrices, reused across candidates (and runs, with a cache_dir)
+    cache = TransformCache(directory=cache_dir)
+    
+    if perform_grid_search and search is None:
+        search = 'grid'
+    
+    search_report = None
+    if search is not None:
+        print(f"Performing {search} search for hyperparameter tuning...")
         # Create the pipeline
         pipeline = Pipeline(steps=[
             ('preprocessor', preprocessor),
             ('classifier', RandomForestClassifier(random_state=42))
         ])
         
-        # Perform grid search
-        grid_search = GridSearchCV(
-            pipeline, param_grid, cv=5, scoring='roc_auc', n_jobs=-1, verbose=1
-        )
-        
-        grid_search.fit(X_train, y_train)
+        # Search the hyperparameters with cross-validated ROC AUC
+        options = dict(search_options or {}, cache=cache)
+        with profiler.stage('search'):
+            model, search_report = run_search(search, pipeline, X_train, y_train, **options)
+        cv_scores = None
         
         # Get the best parameters
-        best_params = grid_search.best_params_
-        print(f"Best parameters: {best_params}")
-        
-        # Create the model with the best parameters
-        model = grid_search.best_estimator_
+        print(f"Best parameters: {search_report['best_params']}")
+        print(f"Search took {search_report['wall_time']:.1f}s for {search_report['fits']} fits, "
+              f"best CV ROC AUC: {search_report['best_score']:.4f}")
     else:
         print("Training model with default parameters...")
         # Create and train the model with default parameters
-        model = Pipeline(steps=[
+        pipeline = Pipeline(steps=[
             ('preprocessor', preprocessor),
             ('classifier', RandomForestClassifier(n_estimators=100, random_state=42))
         ])
         
-        model.fit(X_train, y_train)
+        with profiler.stage('fit'):
+            model = fit_pipeline(pipeline, X_train, y_train, cache)
+        
+        # Cross-validated ROC AUC on the training split
+        cv_scores = None
+        if cross_validate:
+            with profiler.stage('cross_validation'):
+                cv_scores = cross_val_roc_auc(pipeline, X_train, y_train, cache=cache)
+    
+    stats = cache.stats
+    print(f"Preprocessing: {stats['hits']} cached, {stats['misses']} computed in "
+          f"{stats['transform_seconds']:.2f}s, {stats['saved_seconds']:.2f}s saved")
     
     print("Evaluating model...")
     # Evaluate the model
-    y_pred = model.predict(X_test)
-    y_pred_proba = model.predict_proba(X_test)[:, 1]
-    
-    # Calculate metrics
-    accuracy = accuracy_score(y_test, y_pred)
-    report = classification_report(y_test, y_pred, output_dict=True)
-    conf_matrix = confusion_matrix(y_test, y_pred)
-    
-    # Calculate ROC curve and AUC
-    fpr, tpr, _ = roc_curve(y_test, y_pred_proba)
-    roc_auc = auc(fpr, tpr)
-    
-    # Calculate precision-recall curve
-    precision, recall, _ = precision_recall_curve(y_test, y_pred_proba)
+    with profiler.stage('evaluate'):
+        y_pred = model.predict(X_test)
+        y_pred_proba = model.predict_proba(X_test)[:, 1]
+        
+        # Calculate metrics
+        accuracy = accuracy_score(y_test, y_pred)
+        report = classification_report(y_test, y_pred, output_dict=True)
+        conf_matrix = confusion_matrix(y_test, y_pred)
+        
+        # Calculate ROC curve and AUC
+        fpr, tpr, _ = roc_curve(y_test, y_pred_proba)
+        roc_auc = auc(fpr, tpr)
+        
+        # Calculate precision-recall curve
+        precision, recall, _ = precision_recall_curve(y_test, y_pred_proba)
     
     # Print evaluation metrics
     print(f"Model Accuracy: {accuracy:.4f}")
     print(f"ROC AUC: {roc_auc:.4f}")
+    if cv_scores is not None:
+        print(f"Cross-validated ROC AUC: {cv_scores.mean():.4f} (+/- {cv_scores.std():.4f})")
     print("\nClassification Report:")
     print(classification_report(y_test, y_pred))
     print("\nConfusion Matrix:")
@@ -158,6 +195,8 @@ def train_model(perform_grid_search=False):
         'precision': float(report['1']['precision']),
         'recall': float(report['1']['recall']),
         'f1_score': float(report['1']['f1-score']),
+        'cv_roc_auc': (float(cv_scores.mean()) if cv_scores is not None
+                       else search_report['best_score'] if search_report is not None else None),
         'confusion_matrix': conf_matrix.tolist(),
         'classification_report': report
     }
@@ -166,20 +205,45 @@ def train_model(perform_grid_search=False):
     with open('model_evaluation.json', 'w') as f:
         json.dump(evaluation, f, indent=4)
     
+    # Save the search report, with the tuned model's score on the test split
+    if search_report is not None:
+        search_report['test_roc_auc'] = float(roc_auc)
+        with open('search_report.json', 'w') as f:
+            json.dump(search_report, f, indent=4)
+    
     print("Saving model...")
     # Save the model
-    joblib.dump(model, 'heart_disease_model.pkl')
+    with profiler.stage('save_model'):
+        joblib.dump(model, 'heart_disease_model.pkl')
+    # Memory-mappable copy of the forest for multi-worker serving
+    with profiler.stage('save_model_arrays'):
+        save_model_arrays(model, 'heart_disease_model.pkl')
+    # Population statistics served with this model
+    with profiler.stage('save_stats'):
+        population_stats = compute_stats(df, model_path='heart_disease_model.pkl')
+        save_stats(population_stats)
+        PercentileIndex(df).save(model_path='heart_disease_model.pkl')
+        CohortCube(df, version=population_stats['dataset_version']).save(model_path='heart_disease_model.pkl')
     
     print("Creating visualizations...")
     # Create visualizations
-    create_visualizations(df, X_test, y_test, y_pred_proba, fpr, tpr, roc_auc, precision, recall)
+    with profiler.stage('visualizations'):
+        profiler.charts = create_visualizations(df, X_test, y_test, y_pred_proba, fpr, tpr, roc_auc,
+                                                precision, recall)
+    
+    # Save the stage and chart timings next to the evaluation metrics
+    profiler.print_report(profiler.save('training_profile.json'))
     
     return model
 
-def create_visualizations(df, X_test, y_test, y_pred_proba, fpr, tpr, roc_auc, precision, recall):
+def create_visualizations(df, X_test, y_test, y_pred_proba, fpr, tpr, roc_auc, precision, recall,
+                          workers=None, force=False):
     """
     Create visualizations for the heart disease dataset and model evaluation
     
+    Each chart is rendered as an independent task in a process pool; charts
+    whose inputs have not changed since they were last written are skipped.
+    
     Args:
         df: The full dataframe
         X_test: Test features
@@ -190,193 +254,90 @@ def create_visualizations(df, X_test, y_test, y_pred_proba, fpr, tpr, roc_auc, p
         roc_auc: Area under the ROC curve
         precision: Precision values for precision-recall curve
         recall: Recall values for precision-recall curve
+        workers: Number of rendering processes (defaults to the CPU count)
+        force: Re-render every chart even if its inputs are unchanged
+        
+    Returns:
+        report: Per-chart timing report from charts.render_charts
     """
-    # Create directories for visualizations
-    if not os.path.exists('static'):
-        os.makedirs('static')
-    if not os.path.exists('static/images'):
-        os.makedirs('static/images')
-    
-    # Set the style for all plots
-    sns.set_style('whitegrid')
-    plt.rcParams['font.family'] = 'sans-serif'
-    plt.rcParams['font.sans-serif'] = ['Arial']
-    plt.rcParams['axes.labelsize'] = 12
-    plt.rcParams['axes.titlesize'] = 14
-    plt.rcParams['xtick.labelsize'] = 10
-    plt.rcParams['ytick.labelsize'] = 10
-    
-    # 1. Age distribution by heart disease
-    plt.figure(figsize=(10, 6))
-    sns.histplot(data=df, x='age', hue='TenYearCHD', kde=True, bins=20, palette=['#4CAF50', '#F44336'])
-    plt.title('Age Distribution by Heart Disease Risk')
-    plt.xlabel('Age')
-    plt.ylabel('Count')
-    plt.tight_layout()
-    plt.savefig('static/age_distribution.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 2. Correlation heatmap
-    plt.figure(figsize=(12, 10))
-    numeric_df = df.select_dtypes(include=[np.number])
-    correlation = numeric_df.corr()
-    mask = np.triu(correlation)
-    cmap = sns.diverging_palette(230, 20, as_cmap=True)
-    sns.heatmap(correlation, annot=True, cmap=cmap, fmt='.2f', mask=mask, linewidths=0.5)
-    plt.title('Correlation Heatmap of Numerical Features')
-    plt.tight_layout()
-    plt.savefig('static/correlation_heatmap.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 3. Blood pressure by heart disease
-    plt.figure(figsize=(10, 6))
-    scatter = sns.scatterplot(data=df, x='sysBP', y='diaBP', hue='TenYearCHD', 
-                             palette=['#4CAF50', '#F44336'], alpha=0.7, s=80)
-    plt.title('Blood Pressure by Heart Disease Risk')
-    plt.xlabel('Systolic Blood Pressure (mmHg)')
-    plt.ylabel('Diastolic Blood Pressure (mmHg)')
-    
-    # Add a line for hypertension threshold
-    plt.axhline(y=90, color='#FF9800', linestyle='--', alpha=0.7, label='Hypertension Threshold (90 mmHg)')
-    plt.axvline(x=140, color='#FF9800', linestyle='--', alpha=0.7, label='Hypertension Threshold (140 mmHg)')
-    
-    # Add legend
-    handles, labels = scatter.get_legend_handles_labels()
-    plt.legend(handles=handles, labels=['No Heart Disease', 'Heart Disease', 'Hypertension Threshold'])
-    
-    plt.tight_layout()
-    plt.savefig('static/blood_pressure.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 4. Feature importance
+    start = time.perf_counter()
+    
+    # Each chart only receives (and is only invalidated by) the columns it draws
+    tasks = [
+        ('age_distribution.png', charts.age_distribution, {'df': df[['age', 'TenYearCHD']]}),
+        ('correlation_heatmap.png', charts.correlation_heatmap, {'df': df.select_dtypes(include=[np.number])}),
+        ('blood_pressure.png', charts.blood_pressure, {'df': df[['sysBP', 'diaBP', 'TenYearCHD']]}),
+    ]
+    
     try:
         model = joblib.load('heart_disease_model.pkl')
         feature_names = model.named_steps['preprocessor'].get_feature_names_out()
         importances = model.named_steps['classifier'].feature_importances_
-        
-        # Sort features by importance
-        indices = np.argsort(importances)[-10:]  # Top 10 features
-        
-        plt.figure(figsize=(10, 8))
-        plt.barh(range(len(indices)), importances[indices], align='center', color='#2196F3')
-        plt.yticks(range(len(indices)), [feature_names[i] for i in indices])
-        plt.xlabel('Relative Importance')
-        plt.title('Top 10 Most Important Features for Heart Disease Prediction')
-        plt.tight_layout()
-        plt.savefig('static/feature_importance.png', dpi=300, bbox_inches='tight')
-        plt.close()
+        tasks.append(('feature_importance.png', charts.feature_importance,
+                      {'feature_names': list(feature_names), 'importances': importances}))
     except Exception as e:
         print(f"Could not create feature importance plot: {e}")
     
-    # 5. Smoking status by heart disease
-    plt.figure(figsize=(10, 6))
-    smoking_chd = pd.crosstab(df['is_smoking'], df['TenYearCHD'])
-    smoking_chd.columns = ['No Heart Disease', 'Heart Disease']
-    smoking_chd.index = ['Non-Smoker', 'Smoker']
+    tasks += [
+        ('smoking_status.png', charts.smoking_status, {'df': df[['is_smoking', 'TenYearCHD']]}),
+        ('roc_curve.png', charts.roc_curve, {'fpr': fpr, 'tpr': tpr, 'roc_auc': float(roc_auc)}),
+        ('precision_recall_curve.png', charts.precision_recall_curve, {'precision': precision, 'recall': recall}),
+        ('age_vs_cholesterol.png', charts.age_vs_cholesterol, {'df': df[['age', 'totChol', 'TenYearCHD']]}),
+        ('bmi_distribution.png', charts.bmi_distribution, {'df': df[['BMI', 'TenYearCHD']]}),
+        ('diabetes_heart_disease.png', charts.diabetes_heart_disease, {'df': df[['diabetes', 'TenYearCHD']]}),
+    ]
     
-    ax = smoking_chd.plot(kind='bar', stacked=True, color=['#4CAF50', '#F44336'])
+    report = charts.render_charts(tasks, workers=workers, force=force)
     
-    # Add percentage labels
-    for i, (no_hd, hd) in enumerate(zip(smoking_chd['No Heart Disease'], smoking_chd['Heart Disease'])):
-        total = no_hd + hd
-        pct_no_hd = no_hd / total * 100
-        pct_hd = hd / total * 100
-        
-        ax.text(i, no_hd/2, f"{pct_no_hd:.1f}%", ha='center', va='center', color='white', fontweight='bold')
-        ax.text(i, no_hd + hd/2, f"{pct_hd:.1f}%", ha='center', va='center', color='white', fontweight='bold')
-    
-    plt.title('Smoking Status by Heart Disease Risk')
-    plt.xlabel('Smoking Status')
-    plt.ylabel('Count')
-    plt.tight_layout()
-    plt.savefig('static/smoking_status.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 6. ROC Curve
-    plt.figure(figsize=(8, 8))
-    plt.plot(fpr, tpr, color='#2196F3', lw=2, label=f'ROC curve (AUC = {roc_auc:.2f})')
-    plt.plot([0, 1], [0, 1], color='#9E9E9E', lw=2, linestyle='--', label='Random Guess')
-    plt.xlim([0.0, 1.0])
-    plt.ylim([0.0, 1.05])
-    plt.xlabel('False Positive Rate')
-    plt.ylabel('True Positive Rate')
-    plt.title('Receiver Operating Characteristic (ROC) Curve')
-    plt.legend(loc='lower right')
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    plt.savefig('static/roc_curve.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 7. Precision-Recall Curve
-    plt.figure(figsize=(8, 8))
-    plt.plot(recall, precision, color='#FF9800', lw=2)
-    plt.xlabel('Recall')
-    plt.ylabel('Precision')
-    plt.title('Precision-Recall Curve')
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    plt.savefig('static/precision_recall_curve.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 8. Age vs. Cholesterol by Heart Disease
-    plt.figure(figsize=(10, 6))
-    scatter = sns.scatterplot(data=df, x='age', y='totChol', hue='TenYearCHD', 
-                             palette=['#4CAF50', '#F44336'], alpha=0.7, s=80)
-    plt.title('Age vs. Total Cholesterol by Heart Disease Risk')
-    plt.xlabel('Age')
-    plt.ylabel('Total Cholesterol (mg/dL)')
-    
-    # Add a line for high cholesterol threshold
-    plt.axhline(y=240, color='#FF9800', linestyle='--', alpha=0.7, label='High Cholesterol Threshold (240 mg/dL)')
-    
-    # Add legend
-    handles, labels = scatter.get_legend_handles_labels()
-    plt.legend(handles=handles, labels=['No Heart Disease', 'Heart Disease', 'High Cholesterol Threshold'])
-    
-    plt.tight_layout()
-    plt.savefig('static/age_vs_cholesterol.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 9. BMI Distribution by Heart Disease
-    plt.figure(figsize=(10, 6))
-    sns.histplot(data=df, x='BMI', hue='TenYearCHD', kde=True, bins=20, palette=['#4CAF50', '#F44336'])
-    
-    # Add vertical lines for BMI categories
-    plt.axvline(x=18.5, color='#2196F3', linestyle='--', alpha=0.7, label='Underweight/Normal')
-    plt.axvline(x=25, color='#FF9800', linestyle='--', alpha=0.7, label='Normal/Overweight')
-    plt.axvline(x=30, color='#F44336', linestyle='--', alpha=0.7, label='Overweight/Obese')
-    
-    plt.title('BMI Distribution by Heart Disease Risk')
-    plt.xlabel('Body Mass Index (BMI)')
-    plt.ylabel('Count')
-    plt.legend(title='Heart Disease Risk')
-    plt.tight_layout()
-    plt.savefig('static/bmi_distribution.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    # 10. Diabetes and Heart Disease
-    plt.figure(figsize=(8, 6))
-    diabetes_chd = pd.crosstab(df['diabetes'], df['TenYearCHD'])
-    diabetes_chd.columns = ['No Heart Disease', 'Heart Disease']
-    diabetes_chd.index = ['No Diabetes', 'Diabetes']
-    
-    ax = diabetes_chd.plot(kind='bar', stacked=True, color=['#4CAF50', '#F44336'])
-    
-    # Add percentage labels
-    for i, (no_hd, hd) in enumerate(zip(diabetes_chd['No Heart Disease'], diabetes_chd['Heart Disease'])):
-        total = no_hd + hd
-        pct_no_hd = no_hd / total * 100
-        pct_hd = hd / total * 100
+    # Give re-rendered charts new hashed URLs
+    if any(entry['status'] == 'rendered' for entry in report):
+        build_assets()
+    
+    charts.print_report(report, time.perf_counter() - start)
+    return report
+
+def regenerate_visualizations(model_path='heart_disease_model.pkl', workers=None, force=False):
+    """
+    Re-render the charts from the saved model and the held-out test split
+    
+    Uses the same split as training, so the ROC and precision-recall curves
+    are the model's real evaluation curves.
+    
+    Args:
+        model_path: Path of the trained model
+        workers: Number of rendering processes (defaults to the CPU count)
+        force: Re-render every chart even if its inputs are unchanged
         
-        ax.text(i, no_hd/2, f"{pct_no_hd:.1f}%", ha='center', va='center', color='white', fontweight='bold')
-        ax.text(i, no_hd + hd/2, f"{pct_hd:.1f}%", ha='center', va='center', color='white', fontweight='bold')
-    
-    plt.title('Diabetes Status by Heart Disease Risk')
-    plt.xlabel('Diabetes Status')
-    plt.ylabel('Count')
-    plt.tight_layout()
-    plt.savefig('static/diabetes_heart_disease.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    Returns:
+        result: Dictionary with the ROC AUC and the per-chart timing report
+    """
+    X_train, X_test, y_train, y_test, df = load_and_preprocess_data()
+    model = joblib.load(model_path)
+    y_pred_proba = model.predict_proba(X_test)[:, 1]
+    
+    # Calculate ROC and precision-recall curves on the test split
+    fpr, tpr, _ = roc_curve(y_test, y_pred_proba)
+    roc_auc = auc(fpr, tpr)
+    precision, recall, _ = precision_recall_curve(y_test, y_pred_proba)
+    
+    report = create_visualizations(df, X_test, y_test, y_pred_proba, fpr, tpr, roc_auc, precision, recall,
+                                   workers=workers, force=force)
+    return {'roc_auc': float(roc_auc), 'charts': report}
 
 if __name__ == "__main__":
-    train_model(perform_grid_search=False)
\ No newline at end of file
+    # python model.py [--search {grid,halving,random}] [--profile [{cprofile,pyinstrument}]]
+    #                 [--cross-validate] [--cache]
+    parser = argparse.ArgumentParser(description='Train the heart disease model')
+    parser.add_argument('--search', choices=SEARCH_METHODS,
+                        help='tune the hyperparameters instead of using the defaults')
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=PROFILERS,
+                        help='also save a profile of the slowest stage (default: cprofile)')
+    parser.add_argument('--cross-validate', action='store_true',
+                        help="report the default model's 5-fold cross-validated ROC AUC")
+    parser.add_argument('--cache', action='store_true',
+                        help=f'keep preprocessed matrices in {DEFAULT_CACHE_DIR}/ across runs')
+    args = parser.parse_args()
+    train_model(search=args.search,
+                profile=args.profile,
+                cross_validate=args.cross_validate,
+                cache_dir=DEFAULT_CACHE_DIR if args.cache else None)
\ No newline at end of file
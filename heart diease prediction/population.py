@@ -0,0 +1,381 @@
+"""
+Population statistics snapshot shipped with the model
+
+Training writes heart_disease_model.stats.json next to the model: row
+counts, class balance and, for every feature, count, missing values,
+mean, standard deviation, min/max, median, quantiles and a histogram.
+Web workers read this small file instead of parsing the dataset, so every
+worker reports the same population numbers, and the numbers are tied to
+the model artifact they were computed with.
+
+PercentileIndex keeps each numerical feature's values sorted, overall and
+per sex and age-band cohort, so a patient's percentile rank is a binary
+search whatever the size of the reference population. Training saves the
+index next to the model too (heart_disease_model.percentiles.npz), so
+workers load the sorted arrays instead of building them from the dataset.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from dataset import load_dataset, load_columns, dataset_version, DATASET_PATH, NUMERICAL_FEATURES
+from prediction_cache import artifact_version
+
+DEFAULT_STATS_PATH = 'heart_disease_model.stats.json'
+
+DEFAULT_PERCENTILES_PATH = 'heart_disease_model.percentiles.npz'
+
+# Bumped when the snapshot layout changes; older snapshots are rebuilt
+STATS_SCHEMA_VERSION = 1
+
+TARGET = 'TenYearCHD'
+
+# Columns that are not features
+EXCLUDED_COLUMNS = ['id', TARGET]
+
+QUANTILES = [0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
+
+HISTOGRAM_BINS = 20
+
+# Lower bounds of the age bands used for cohort percentiles: <40, 40-49, 50-59, 60+
+AGE_BAND_EDGES = [40, 50, 60]
+
+SEX_LABELS = {0: 'female', 1: 'male'}
+
+def feature_stats(values):
+    """
+    Summary statistics of one feature, ignoring missing values
+
+    Args:
+        values: Array of the feature's values
+
+    Returns:
+        stats: Dictionary with count, missing, mean, std, min, max, median, quantiles and histogram
+    """
+    values = np.asarray(values, dtype=np.float64)
+    present = values[~np.isnan(values)]
+    stats = {'count': int(len(present)), 'missing': int(len(values) - len(present))}
+    if len(present) == 0:
+        return stats
+
+    counts, edges = np.histogram(present, bins=HISTOGRAM_BINS)
+    stats.update({
+        'mean': float(present.mean()),
+        'std': float(present.std(ddof=1)) if len(present) > 1 else 0.0,
+        'min': float(present.min()),
+        'max': float(present.max()),
+        'median': float(np.median(present)),
+        'quantiles': {str(q): float(v) for q, v in zip(QUANTILES, np.quantile(present, QUANTILES))},
+        'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()}
+    })
+    return stats
+
+def compute_stats(df, dataset_path=DATASET_PATH, model_path=None):
+    """
+    Build the statistics snapshot of a dataset
+
+    Args:
+        df: The full dataframe, including the target column
+        dataset_path: CSV the dataframe was loaded from, for the dataset version
+        model_path: Model artifact the snapshot belongs to, if any
+
+    Returns:
+        stats: JSON-serialisable snapshot dictionary
+    """
+    target = df[TARGET].to_numpy(dtype=np.float64)
+    positives = int(target.sum())
+    return {
+        'schema_version': STATS_SCHEMA_VERSION,
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'dataset_version': dataset_version(dataset_path),
+        'model_version': artifact_version(model_path) if model_path and os.path.exists(model_path) else None,
+        'rows': int(len(df)),
+        'class_balance': {
+            'positive': positives,
+            'negative': int(len(df) - positives),
+            'positive_rate': positives / len(df) if len(df) else 0.0
+        },
+        'features': {column: feature_stats(df[column])
+                     for column in df.columns if column not in EXCLUDED_COLUMNS}
+    }
+
+def save_stats(stats, path=DEFAULT_STATS_PATH):
+    """
+    Write the snapshot atomically, so workers never read a partial file
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix='.stats-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(stats, f, indent=2)
+    os.replace(temporary, path)
+
+def load_stats(path=DEFAULT_STATS_PATH):
+    """
+    The saved snapshot, or None if it is missing, unreadable or from an older schema
+    """
+    try:
+        with open(path, 'r') as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stats.get('schema_version') != STATS_SCHEMA_VERSION:
+        return None
+    return stats
+
+def stats_current(stats, model_path):
+    """
+    Whether a snapshot was written for the current model artifact
+    """
+    if stats is None:
+        return False
+    if not os.path.exists(model_path):
+        return stats.get('model_version') is None
+    return stats.get('model_version') == artifact_version(model_path)
+
+def load_or_build_stats(path=DEFAULT_STATS_PATH, model_path='heart_disease_model.pkl', dataset_path=DATASET_PATH):
+    """
+    Load the snapshot, rebuilding it from the dataset if it belongs to another model
+
+    A rebuilt snapshot is saved only when the model exists, so a model that
+    is still being trained writes its own snapshot.
+
+    Returns:
+        stats: Snapshot dictionary
+    """
+    stats = load_stats(path)
+    if stats_current(stats, model_path):
+        return stats
+    stats = compute_stats(load_dataset(dataset_path, exact=True), dataset_path, model_path)
+    if stats['model_version'] is not None:
+        save_stats(stats, path)
+    return stats
+
+def save_arrays(arrays, path, model_path):
+    """
+    Write named arrays as one .npz tagged with the model artifact, atomically
+
+    Args:
+        arrays: Dictionary of name -> array
+        path: Destination .npz file
+        model_path: Model artifact the arrays belong to
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix='.arrays-', suffix='.npz')
+    with os.fdopen(fd, 'wb') as f:
+        np.savez(f, schema_version=STATS_SCHEMA_VERSION, model_version=artifact_version(model_path), **arrays)
+    os.replace(temporary, path)
+
+def load_arrays(path, model_path):
+    """
+    Arrays written by save_arrays() for the current model artifact
+
+    Returns:
+        arrays: Dictionary of name -> array, or None if the file is missing, unreadable,
+            from an older schema or written for another model
+    """
+    if not os.path.exists(model_path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if (int(data['schema_version']) != STATS_SCHEMA_VERSION
+                    or str(data['model_version']) != artifact_version(model_path)):
+                return None
+            return {name: data[name] for name in data.files}
+    except (OSError, ValueError, KeyError):
+        return None
+
+def summary_stats(stats):
+    """
+    The headline numbers shown on the dashboard, from a snapshot
+
+    Returns:
+        summary: Dictionary with total_records, positive/negative cases and rate,
+            average age, cholesterol and blood pressure, and smoker count and percentage
+    """
+    features = stats['features']
+    smokers = features['is_smoking']
+    return {
+        'total_records': stats['rows'],
+        'positive_cases': stats['class_balance']['positive'],
+        'negative_cases': stats['class_balance']['negative'],
+        'positive_rate': stats['class_balance']['positive_rate'],
+        'avg_age': features['age']['mean'],
+        'avg_cholesterol': features['totChol']['mean'],
+        'avg_systolic_bp': features['sysBP']['mean'],
+        'avg_diastolic_bp': features['diaBP']['mean'],
+        'smokers_count': int(round(smokers['mean'] * smokers['count'])),
+        'smokers_percentage': smokers['mean'] * 100
+    }
+
+def age_band(age):
+    """
+    Index into AGE_BAND_EDGES bands and label of an age, e.g. (1, '40-49')
+    """
+    index = int(np.searchsorted(AGE_BAND_EDGES, age, side='right'))
+    if index == 0:
+        return index, f'<{AGE_BAND_EDGES[0]}'
+    if index == len(AGE_BAND_EDGES):
+        return index, f'{AGE_BAND_EDGES[-1]}+'
+    return index, f'{AGE_BAND_EDGES[index - 1]}-{AGE_BAND_EDGES[index] - 1}'
+
+def percentile_rank(sorted_values, value):
+    """
+    Percentage of the population below value, counting ties as half
+
+    Args:
+        sorted_values: Ascending array without missing values
+        value: The patient's value
+
+    Returns:
+        percentile: Number between 0 and 100, or None if there is no population to compare with
+    """
+    if len(sorted_values) == 0:
+        return None
+    below = np.searchsorted(sorted_values, value, side='left')
+    not_above = np.searchsorted(sorted_values, value, side='right')
+    return float(100.0 * (below + not_above) / 2 / len(sorted_values))
+
+def sorted_median(sorted_values):
+    """
+    Median of an ascending array without scanning it, or None if it is empty
+    """
+    n = len(sorted_values)
+    if n == 0:
+        return None
+    return float(sorted_values[(n - 1) // 2] + sorted_values[n // 2]) / 2
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnan(value) else value
+
+class PercentileIndex:
+    """
+    Sorted feature values of the population, overall and per sex and age-band cohort
+    """
+
+    def __init__(self, columns, features=NUMERICAL_FEATURES):
+        """
+        Args:
+            columns: Dictionary of column name -> array, with at least the features, 'sex' and 'age'
+            features: Numerical features to rank
+        """
+        self.features = list(features)
+        sex = np.asarray(columns['sex'], dtype=np.float64)
+        age = np.asarray(columns['age'], dtype=np.float64)
+        band = np.searchsorted(AGE_BAND_EDGES, age, side='right')
+        # searchsorted puts a missing age in the last band; those rows belong to no cohort
+        band[np.isnan(age)] = -1
+
+        self.overall = {}
+        self.cohorts = {}
+        cohort_masks = {(s, b): (sex == s) & (band == b)
+                        for s in SEX_LABELS for b in range(len(AGE_BAND_EDGES) + 1)}
+        for feature in self.features:
+            values = np.asarray(columns[feature], dtype=np.float64)
+            present = ~np.isnan(values)
+            self.overall[feature] = np.sort(values[present])
+            for key, mask in cohort_masks.items():
+                self.cohorts.setdefault(key, {})[feature] = np.sort(values[mask & present])
+        self.cohort_sizes = {key: int(mask.sum()) for key, mask in cohort_masks.items()}
+        self.size = len(sex)
+
+    @classmethod
+    def from_dataset(cls, dataset_path=DATASET_PATH, features=NUMERICAL_FEATURES):
+        """
+        Build the index from the dataset's column cache
+        """
+        return cls(load_columns(dataset_path, list(features) + ['sex', 'age'], exact=True), features)
+
+    def save(self, path=DEFAULT_PERCENTILES_PATH, model_path='heart_disease_model.pkl'):
+        """
+        Write the sorted arrays next to the model they were built for
+        """
+        bands = range(len(AGE_BAND_EDGES) + 1)
+        arrays = {
+            'features': np.array(self.features),
+            'size': np.array(self.size),
+            'cohort_sizes': np.array([[self.cohort_sizes[(s, b)] for b in bands] for s in SEX_LABELS])
+        }
+        for feature in self.features:
+            arrays[f'overall.{feature}'] = self.overall[feature]
+            for (s, b), values in self.cohorts.items():
+                arrays[f'cohort.{s}.{b}.{feature}'] = values[feature]
+        save_arrays(arrays, path, model_path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PERCENTILES_PATH, model_path='heart_disease_model.pkl'):
+        """
+        The index saved for the current model artifact, or None
+        """
+        arrays = load_arrays(path, model_path)
+        if arrays is None:
+            return None
+        index = cls.__new__(cls)
+        index.features = arrays['features'].tolist()
+        index.size = int(arrays['size'])
+        index.overall = {feature: arrays[f'overall.{feature}'] for feature in index.features}
+        index.cohorts = {}
+        index.cohort_sizes = {}
+        for i, s in enumerate(SEX_LABELS):
+            for b in range(len(AGE_BAND_EDGES) + 1):
+                index.cohort_sizes[(s, b)] = int(arrays['cohort_sizes'][i, b])
+                index.cohorts[(s, b)] = {feature: arrays[f'cohort.{s}.{b}.{feature}'] for feature in index.features}
+        return index
+
+    def compare(self, record):
+        """
+        Percentile ranks of a patient's numerical features
+
+        Args:
+            record: Dictionary of input features
+
+        Returns:
+            comparison: {'cohort': {...} or None, 'features': {feature: {'value', 'percentile',
+                'cohort_percentile', 'population_median', 'cohort_median'}}}. Values the record
+                does not have are None.
+        """
+        sex, age = _number(record.get('sex')), _number(record.get('age'))
+        cohort = None
+        if sex in SEX_LABELS and age is not None:
+            band, label = age_band(age)
+            key = (int(sex), band)
+            cohort = {'sex': SEX_LABELS[int(sex)], 'age_band': label, 'size': self.cohort_sizes[key]}
+
+        features = {}
+        for feature in self.features:
+            overall = self.overall[feature]
+            cohort_values = self.cohorts[key][feature] if cohort else None
+            value = _number(record.get(feature))
+            features[feature] = {
+                'value': value,
+                'percentile': percentile_rank(overall, value) if value is not None else None,
+                'cohort_percentile': percentile_rank(cohort_values, value)
+                    if cohort and value is not None else None,
+                'population_median': sorted_median(overall),
+                'cohort_median': sorted_median(cohort_values) if cohort else None
+            }
+        return {'cohort': cohort, 'features': features}
+
+def load_or_build_index(path=DEFAULT_PERCENTILES_PATH, model_path='heart_disease_model.pkl', dataset_path=DATASET_PATH):
+    """
+    Load the percentile index, rebuilding it from the dataset if it belongs to another model
+
+    Like the statistics snapshot, a rebuilt index is saved only when the model exists.
+
+    Returns:
+        index: PercentileIndex
+    """
+    index = PercentileIndex.load(path, model_path)
+    if index is not None:
+        return index
+    index = PercentileIndex.from_dataset(dataset_path)
+    if os.path.exists(model_path):
+        index.save(path, model_path)
+    return index
@@ -0,0 +1,289 @@
+"""
+Cache of /predict results keyed on the canonicalized patient input
+
+Identical feature sets (retries, page reloads, repeated dashboard checks)
+are answered from the cache instead of re-running the pipeline. Keys are a
+hash of the 15 model features plus the version of the model artifact, so
+a retrained model never serves results computed by the old one.
+
+Each worker keeps an in-process LRU cache with size and TTL limits.
+Optionally a SQLite file shared by all workers on the host sits behind it,
+so a result computed by one worker is a hit in the others. It stands in
+for a network cache: anything with the same get/put/clear interface can
+take its place. A shared hit is copied into the local cache only for the
+time the shared entry has left, so no result outlives the TTL.
+"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL = 3600
+
+# Shared cache housekeeping runs once every this many writes
+PRUNE_EVERY = 256
+
+def artifact_version(path):
+    """
+    Version token of a model artifact that changes whenever the file is rewritten
+
+    Args:
+        path: Path of the model file
+
+    Returns:
+        version: String built from the file's size and modification time
+    """
+    stat = os.stat(path)
+    return f'{stat.st_size}-{stat.st_mtime_ns}'
+
+def _canonical(value):
+    """
+    Canonical JSON-friendly form of one input value
+
+    Numbers compare by value (1, 1.0 and True are the same input to the
+    model), NaN and None stay distinct, and strings are kept as they are.
+    """
+    if isinstance(value, (bool, int, float)):
+        value = float(value)
+        return 'nan' if math.isnan(value) else value
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+def cache_key(data, features, version):
+    """
+    Hash of the model features of an input record and the model version
+
+    Args:
+        data: Dictionary of input features (extra keys are ignored)
+        features: Ordered list of the feature names that affect the result
+        version: Model artifact version
+
+    Returns:
+        key: Hex digest
+    """
+    canonical = json.dumps([version] + [_canonical(data.get(name)) for name in features])
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with a time-to-live per entry
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        """
+        Args:
+            max_entries: Least recently used entries are evicted beyond this size
+            ttl: Seconds an entry stays valid
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl=None):
+        """
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Seconds this entry stays valid, if not the cache's TTL
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteCache:
+    """
+    Cache shared by all worker processes on one host through a SQLite file
+
+    Entries expire after the TTL; beyond max_entries the oldest entries are
+    dropped (all entries share one TTL, so oldest means soonest to expire).
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache (expires_at);
+    """
+
+    def __init__(self, db_path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        """
+        Args:
+            db_path: Path of the SQLite database file
+            max_entries: Entries kept after pruning
+            ttl: Seconds an entry stays valid
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connect(self):
+        # One connection per thread and process, as in history_store
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        connection = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=OFF')
+        connection.executescript(self.SCHEMA)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        """
+        Cached value for a key and the seconds it has left, or None
+
+        Returns:
+            entry: (value, ttl) tuple, or None if the key is missing or expired
+        """
+        now = time.time()
+        row = self._connect().execute(
+            'SELECT value, expires_at FROM cache WHERE key = ? AND expires_at >= ?', (key, now)
+        ).fetchone()
+        return (json.loads(row[0]), row[1] - now) if row else None
+
+    def put(self, key, value):
+        connection = self._connect()
+        connection.execute('INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                           (key, json.dumps(value), time.time() + self.ttl))
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """
+        Drop expired entries and everything beyond the newest max_entries
+        """
+        connection = self._connect()
+        connection.execute('DELETE FROM cache WHERE expires_at < ?', (time.time(),))
+        connection.execute('DELETE FROM cache WHERE key IN '
+                           '(SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                           (self.max_entries,))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache')
+
+class PredictionCache:
+    """
+    Prediction results keyed on canonicalized input, with hit/miss counters
+    """
+
+    def __init__(self, features, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, shared=None):
+        """
+        Args:
+            features: Ordered list of the features that determine a prediction
+            max_entries: Size of the in-process LRU cache
+            ttl: Seconds a cached result stays valid
+            shared: Optional cache shared between processes (e.g. SQLiteCache), consulted on local misses
+        """
+        self.features = list(features)
+        self.local = LRUCache(max_entries, ttl)
+        self.shared = shared
+        self.version = None
+        self.counters = {'hits': 0, 'shared_hits': 0, 'misses': 0}
+        # Request threads update the counters concurrently
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def set_version(self, version):
+        """
+        Switch to a new model version; results cached for other versions are never served again
+        """
+        if version != self.version:
+            self.version = version
+            self.local.clear()
+
+    def key(self, data):
+        return cache_key(data, self.features, self.version)
+
+    def get(self, key):
+        """
+        Cached result for a key, or None
+        """
+        value = self.local.get(key)
+        if value is not None:
+            self._count('hits')
+            return value
+        if self.shared is not None:
+            try:
+                entry = self.shared.get(key)
+            except sqlite3.Error as e:
+                print(f"Error reading shared prediction cache: {e}")
+                entry = None
+            if entry is not None:
+                value, ttl = entry
+                # Kept locally only as long as the shared entry is still valid
+                self.local.put(key, value, ttl=ttl)
+                self._count('shared_hits')
+                return value
+        self._count('misses')
+        return None
+
+    def put(self, key, value):
+        self.local.put(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.put(key, value)
+            except sqlite3.Error as e:
+                print(f"Error writing shared prediction cache: {e}")
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self):
+        """
+        Hit/miss counters for this process
+
+        Returns:
+            stats: Dictionary with hits, shared_hits, misses, hit_ratio, size and evictions
+        """
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = sum(counters.values())
+        hits = counters['hits'] + counters['shared_hits']
+        return dict(counters,
+                    hit_ratio=hits / lookups if lookups else 0.0,
+                    size=len(self.local),
+                    max_entries=self.local.max_entries,
+                    evictions=self.local.evictions,
+                    model_version=self.version)
@@ -0,0 +1,241 @@
+"""
+Stage-level profiling of model training
+
+TrainingProfiler records, for each named stage of a training run, the
+wall time, the CPU time (this process and any child processes that
+finished during the stage, such as the chart rendering pool) and the peak
+resident memory. The chart workers record the same numbers per chart.
+The profile is written as JSON next to model_evaluation.json.
+
+Peak memory is the kernel's resident-set high-water mark (VmHWM). On
+Linux it is reset at the start of every stage through
+/proc/self/clear_refs, so each stage gets its own peak. Where it cannot be
+reset, the process-wide peak so far is reported and 'peak_rss_scope' says
+so.
+
+Optionally every stage also runs under cProfile (or pyinstrument, if it
+is installed), and the profile of the slowest stage is saved: a .prof file
+for pstats/snakeviz, or an .html report, with its top functions copied
+into the JSON.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+DEFAULT_PROFILE_PATH = 'training_profile.json'
+
+PROFILERS = ['cprofile', 'pyinstrument']
+
+# Functions listed from the slowest stage's profile
+TOP_FUNCTIONS = 15
+
+def _status_kb(field):
+    """
+    A memory field of /proc/self/status in kB, or None where it does not exist
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def reset_peak_rss():
+    """
+    Reset this process's resident memory high-water mark
+
+    Returns:
+        reset: Whether the mark could be reset (Linux only)
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process in MB, since the last reset if there was one
+    """
+    kb = _status_kb('VmHWM')
+    if kb is None:
+        try:
+            import resource
+        except ImportError:
+            return None
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb / 1024
+
+def rss_mb():
+    """
+    Current resident memory of this process in MB, or None where it is not available
+    """
+    kb = _status_kb('VmRSS')
+    return kb / 1024 if kb is not None else None
+
+def cpu_seconds():
+    """
+    CPU time of this process and its finished child processes
+    """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+class TrainingProfiler:
+    """
+    Wall time, CPU time and peak memory per training stage
+    """
+
+    def __init__(self, profiler=None):
+        """
+        Args:
+            profiler: 'cprofile' or 'pyinstrument' to also profile every stage and keep the
+                slowest stage's profile, or None for timings only
+        """
+        if profiler not in PROFILERS + [None]:
+            raise ValueError(f"Unknown profiler '{profiler}', expected one of {PROFILERS}")
+        if profiler == 'pyinstrument' and pyinstrument is None:
+            print("pyinstrument is not installed, profiling with cProfile")
+            profiler = 'cprofile'
+        self.profiler = profiler
+        self.stages = []
+        self.charts = []
+        self.profiles = {}
+        self.started_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        self._start = time.perf_counter()
+        self._cpu = cpu_seconds()
+
+    def _start_profiler(self):
+        if self.profiler == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        if self.profiler == 'pyinstrument':
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+            return profiler
+        return None
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager that measures the enclosed block as one stage
+
+        Stages should not be nested.
+
+        Args:
+            name: Stage name in the report
+        """
+        scope = 'stage' if reset_peak_rss() else 'process'
+        rss_before = rss_mb()
+        profiler = self._start_profiler()
+        cpu = cpu_seconds()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            cpu = cpu_seconds() - cpu
+            if profiler is not None:
+                if self.profiler == 'cprofile':
+                    profiler.disable()
+                else:
+                    profiler.stop()
+                self.profiles[name] = profiler
+            rss_after = rss_mb()
+            self.stages.append({
+                'stage': name,
+                'wall_seconds': wall,
+                'cpu_seconds': cpu,
+                'peak_rss_mb': peak_rss_mb(),
+                'peak_rss_scope': scope,
+                'rss_delta_mb': rss_after - rss_before if rss_before is not None else None
+            })
+
+    def slowest_stage(self):
+        """
+        Name of the stage with the longest wall time, or None before any stage ran
+        """
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda entry: entry['wall_seconds'])['stage']
+
+    def _save_profile(self, stage, path):
+        """
+        Write the profile of one stage next to the report
+
+        Returns:
+            info: Dictionary with the stage, the profiler, the file and the top functions
+        """
+        profiler = self.profiles[stage]
+        base = os.path.splitext(path)[0]
+        if self.profiler == 'pyinstrument':
+            output = f'{base}.html'
+            with open(output, 'w') as f:
+                f.write(profiler.output_html())
+            return {'stage': stage, 'profiler': self.profiler, 'path': output,
+                    'top': profiler.output_text(unicode=False, color=False).splitlines()[:TOP_FUNCTIONS * 2]}
+
+        output = f'{base}.prof'
+        profiler.dump_stats(output)
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        top = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in sorted(
+                stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]:
+            top.append({'function': f'{os.path.basename(filename)}:{line}({function})', 'calls': calls,
+                        'own_seconds': own, 'cumulative_seconds': cumulative})
+        return {'stage': stage, 'profiler': self.profiler, 'path': output, 'top': top}
+
+    def report(self):
+        """
+        The profile as a JSON-serialisable dictionary
+        """
+        return {
+            'started_at': self.started_at,
+            'wall_seconds': time.perf_counter() - self._start,
+            'cpu_seconds': cpu_seconds() - self._cpu,
+            'slowest_stage': self.slowest_stage(),
+            'stages': self.stages,
+            'charts': self.charts
+        }
+
+    def save(self, path=DEFAULT_PROFILE_PATH):
+        """
+        Write the report (and the slowest stage's profile, if profiling) to path
+
+        Returns:
+            report: The report that was written
+        """
+        report = self.report()
+        slowest = report['slowest_stage']
+        if slowest in self.profiles:
+            report['profile'] = self._save_profile(slowest, path)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=4)
+        return report
+
+    def print_report(self, report=None):
+        """
+        Print the per-stage timing table
+        """
+        report = report or self.report()
+        print(f"{'stage':<20}{'wall s':>9}{'cpu s':>9}{'peak MB':>10}")
+        for entry in report['stages']:
+            peak = entry['peak_rss_mb']
+            print(f"{entry['stage']:<20}{entry['wall_seconds']:>9.2f}{entry['cpu_seconds']:>9.2f}"
+                  f"{peak if peak is not None else float('nan'):>10.1f}")
+        print(f"{'total':<20}{report['wall_seconds']:>9.2f}{report['cpu_seconds']:>9.2f}")
+        if 'profile' in report:
+            print(f"Profile of the slowest stage ({report['profile']['stage']}) written to {report['profile']['path']}")
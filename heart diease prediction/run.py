@@ -2,6 +2,9 @@
 Heart Disease Prediction Application Runner
 
 This script checks if the model exists, trains it if needed, and then starts the Flask application.
+
+    python run.py                 Flask development server with the debugger and reloader
+    python run.py --production    gunicorn with gunicorn.conf.py (see that file for settings)
 """
 
 import os
@@ -24,6 +27,15 @@ def main():
     else:
         print("Using existing model.")
     
+    # Hand over to gunicorn for production serving
+    if '--production' in sys.argv[1:]:
+        print("Starting gunicorn...")
+        try:
+            os.execvp('gunicorn', ['gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'])
+        except OSError as e:
+            print(f"Error starting gunicorn: {e}")
+            return 1
+    
     # Start Flask application
     print("Starting web application...")
     try:
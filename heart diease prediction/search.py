@@ -0,0 +1,354 @@
+"""
+Hyperparameter search for the random forest
+
+grid_search is the exhaustive search over PARAM_GRID: 108 configurations
+x 5 folds, every one a full fit with up to 200 trees, scored like
+GridSearchCV(cv=5, scoring='roc_auc') on the same stratified folds.
+
+Preprocessing never depends on the classifier's parameters, so every
+search preprocesses each fold once, through a TransformCache, and fits
+only the classifier per candidate. fit_pipeline and cross_val_roc_auc go
+through the same cache, so retraining and cross-validation on data that
+was already searched skip preprocessing too.
+
+halving_search is successive halving on the same folds. Every candidate
+starts on a small share of each fold's training rows with a few trees.
+After each rung only the best 1/eta go on, with eta times more rows and
+eta times more trees, until the survivors are fitted on the whole fold
+with max_estimators trees. The forests are warm-started: a promoted
+candidate keeps its trees and adds new ones fitted on the larger subset.
+The subsets are nested, so the earlier trees saw a subset of the current
+rows, and stratified, so even the smallest keeps the fold's share of
+heart disease cases. The preprocessor is fitted on the full fold, so every tree sees
+the same feature space. Validation always uses the whole held-out fold,
+so scores are comparable across rungs.
+
+Candidates are either the whole search space or a random sample of it,
+and the search can stop early on a fit budget or a time budget.
+"""
+
+import math
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+
+from transform_cache import TransformCache
+
+# Tree-shape parameters searched by both strategies
+SEARCH_SPACE = {
+    'classifier__max_depth': [None, 10, 20, 30],
+    'classifier__min_samples_split': [2, 5, 10],
+    'classifier__min_samples_leaf': [1, 2, 4]
+}
+
+# The exhaustive grid also searches the number of trees, which halving uses as its resource
+PARAM_GRID = dict(SEARCH_SPACE, classifier__n_estimators=[50, 100, 200])
+
+SEARCH_METHODS = ['grid', 'halving', 'random']
+
+# Candidates sampled by the 'random' method
+RANDOM_CANDIDATES = 16
+
+def preprocess_folds(preprocessor, X, y, cv=5, cache=None):
+    """
+    Fit the preprocessor on each fold's training rows and transform both sides of the fold
+
+    Args:
+        preprocessor: Unfitted preprocessor
+        X, y: Training data
+        cv: Number of stratified folds (unshuffled, the same as GridSearchCV(cv=5))
+        cache: TransformCache to go through, or None for a fresh in-memory one
+
+    Returns:
+        folds: List of (Xt_train, y_train, Xt_test, y_test, seconds) per fold, where seconds
+            is what preprocessing the fold costs without the cache
+    """
+    cache = cache or TransformCache(directory=None)
+    y = np.asarray(y)
+    folds = []
+    for train, test in StratifiedKFold(n_splits=cv).split(X, y):
+        _, Xt_train, Xt_test, seconds = cache.fit_transform(preprocessor, X.iloc[train], X.iloc[test])
+        folds.append((Xt_train, y[train], Xt_test, y[test], seconds))
+    return folds
+
+def _classifier_params(params):
+    return {k.replace('classifier__', '', 1): v for k, v in params.items()}
+
+def _fit_and_score(classifier, params, X_train, y_train, X_test, y_test):
+    start = time.perf_counter()
+    classifier = clone(classifier).set_params(**_classifier_params(params))
+    classifier.fit(X_train, y_train)
+    score = roc_auc_score(y_test, classifier.predict_proba(X_test)[:, 1])
+    return score, time.perf_counter() - start
+
+def fit_pipeline(pipeline, X, y, cache=None):
+    """
+    Fit a preprocessor + classifier pipeline, with the preprocessing through the cache
+
+    Gives the same model as pipeline.fit(X, y).
+
+    Args:
+        pipeline: Unfitted pipeline with 'preprocessor' and 'classifier' steps
+        X, y: Training data
+        cache: TransformCache to go through, or None for a fresh in-memory one
+
+    Returns:
+        model: New fitted pipeline
+    """
+    cache = cache or TransformCache(directory=None)
+    preprocessor, Xt, _, _ = cache.fit_transform(pipeline.named_steps['preprocessor'], X)
+    classifier = clone(pipeline.named_steps['classifier']).fit(Xt, y)
+    return Pipeline(steps=[('preprocessor', preprocessor), ('classifier', classifier)])
+
+def cross_val_roc_auc(pipeline, X, y, cv=5, cache=None):
+    """
+    Cross-validated ROC AUC of a pipeline, like cross_val_score(pipeline, X, y, cv=cv,
+    scoring='roc_auc') but with the fold preprocessing through the cache
+
+    Returns:
+        scores: Array of one ROC AUC per fold
+    """
+    folds = preprocess_folds(pipeline.named_steps['preprocessor'], X, y, cv, cache)
+    classifier = pipeline.named_steps['classifier']
+    return np.array([_fit_and_score(classifier, {}, X_train, y_train, X_test, y_test)[0]
+                     for X_train, y_train, X_test, y_test, _ in folds])
+
+def _preprocessing_report(cache, before, folds, fits_per_fold):
+    """
+    Time spent preprocessing in a search next to what per-fit preprocessing would cost
+    """
+    after = cache.stats
+    return {
+        'hits': after['hits'] - before['hits'],
+        'misses': after['misses'] - before['misses'],
+        'seconds': (after['transform_seconds'] - before['transform_seconds'] +
+                    after['lookup_seconds'] - before['lookup_seconds']),
+        'without_cache_seconds': sum(fold[4] * fits for fold, fits in zip(folds, fits_per_fold))
+    }
+
+def grid_search(pipeline, X, y, param_grid=PARAM_GRID, cv=5, n_jobs=-1, cache=None):
+    """
+    Exhaustive grid search with cross-validated ROC AUC
+
+    Args:
+        pipeline: Pipeline with 'preprocessor' and 'classifier' steps
+        X, y: Training data
+        param_grid: Grid of 'classifier__' parameters
+        cv: Number of stratified folds
+        n_jobs: Parallel fits (-1 for every core)
+        cache: TransformCache for the fold and refit preprocessing
+
+    Returns:
+        model, report: Best pipeline refitted on all of X, and the search report
+    """
+    start = time.perf_counter()
+    cache = cache or TransformCache(directory=None)
+    before = dict(cache.stats)
+    folds = preprocess_folds(pipeline.named_steps['preprocessor'], X, y, cv, cache)
+    candidates = list(ParameterGrid(param_grid))
+    print(f"Fitting {cv} folds for each of {len(candidates)} candidates, totalling {len(candidates) * cv} fits")
+
+    classifier = pipeline.named_steps['classifier']
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_and_score)(classifier, params, X_train, y_train, X_test, y_test)
+        for params in candidates for X_train, y_train, X_test, y_test, _ in folds)
+    scores = np.array([score for score, _ in results]).reshape(len(candidates), cv).mean(axis=1)
+    # The first of equal scores wins, as in GridSearchCV
+    best = int(np.argmax(scores))
+
+    model = fit_pipeline(clone(pipeline).set_params(**candidates[best]), X, y, cache)
+    report = {
+        'method': 'grid',
+        'wall_time': time.perf_counter() - start,
+        'candidates': len(candidates),
+        'fits': len(candidates) * cv,
+        'trees_fitted': sum(params.get('classifier__n_estimators', classifier.n_estimators)
+                            for params in candidates) * cv,
+        'best_params': candidates[best],
+        'best_score': float(scores[best]),
+        'budget_exhausted': False,
+        'fit_seconds': sum(seconds for _, seconds in results),
+        'preprocessing': _preprocessing_report(cache, before, folds, [len(candidates)] * cv)
+    }
+    return model, report
+
+def _schedule(eta, min_estimators, max_estimators, min_fraction):
+    """
+    (n_estimators, fraction of the fold's training rows) per rung
+    """
+    rungs = int(math.floor(math.log(max_estimators / min_estimators, eta) + 1e-9)) + 1
+    if min_fraction is None:
+        min_fraction = 1.0 / eta ** (rungs - 1)
+    schedule = [(min(int(min_estimators * eta ** i), max_estimators), min(1.0, min_fraction * eta ** i))
+                for i in range(rungs)]
+    # The last rung always uses all the trees and all the rows
+    schedule[-1] = (max_estimators, 1.0)
+    return schedule
+
+def _nested_subsets(y, fractions, rng):
+    """
+    Nested, stratified row subsets of a fold's training rows, one per fraction
+
+    Each subset is a stratified sample of the next larger one, so the
+    subsets are nested and all keep the class balance of y.
+
+    Returns:
+        subsets: Dictionary of fraction -> sorted row indices
+    """
+    rows = np.arange(len(y))
+    subsets = {}
+    for fraction in sorted(set(fractions), reverse=True):
+        size = max(int(len(y) * fraction), 2)
+        if size < len(rows):
+            rows = np.sort(train_test_split(rows, train_size=size, stratify=y[rows],
+                                            random_state=rng)[0])
+        subsets[fraction] = rows
+    return subsets
+
+def halving_search(pipeline, X, y, search_space=SEARCH_SPACE, n_candidates=None, eta=2,
+                   min_estimators=25, max_estimators=200, min_fraction=None, cv=5,
+                   max_fits=None, time_budget=None, random_state=42, cache=None):
+    """
+    Successive halving over training rows and trees with warm-started forests
+
+    Args:
+        pipeline: Pipeline with 'preprocessor' and 'classifier' (a RandomForestClassifier) steps
+        X, y: Training data
+        search_space: Lists or scipy distributions of 'classifier__' parameters
+        n_candidates: Number of configurations to sample, or None for the whole space
+            (which must then be all lists)
+        eta: Share of candidates dropped at each rung, and growth of rows and trees
+        min_estimators: Trees per forest in the first rung
+        max_estimators: Trees per forest in the last rung and in the returned model
+        min_fraction: Share of each fold's training rows in the first rung (defaults to
+            1 / eta ** (rungs - 1), so the last rung uses them all)
+        cv: Number of stratified folds
+        max_fits: Stop after this many forest fits (each (candidate, fold, rung) counts once)
+        time_budget: Stop starting new fits after this many seconds
+        random_state: Seed for sampling candidates, row subsets and the forests
+        cache: TransformCache for the fold and refit preprocessing
+
+    Returns:
+        model, report: Best pipeline refitted on all of X with max_estimators trees, and the
+            search report. If the budget runs out, the best candidate of the last rung that
+            was scored on every fold wins.
+    """
+    start = time.perf_counter()
+    if n_candidates is None:
+        candidates = list(ParameterGrid(search_space))
+    else:
+        candidates = list(ParameterSampler(search_space, n_candidates, random_state=random_state))
+    rng = np.random.RandomState(random_state)
+    cache = cache or TransformCache(directory=None)
+    before = dict(cache.stats)
+
+    # Preprocess each fold once; warm-started trees must all see the same transform
+    folds = preprocess_folds(pipeline.named_steps['preprocessor'], X, y, cv, cache)
+    schedule = _schedule(eta, min_estimators, max_estimators, min_fraction)
+    subsets = [_nested_subsets(fold[1], [fraction for _, fraction in schedule], rng) for fold in folds]
+
+    base = clone(pipeline.named_steps['classifier']).set_params(warm_start=True, random_state=random_state)
+    forests = {i: [None] * cv for i in range(len(candidates))}
+    alive = list(range(len(candidates)))
+    rungs = []
+    best = None
+    fits = 0
+    trees_fitted = 0
+    fit_seconds = 0.0
+    exhausted = False
+
+    for n_estimators, fraction in schedule:
+        rung_start = time.perf_counter()
+        scores = {}
+        for i in alive:
+            fold_scores = []
+            for f, (X_train, y_train, X_test, y_test, _) in enumerate(folds):
+                if ((max_fits is not None and fits >= max_fits) or
+                        (time_budget is not None and time.perf_counter() - start >= time_budget)):
+                    exhausted = True
+                    break
+                forest = forests[i][f]
+                if forest is None:
+                    forest = forests[i][f] = clone(base).set_params(**_classifier_params(candidates[i]))
+                added = n_estimators - (len(forest.estimators_) if hasattr(forest, 'estimators_') else 0)
+                rows = subsets[f][fraction]
+                fit_start = time.perf_counter()
+                forest.set_params(n_estimators=n_estimators).fit(X_train[rows], y_train[rows])
+                fold_scores.append(roc_auc_score(y_test, forest.predict_proba(X_test)[:, 1]))
+                fit_seconds += time.perf_counter() - fit_start
+                fits += 1
+                trees_fitted += added
+            if exhausted:
+                break
+            scores[i] = float(np.mean(fold_scores))
+
+        if not scores:
+            break
+        ranked = sorted(scores, key=lambda i: scores[i], reverse=True)
+        rungs.append({
+            'n_estimators': n_estimators,
+            'fraction': fraction,
+            'candidates': len(alive),
+            'scored': len(scores),
+            'best_score': scores[ranked[0]],
+            'seconds': time.perf_counter() - rung_start
+        })
+        # A partly scored rung only decides the winner if no earlier rung finished
+        if not exhausted or best is None:
+            best = ranked[0]
+            best_score = scores[best]
+        if exhausted:
+            break
+        # Forests that are dropped are no longer needed
+        alive = ranked[:max(1, int(math.ceil(len(alive) / eta)))]
+        for i in ranked[len(alive):]:
+            del forests[i]
+
+    if best is None:
+        raise ValueError('The search budget ran out before any candidate was scored on every fold')
+
+    best_params = dict(candidates[best], classifier__n_estimators=max_estimators)
+    model = fit_pipeline(clone(pipeline).set_params(**best_params), X, y, cache)
+    report = {
+        'method': 'halving' if n_candidates is None else 'random',
+        'wall_time': time.perf_counter() - start,
+        'candidates': len(candidates),
+        'fits': fits,
+        'trees_fitted': trees_fitted,
+        'best_params': best_params,
+        'best_score': best_score,
+        'budget_exhausted': exhausted,
+        'fit_seconds': fit_seconds,
+        # Each fold is fitted as often as it was used, without the cache
+        'preprocessing': _preprocessing_report(cache, before, folds, [fits / cv] * cv),
+        'rungs': rungs
+    }
+    return model, report
+
+def run_search(method, pipeline, X, y, **options):
+    """
+    Run one of SEARCH_METHODS
+
+    Args:
+        method: 'grid', 'halving' (every configuration) or 'random' (a sample of
+            RANDOM_CANDIDATES configurations unless n_candidates is given)
+        pipeline: Preprocessing + classifier pipeline
+        X, y: Training data
+        options: Keyword arguments for grid_search or halving_search
+
+    Returns:
+        model, report: Best pipeline and the search report
+    """
+    if method == 'grid':
+        return grid_search(pipeline, X, y, **options)
+    if method == 'halving':
+        return halving_search(pipeline, X, y, **options)
+    if method == 'random':
+        options.setdefault('n_candidates', RANDOM_CANDIDATES)
+        return halving_search(pipeline, X, y, **options)
+    raise ValueError(f"Unknown search method '{method}', expected one of {SEARCH_METHODS}")
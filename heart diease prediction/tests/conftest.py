@@ -0,0 +1,94 @@
+"""
+Shared fixtures for the test suite
+
+Run from the project directory:
+    python -m pytest tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import joblib
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from model import load_and_preprocess_data, create_preprocessing_pipeline
+
+# Tests never write into the project: the dataset is copied to a scratch directory, so its
+# column cache is built there, and the app runs from the same directory with a small model
+WORK_DIR = tempfile.mkdtemp(prefix='heart-tests-')
+DATASET_PATH = os.path.join(WORK_DIR, 'train_updated.csv')
+shutil.copyfile(os.path.join(PROJECT_DIR, 'train_updated.csv'), DATASET_PATH)
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+FEATURE_COLUMNS = ['age', 'education', 'sex', 'is_smoking', 'cigsPerDay', 'BPMeds',
+                   'prevalentStroke', 'prevalentHyp', 'diabetes', 'totChol', 'sysBP',
+                   'diaBP', 'BMI', 'heartRate', 'glucose']
+
+def to_records(frame):
+    """
+    Rows of a feature frame as request dictionaries, with None for missing values
+    """
+    frame = frame[FEATURE_COLUMNS]
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+
+@pytest.fixture(scope='session')
+def split():
+    """
+    X_train, X_test, y_train, y_test of the training split used by model.py
+    """
+    X_train, X_test, y_train, y_test, _ = load_and_preprocess_data(DATASET_PATH)
+    return X_train, X_test, y_train, y_test
+
+@pytest.fixture(scope='session')
+def fitted_pipeline(split):
+    """
+    The model.py pipeline with a small forest, fitted on the training split
+    """
+    X_train, _, y_train, _ = split
+    pipeline = Pipeline(steps=[
+        ('preprocessor', create_preprocessing_pipeline()),
+        ('classifier', RandomForestClassifier(n_estimators=25, random_state=0))
+    ])
+    return pipeline.fit(X_train, y_train)
+
+@pytest.fixture
+def record():
+    return {'age': 64, 'education': 2, 'sex': 0, 'is_smoking': 1, 'cigsPerDay': 3, 'BPMeds': 0,
+            'prevalentStroke': 0, 'prevalentHyp': 0, 'diabetes': 0, 'totChol': 221, 'sysBP': 148,
+            'diaBP': 85, 'BMI': 25.4, 'heartRate': 90, 'glucose': 80}
+
+@pytest.fixture(scope='session')
+def app_module(fitted_pipeline):
+    """
+    The Flask app module, imported in the scratch directory with the small test model
+
+    The app reads and writes its model, statistics, history and job files relative
+    to the working directory, so they all stay in the scratch directory.
+    """
+    joblib.dump(fitted_pipeline, os.path.join(WORK_DIR, 'heart_disease_model.pkl'))
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('HISTORY_DB', os.path.join(WORK_DIR, 'history.db'))
+        mp.setenv('JOBS_DB', os.path.join(WORK_DIR, 'jobs.db'))
+        mp.setenv('PREDICTION_CACHE_SIZE', '0')
+        # Templates reference the plain /static files, so nothing is written to static/dist
+        mp.setenv('ASSET_PIPELINE', '0')
+        for variable in ('PREDICTION_CACHE_DB', 'METRICS_DIR', 'MODEL_MMAP', 'MICRO_BATCHING'):
+            mp.delenv(variable, raising=False)
+        mp.chdir(WORK_DIR)
+        import app
+        app.wait_for_model()
+        yield app
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
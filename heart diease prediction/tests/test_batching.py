@@ -0,0 +1,134 @@
+import threading
+import time
+
+import pytest
+
+from batching import MicroBatcher, QueueFull, BatchTimeout
+
+class GatedModel:
+    """
+    predict_many stand-in that holds its first call until released, so later records queue up
+    """
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.calls = []
+
+    def predict_many(self, records):
+        self.calls.append(len(records))
+        if len(self.calls) == 1:
+            self.gate.wait(5)
+        if any(record.get('bad') for record in records):
+            raise ValueError('bad record')
+        return [record['x'] * 2 for record in records]
+
+def submit_in_threads(batcher, records):
+    results = [None] * len(records)
+
+    def run(i):
+        try:
+            results[i] = batcher.submit(records[i], timeout=5)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(records))]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+def wait_for_queue(batcher, size):
+    deadline = time.time() + 5
+    while batcher._queue.qsize() < size:
+        assert time.time() < deadline, 'records were not queued'
+        time.sleep(0.001)
+
+def test_queued_records_are_scored_together():
+    model = GatedModel()
+    batcher = MicroBatcher(model.predict_many, max_batch_size=64, max_wait=0.001)
+    first, _ = submit_in_threads(batcher, [{'x': 0}])
+    while not model.calls:
+        time.sleep(0.001)
+
+    threads, results = submit_in_threads(batcher, [{'x': i} for i in range(1, 6)])
+    wait_for_queue(batcher, 5)
+    model.gate.set()
+    for thread in first + threads:
+        thread.join()
+
+    assert results == [2, 4, 6, 8, 10]
+    assert model.calls == [1, 5]
+
+def test_failed_batch_falls_back_to_one_record_at_a_time():
+    model = GatedModel()
+    batcher = MicroBatcher(model.predict_many, max_batch_size=64, max_wait=0.001)
+    first, _ = submit_in_threads(batcher, [{'x': 0}])
+    while not model.calls:
+        time.sleep(0.001)
+
+    records = [{'x': 1}, {'x': 2, 'bad': True}, {'x': 3}]
+    threads, results = submit_in_threads(batcher, records)
+    wait_for_queue(batcher, 3)
+    model.gate.set()
+    for thread in first + threads:
+        thread.join()
+
+    # Only the bad record's request fails
+    assert results[0] == 2 and results[2] == 6
+    assert isinstance(results[1], ValueError)
+    assert model.calls == [1, 3, 1, 1, 1]
+
+def test_full_queue_rejects_and_slow_results_time_out():
+    model = GatedModel()
+    batcher = MicroBatcher(model.predict_many, max_batch_size=1, max_wait=0.001, max_queue=1)
+    first, _ = submit_in_threads(batcher, [{'x': 0}])
+    while not model.calls:
+        time.sleep(0.001)
+
+    with pytest.raises(BatchTimeout):
+        batcher.submit({'x': 1}, timeout=0.01)
+    with pytest.raises(QueueFull):
+        batcher.submit({'x': 2}, timeout=0.01)
+    assert batcher.stats['timeouts'] == 1
+    assert batcher.stats['rejected'] == 1
+
+    model.gate.set()
+    for thread in first:
+        thread.join()
+    # The timed-out record is skipped rather than scored
+    assert batcher.submit({'x': 3}, timeout=5) == 6
+
+def test_requests_within_the_window_share_a_batch():
+    calls = []
+
+    def predict_many(records):
+        calls.append(len(records))
+        return [record['x'] for record in records]
+
+    batcher = MicroBatcher(predict_many, max_batch_size=64, max_wait=0.5)
+    first, _ = submit_in_threads(batcher, [{'x': 0}])
+    time.sleep(0.05)
+    second, results = submit_in_threads(batcher, [{'x': 1}, {'x': 2}])
+    for thread in first + second:
+        thread.join()
+    assert results == [1, 2]
+    assert calls == [3]
+
+def test_full_batch_does_not_wait_out_the_window():
+    calls = []
+    batcher = MicroBatcher(lambda records: calls.append(len(records)) or [0] * len(records),
+                           max_batch_size=4, max_wait=5)
+    start = time.perf_counter()
+    threads, _ = submit_in_threads(batcher, [{'x': i} for i in range(4)])
+    for thread in threads:
+        thread.join()
+    assert time.perf_counter() - start < 2
+    assert calls == [4]
+
+def test_stats_count_every_record():
+    batcher = MicroBatcher(lambda records: [0] * len(records), max_batch_size=8, max_wait=0.001)
+    threads, results = submit_in_threads(batcher, [{'x': i} for i in range(200)])
+    for thread in threads:
+        thread.join()
+    assert results == [0] * 200
+    assert batcher.stats['records'] == 200
+    assert batcher.stats['batches'] >= 200 / 8
@@ -0,0 +1,52 @@
+import pytest
+
+@pytest.fixture
+def bench_suite(monkeypatch):
+    # The suite configures the app through os.environ when it is imported; keep that out of other tests
+    for name in ('PREDICTION_CACHE_SIZE', 'MODEL_BACKGROUND_LOADING'):
+        monkeypatch.delenv(name, raising=False)
+    from benchmarks import bench_suite
+    return bench_suite
+
+def result(throughput=1000.0, p50=2.0, p95=5.0, spread=0.1):
+    values = {'throughput': throughput, 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p95 * 2}
+    result = dict(values, requests=100, errors=0, repeats=3)
+    for metric, value in values.items():
+        result[f'{metric}_range'] = [value * (1 - spread), value * (1 + spread)]
+    return result
+
+def test_summarise_takes_the_median_and_range_of_the_repeats(bench_suite):
+    runs = [dict(result(throughput=t, p50=p), errors=e) for t, p, e in [(900, 3.0, 0), (1000, 2.0, 1), (1200, 2.5, 0)]]
+    summary = bench_suite.summarise(runs)
+    assert (summary['throughput'], summary['p50_ms']) == (1000.0, 2.5)
+    assert summary['throughput_range'] == [900.0, 1200.0]
+    assert summary['p50_ms_range'] == [2.0, 3.0]
+    assert (summary['requests'], summary['errors'], summary['repeats']) == (300, 1, 3)
+
+def test_compare_flags_only_clear_regressions(bench_suite):
+    baseline = {'run': result()}
+
+    def regressions(current):
+        return [(metric, before, after)
+                for _, metric, before, after in bench_suite.compare({'run': current}, baseline, 0.25, 0.5)]
+
+    assert regressions(result()) == []
+    assert regressions(result(p95=8.0)) == [('p95_ms', 5.0, 8.0)]
+    assert regressions(result(throughput=600.0)) == [('throughput', 1000.0, 600.0)]
+    # Twice as slow, but by less than min_ms
+    fast = {'run': result(p50=0.2)}
+    assert bench_suite.compare({'run': result(p50=0.4)}, fast, 0.25, 0.5) == []
+    # Slower medians whose repeats still overlap the baseline's are noise
+    assert regressions(result(p95=7.0, spread=0.3)) == []
+    # Runs without a baseline are not compared
+    assert bench_suite.compare({'new': result(p95=50.0)}, baseline, 0.25, 0.5) == []
+
+def test_run_counts_failed_requests(bench_suite):
+    statuses = iter([200, 500] * 100)
+
+    def make_session():
+        return lambda method, path, body: next(statuses)
+    run = bench_suite.run(make_session, 'history', 1, 10, [])
+    assert run['requests'] == 10
+    assert run['errors'] > 0
+    assert run['p50_ms'] <= run['p95_ms'] <= run['p99_ms']
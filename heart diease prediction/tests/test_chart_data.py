@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from conftest import FEATURE_COLUMNS
+from chart_data import CHART_NAMES, HISTOGRAM_BINS, MAX_CURVE_POINTS
+
+def get_chart(client, name):
+    response = client.get(f'/api/charts/{name}')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert response.json['chart'] == name
+    return response.json['data']
+
+def test_lists_every_chart(client):
+    assert client.get('/api/charts').json['charts'] == CHART_NAMES
+
+@pytest.mark.parametrize('name', ['age_histogram', 'bmi_histogram'])
+def test_histograms(client, name):
+    data = get_chart(client, name)
+    assert len(data['edges']) == HISTOGRAM_BINS + 1
+    assert [series['label'] for series in data['series']] == ['No Heart Disease', 'Heart Disease']
+    assert all(len(series['counts']) == HISTOGRAM_BINS for series in data['series'])
+
+@pytest.mark.parametrize('name', ['smoking_crosstab', 'diabetes_crosstab'])
+def test_crosstabs(client, name):
+    data = get_chart(client, name)
+    assert np.array(data['counts']).shape == (2, 2)
+    for row in data['percentages']:
+        assert sum(row) == pytest.approx(100, abs=0.2)
+
+def test_correlation_covers_the_features_and_target_only(client):
+    data = get_chart(client, 'correlation')
+    assert data['columns'] == FEATURE_COLUMNS + ['TenYearCHD']
+    matrix = np.array(data['matrix'])
+    assert matrix.shape == (len(data['columns']), len(data['columns']))
+    np.testing.assert_allclose(np.diag(matrix), 1.0)
+    np.testing.assert_allclose(matrix, matrix.T)
+
+def test_blood_pressure_cells_are_within_the_bins(client):
+    data = get_chart(client, 'blood_pressure')
+    assert data['x'] == 'sysBP' and data['y'] == 'diaBP'
+    for i, j, negatives, positives in data['cells']:
+        assert 0 <= i < len(data['x_edges']) - 1
+        assert 0 <= j < len(data['y_edges']) - 1
+        assert negatives + positives > 0
+
+def test_model_curves(client):
+    roc = get_chart(client, 'roc')
+    assert len(roc['fpr']) == len(roc['tpr']) <= MAX_CURVE_POINTS
+    assert (roc['fpr'][0], roc['fpr'][-1]) == (0.0, 1.0)
+    assert 0.5 < roc['auc'] <= 1.0
+    pr = get_chart(client, 'precision_recall')
+    assert len(pr['recall']) == len(pr['precision']) <= MAX_CURVE_POINTS
+
+def test_unchanged_chart_revalidates_with_304(client):
+    response = client.get('/api/charts/age_histogram')
+    etag = response.headers['ETag']
+    assert client.get('/api/charts/age_histogram', headers={'If-None-Match': etag}).status_code == 304
+
+def test_unknown_chart_is_404(client):
+    response = client.get('/api/charts/pie')
+    assert response.status_code == 404
+    assert response.json['charts'] == CHART_NAMES
@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import charts
+from charts import render_charts, read_png_text, HASH_KEY
+
+# Small images keep the rendering quick
+DPI = 20
+
+def broken_chart(df):
+    raise ValueError('no data to draw')
+
+def chart_tasks(positives=30):
+    df = pd.DataFrame({'is_smoking': [0, 1] * 50, 'TenYearCHD': [1] * positives + [0] * (100 - positives)})
+    fpr = np.linspace(0, 1, 5)
+    return [
+        ('smoking_status.png', charts.smoking_status, {'df': df}),
+        ('roc_curve.png', charts.roc_curve, {'fpr': fpr, 'tpr': np.sqrt(fpr), 'roc_auc': 0.8})
+    ]
+
+def statuses(report):
+    return {entry['chart']: entry['status'] for entry in report}
+
+def test_only_charts_with_new_inputs_are_rendered(tmp_path):
+    output_dir = str(tmp_path)
+    report = render_charts(chart_tasks(), output_dir, DPI, workers=2)
+    assert statuses(report) == {'smoking_status.png': 'rendered', 'roc_curve.png': 'rendered'}
+    assert all(entry['seconds'] > 0 for entry in report)
+    tags = {name: read_png_text(os.path.join(output_dir, name))[HASH_KEY] for name in statuses(report)}
+
+    assert set(statuses(render_charts(chart_tasks(), output_dir, DPI, workers=1)).values()) == {'unchanged'}
+
+    report = render_charts(chart_tasks(positives=40), output_dir, DPI, workers=1)
+    assert statuses(report) == {'smoking_status.png': 'rendered', 'roc_curve.png': 'unchanged'}
+    assert read_png_text(os.path.join(output_dir, 'smoking_status.png'))[HASH_KEY] != tags['smoking_status.png']
+    assert read_png_text(os.path.join(output_dir, 'roc_curve.png'))[HASH_KEY] == tags['roc_curve.png']
+
+    report = render_charts(chart_tasks(positives=40), output_dir, DPI, workers=1, force=True)
+    assert set(statuses(report).values()) == {'rendered'}
+
+def test_a_failing_chart_does_not_stop_the_others(tmp_path):
+    tasks = [('broken.png', broken_chart, {'df': pd.DataFrame()})] + chart_tasks()
+    report = render_charts(tasks, str(tmp_path), DPI, workers=1)
+    assert [entry['status'] for entry in report] == ['failed', 'rendered', 'rendered']
+    assert report[0]['error'] == 'no data to draw'
+    assert not os.path.exists(os.path.join(tmp_path, 'broken.png'))
+    # Nothing half-written is left behind
+    assert sorted(os.listdir(tmp_path)) == ['roc_curve.png', 'smoking_status.png']
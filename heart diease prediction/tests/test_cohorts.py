@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cohorts
+from conftest import DATASET_PATH
+from cohorts import CohortCube, AGE_BAND_LABELS, load_or_build_cube
+from population import AGE_BAND_EDGES, TARGET
+
+FEATURES = ['totChol', 'sysBP', 'BMI']
+
+def columns_of(df):
+    return {column: df[column].to_numpy(dtype=np.float64) for column in df.columns}
+
+def test_matches_pandas_groupby():
+    df = pd.read_csv(DATASET_PATH)
+    cube = CohortCube(columns_of(df), FEATURES)
+
+    df = df.dropna(subset=['age', 'sex', 'is_smoking', 'prevalentHyp', 'diabetes'])
+    df['age_band'] = [AGE_BAND_LABELS[i] for i in np.searchsorted(AGE_BAND_EDGES, df['age'], side='right')]
+    expected = df.groupby(['age_band', 'sex'])
+    groups = cube.query(group_by=['age_band', 'sex'])
+    assert sum(group['count'] for group in groups) == len(df)
+    for group in groups:
+        key = (group['age_band'], group['sex'])
+        if key not in expected.groups:
+            assert group['count'] == 0
+            continue
+        rows = expected.get_group(key)
+        assert group['count'] == len(rows)
+        assert group['cases'] == int(rows[TARGET].sum())
+        for feature in FEATURES:
+            assert group['means'][feature] == pytest.approx(rows[feature].mean())
+
+def test_filters_match_pandas():
+    df = pd.read_csv(DATASET_PATH)
+    cube = CohortCube(columns_of(df), FEATURES)
+    rows = df[(df['sex'] == 1) & (df['diabetes'] == 1) & (df['age'] >= 60)]
+    [group] = cube.query({'sex': [1], 'diabetes': [1], 'age_band': ['60+']})
+    assert group['count'] == len(rows)
+    assert group['cases'] == int(rows[TARGET].sum())
+
+def test_missing_age_belongs_to_no_band():
+    columns = {
+        'age': [45, np.nan, 65, 70],
+        'sex': [1, 1, 0, np.nan],
+        'is_smoking': [0, 1, 1, 0],
+        'prevalentHyp': [0, 0, 1, 1],
+        'diabetes': [0, 0, 0, 1],
+        TARGET: [0, 1, 1, 0],
+        'sysBP': [120, 140, np.nan, 150]
+    }
+    cube = CohortCube({k: np.asarray(v, dtype=np.float64) for k, v in columns.items()}, ['sysBP'])
+    assert cube.excluded == 2
+    bands = {group['age_band']: group for group in cube.query(group_by=['age_band'])}
+    assert bands['40-49']['count'] == 1
+    assert bands['60+']['count'] == 1
+    assert bands['60+']['cases'] == 1
+    assert bands['60+']['means']['sysBP'] is None
+    assert sum(group['count'] for group in bands.values()) == 2
+
+def test_saved_cube_is_loaded_without_the_dataset(tmp_path, monkeypatch):
+    model_path = os.path.join(tmp_path, 'model.pkl')
+    path = os.path.join(tmp_path, 'model.cohorts.npz')
+    with open(model_path, 'wb') as f:
+        f.write(b'model')
+    built = load_or_build_cube(path, model_path, DATASET_PATH, version='v1')
+    expected = built.query(group_by=['age_band', 'diabetes'])
+
+    def no_dataset(*args, **kwargs):
+        raise AssertionError('the dataset was read')
+    monkeypatch.setattr(cohorts, 'load_columns', no_dataset)
+    loaded = load_or_build_cube(path, model_path, DATASET_PATH)
+    assert loaded.version == 'v1'
+    assert loaded.excluded == built.excluded
+    assert loaded.query(group_by=['age_band', 'diabetes']) == expected
+
+    # A retrained model makes the saved cube stale
+    with open(model_path, 'wb') as f:
+        f.write(b'retrained model')
+    assert CohortCube.load(path, model_path) is None
+
+def test_repeated_filter_values_count_once(client):
+    once = client.get('/api/cohorts?sex=1').json['groups']
+    twice = client.get('/api/cohorts?sex=1,1').json['groups']
+    assert twice == once
+    assert CohortCube.parse_filters({'age_band': ['60+', '<40', '60 ']}) == {'age_band': ['<40', '60+']}
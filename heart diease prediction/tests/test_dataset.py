@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from conftest import DATASET_PATH
+from dataset import load_dataset, load_columns, build_column_cache
+
+def test_matches_read_csv():
+    expected = pd.read_csv(DATASET_PATH)
+    df = load_dataset(DATASET_PATH, exact=True)
+    assert list(df.columns) == list(expected.columns)
+    for column in expected.columns:
+        np.testing.assert_array_equal(df[column].to_numpy(dtype=np.float64),
+                                      expected[column].to_numpy(dtype=np.float64))
+
+def test_values_outside_the_storage_dtype_are_kept(tmp_path):
+    csv_path = os.path.join(tmp_path, 'data.csv')
+    pd.DataFrame({
+        # int8 columns: one out of range, one with a large negative value, one fractional
+        'age': [45, 200, 61],
+        'sex': [0, 1, -40000],
+        'education': [1, 2.5, 3],
+        'TenYearCHD': [0, 1, 0]
+    }).to_csv(csv_path, index=False)
+    build_column_cache(csv_path)
+
+    arrays = load_columns(csv_path, exact=True)
+    assert arrays['age'].dtype == np.int16
+    assert arrays['sex'].dtype == np.int32
+    assert arrays['TenYearCHD'].dtype == np.int8
+    np.testing.assert_array_equal(arrays['age'], [45, 200, 61])
+    np.testing.assert_array_equal(arrays['sex'], [0, 1, -40000])
+    np.testing.assert_array_equal(arrays['education'], [1, 2.5, 3])
+
+def test_frame_keeps_the_columns_memory_mapped(tmp_path):
+    csv_path = os.path.join(tmp_path, 'data.csv')
+    pd.read_csv(DATASET_PATH).to_csv(csv_path, index=False)
+    df = load_dataset(csv_path)
+    for column in ['age', 'sysBP', 'TenYearCHD']:
+        assert isinstance(df[column].values, np.memmap)
+
+def test_rebuild_swaps_the_cache_in_place(tmp_path):
+    csv_path = os.path.join(tmp_path, 'data.csv')
+    pd.DataFrame({'age': [45, 61], 'sysBP': [120.5, 140.0]}).to_csv(csv_path, index=False)
+    before = load_columns(csv_path)
+
+    pd.DataFrame({'age': [50, 70, 80], 'sysBP': [118.0, 150.5, 160.0]}).to_csv(csv_path, index=False)
+    after = load_columns(csv_path)
+    np.testing.assert_array_equal(after['age'], [50, 70, 80])
+    # Arrays mapped from the replaced cache stay readable
+    np.testing.assert_array_equal(before['age'], [45, 61])
+    # Only the CSV and the cache are left, no staging or retired directories
+    assert sorted(os.listdir(tmp_path)) == ['data.columns', 'data.csv']
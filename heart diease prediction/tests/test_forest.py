@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from forest import CompiledForest, SMALL_BATCH_ROWS
+
+@pytest.fixture(scope='module')
+def transformed(split, fitted_pipeline):
+    _, X_test, _, _ = split
+    return np.asarray(fitted_pipeline.named_steps['preprocessor'].transform(X_test), dtype=np.float32)
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_matches_sklearn_forest(fitted_pipeline, transformed, dtype):
+    classifier = fitted_pipeline.named_steps['classifier']
+    forest = CompiledForest(classifier, dtype=dtype)
+    expected = classifier.predict_proba(transformed)
+
+    # Large inputs take the tree-major traversal, small ones walk all trees together
+    assert len(transformed) > SMALL_BATCH_ROWS
+    np.testing.assert_allclose(forest.predict_proba(transformed), expected, rtol=0, atol=1e-6)
+    np.testing.assert_allclose(forest.predict_proba(transformed[:10]), expected[:10], rtol=0, atol=1e-6)
+    np.testing.assert_array_equal(forest.predict(transformed), classifier.predict(transformed))
+
+def test_single_row_matches_batch(fitted_pipeline, transformed):
+    forest = CompiledForest(fitted_pipeline.named_steps['classifier'])
+    rows = forest.predict_proba_rows(transformed[:32])
+    for row, proba in zip(transformed[:32], rows):
+        np.testing.assert_array_equal(forest.predict_proba_row(row), proba)
+
+def test_large_batches_use_sklearn_with_the_array_store(app_module, monkeypatch):
+    from sklearn.pipeline import Pipeline
+    from forest import load_model_arrays, save_model_arrays
+
+    save_model_arrays(app_module.model, app_module.MODEL_PATH, 'test.arrays')
+    monkeypatch.setattr(app_module, 'MODEL_MMAP', True)
+    monkeypatch.setattr(app_module, 'model', load_model_arrays('test.arrays'))
+    monkeypatch.setattr(app_module, 'bulk_model', None)
+    assert app_module.batch_model(SMALL_BATCH_ROWS) is app_module.model
+    assert isinstance(app_module.batch_model(SMALL_BATCH_ROWS + 1), Pipeline)
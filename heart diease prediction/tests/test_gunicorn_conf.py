@@ -0,0 +1,71 @@
+import gc
+import os
+import runpy
+
+from conftest import PROJECT_DIR
+
+THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                    'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS', 'LOKY_MAX_CPU_COUNT')
+
+def load_config(monkeypatch, **env):
+    # The config pins the native thread pools through os.environ; restore them afterwards
+    for variable in THREAD_VARIABLES:
+        monkeypatch.delenv(variable, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(os.path.join(PROJECT_DIR, 'gunicorn.conf.py'))
+
+def test_defaults(monkeypatch):
+    for name in ('BIND', 'WEB_CONCURRENCY', 'THREADS', 'MAX_REQUESTS'):
+        monkeypatch.delenv(name, raising=False)
+    config = load_config(monkeypatch)
+    assert config['bind'] == '0.0.0.0:8000'
+    assert config['workers'] == os.cpu_count()
+    assert (config['threads'], config['worker_class']) == (2, 'gthread')
+    assert config['preload_app'] is True
+    assert (config['max_requests'], config['max_requests_jitter']) == (10000, 1000)
+    for variable in THREAD_VARIABLES:
+        assert os.environ[variable] == '1'
+
+def test_environment_overrides(monkeypatch):
+    config = load_config(monkeypatch, BIND='127.0.0.1:9000', WEB_CONCURRENCY='3', THREADS='1',
+                         MAX_REQUESTS='0', OMP_NUM_THREADS='4')
+    assert config['bind'] == '127.0.0.1:9000'
+    assert config['workers'] == 3
+    assert (config['threads'], config['worker_class']) == (1, 'sync')
+    assert (config['max_requests'], config['max_requests_jitter']) == (0, 0)
+    # An explicit thread count is left alone
+    assert os.environ['OMP_NUM_THREADS'] == '4'
+
+class FakeLog:
+    def __init__(self):
+        self.messages = []
+
+    def info(self, message):
+        self.messages.append(('info', message))
+
+    def error(self, message):
+        self.messages.append(('error', message))
+
+class FakeServer:
+    def __init__(self):
+        self.log = FakeLog()
+
+def test_when_ready_waits_for_the_model(app_module, monkeypatch):
+    config = load_config(monkeypatch)
+    server = FakeServer()
+    try:
+        config['when_ready'](server)
+    finally:
+        gc.unfreeze()
+    [(level, message)] = server.log.messages
+    assert level == 'info' and message.startswith('Model loaded in')
+
+    monkeypatch.setattr(app_module, 'model', None)
+    monkeypatch.setattr(app_module, 'model_status', {'state': 'failed', 'error': 'boom', 'load_seconds': 0.1})
+    server = FakeServer()
+    try:
+        config['when_ready'](server)
+    finally:
+        gc.unfreeze()
+    assert server.log.messages == [('error', 'Model failed to load: boom')]
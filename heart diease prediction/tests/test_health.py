@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+@pytest.fixture
+def loading_app(app_module, monkeypatch):
+    """
+    The app as it is before the model loader has finished
+    """
+    for name in ('model', 'fast_model', 'batcher', 'model_version'):
+        monkeypatch.setattr(app_module, name, None)
+    monkeypatch.setattr(app_module, 'model_status', {'state': 'loading', 'error': None, 'load_seconds': None})
+    return app_module
+
+def metric(client, name):
+    for line in client.get('/metrics').get_data(as_text=True).splitlines():
+        if line.startswith(name + ' '):
+            return float(line.split()[1])
+    return None
+
+def test_probes_while_the_model_loads(loading_app, client, record):
+    assert client.get('/healthz').status_code == 200
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.json['status'] == 'loading'
+    assert client.post('/predict', json=record).status_code == 503
+    assert client.post('/predict/batch', json=[record]).status_code == 503
+    assert metric(client, 'model_ready') == 0
+
+    loading_app.load_model()
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.json['status'] == 'ready'
+    assert response.json['model_load_seconds'] > 0
+    assert client.post('/predict', json=record).status_code == 200
+    assert metric(client, 'model_ready') == 1
+    assert metric(client, 'model_load_seconds') == response.json['model_load_seconds']
+
+def test_probes_after_the_model_failed_to_load(loading_app, client, record, tmp_path, monkeypatch):
+    broken = os.path.join(tmp_path, 'model.pkl')
+    with open(broken, 'wb') as f:
+        f.write(b'not a model')
+    monkeypatch.setattr(loading_app, 'MODEL_PATH', broken)
+
+    loading_app.load_model()
+    assert client.get('/healthz').status_code == 200
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.json['status'] == 'failed'
+    assert response.json['error']
+    assert client.post('/predict', json=record).status_code == 500
+    assert metric(client, 'model_ready') == 0
@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+
+import pytest
+
+from history_store import HistoryStore
+
+def make_record(i, prediction=0, **input_data):
+    return {
+        'timestamp': f'2024-01-{1 + i % 28:02d} 12:00:00',
+        'input_data': dict({'age': 50 + i}, **input_data),
+        'prediction': prediction,
+        'probability': 0.5
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(os.path.join(tmp_path, 'history.db'), legacy_json_path=None)
+
+def test_append_keeps_insertion_order(store):
+    store.append([make_record(0)])
+    store.append([make_record(1), make_record(2)])
+    records = store.all()
+    assert [record['id'] for record in records] == [0, 1, 2]
+    assert [record['input_data']['age'] for record in records] == [50, 51, 52]
+    assert store.count() == 3
+    assert store.latest()['id'] == 2
+
+def test_records_survive_reopening(tmp_path):
+    path = os.path.join(tmp_path, 'history.db')
+    HistoryStore(path, legacy_json_path=None).append([make_record(0), make_record(1)])
+    assert len(HistoryStore(path, legacy_json_path=None).all()) == 2
+
+def test_concurrent_appends_lose_nothing(tmp_path):
+    path = os.path.join(tmp_path, 'history.db')
+
+    def writer(offset):
+        # A separate store per thread, as separate worker processes would have
+        worker_store = HistoryStore(path, legacy_json_path=None)
+        for i in range(50):
+            worker_store.append([make_record(offset + i)])
+
+    threads = [threading.Thread(target=writer, args=(n * 50,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    store = HistoryStore(path, legacy_json_path=None)
+    assert store.count() == 200
+    assert sorted(record['input_data']['age'] for record in store.all()) == list(range(50, 250))
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy_path = os.path.join(tmp_path, 'prediction_history.json')
+    with open(legacy_path, 'w') as f:
+        json.dump([make_record(0), make_record(1)], f)
+
+    path = os.path.join(tmp_path, 'history.db')
+    store = HistoryStore(path, legacy_json_path=legacy_path)
+    assert store.count() == 2
+    assert not os.path.exists(legacy_path)
+    assert os.path.exists(legacy_path + '.migrated')
+
+    # A leftover copy of the old file is not imported a second time
+    os.rename(legacy_path + '.migrated', legacy_path)
+    assert HistoryStore(path, legacy_json_path=legacy_path).count() == 2
+
+def test_clear_removes_everything(store):
+    store.append([make_record(i) for i in range(5)])
+    store.clear()
+    assert store.all() == []
+    assert store.count() == 0
+    assert store.latest() is None
+
+def test_aggregates_track_appends(store):
+    store.append([make_record(0, prediction=1, sysBP=150, diaBP=95, totChol=250, is_smoking=1, prevalentHyp=1),
+                  make_record(1, prediction=0, sysBP=120, diaBP=80, totChol=180, diabetes=1)])
+    store.append([make_record(2, prediction=1, sysBP=130, diaBP=85, totChol=200, is_smoking=1)])
+
+    aggregates = store.aggregates()
+    assert aggregates['total'] == 3
+    assert aggregates['high_risk'] == 2
+    assert aggregates['sum_age'] == 50 + 51 + 52
+    assert aggregates['sum_sysBP'] == 400
+    assert aggregates['sum_diaBP'] == 260
+    assert aggregates['sum_totChol'] == 630
+    assert (aggregates['smokers'], aggregates['hypertension'], aggregates['diabetes']) == (2, 1, 1)
+
+    # The incremental totals agree with a rebuild from the raw rows
+    store.rebuild_aggregates()
+    assert store.aggregates() == aggregates
+
+def test_non_finite_inputs_count_as_zero(store):
+    store.append([make_record(0, sysBP=float('nan'), totChol=None), make_record(1, sysBP=120, totChol=200)])
+    aggregates = store.aggregates()
+    assert aggregates['total'] == 2
+    assert aggregates['sum_sysBP'] == 120
+    assert aggregates['sum_totChol'] == 200
+
+def test_clear_resets_aggregates(store):
+    store.append([make_record(0, prediction=1, sysBP=150)])
+    store.clear()
+    assert all(value == 0 for value in store.aggregates().values())
+
+def test_get_looks_up_records_by_id(store):
+    store.append([make_record(i) for i in range(10)])
+    assert store.get(0)['input_data']['age'] == 50
+    assert store.get(7)['id'] == 7
+    assert store.get(7)['input_data']['age'] == 57
+    assert store.get(10) is None
+    assert store.get(-1) is None
+
+def test_ids_restart_after_clear(store):
+    store.append([make_record(i) for i in range(3)])
+    store.clear()
+    store.append([make_record(5)])
+    assert store.get(0)['input_data']['age'] == 55
+
+@pytest.fixture
+def history_client(client, app_module, store, monkeypatch):
+    store.append([make_record(i, prediction=i % 2) for i in range(7)])
+    monkeypatch.setattr(app_module, 'history_store', store)
+    return client
+
+def test_api_history_pages_follow_the_cursor(history_client):
+    first = history_client.get('/api/history?limit=3').json
+    assert [record['id'] for record in first['records']] == [6, 5, 4]
+    assert first['next_cursor'] == 4
+
+    ids, cursor = [], None
+    while True:
+        query = '/api/history?limit=3' + ('' if cursor is None else f'&cursor={cursor}')
+        page = history_client.get(query).json
+        ids += [record['id'] for record in page['records']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert ids == [6, 5, 4, 3, 2, 1, 0]
+
+    high = history_client.get('/api/history?risk=high&limit=2').json
+    assert [record['id'] for record in high['records']] == [5, 3]
+    assert [record['id'] for record in history_client.get(
+        f"/api/history?risk=high&limit=2&cursor={high['next_cursor']}").json['records']] == [1]
+
+@pytest.mark.parametrize('cursor', ['abc', '-1', '2.5', ''])
+def test_api_history_rejects_bad_cursors(history_client, cursor):
+    response = history_client.get(f'/api/history?cursor={cursor}')
+    assert response.status_code == 400
+    assert 'cursor' in response.json['error']
+
+def test_api_history_clamps_the_limit(history_client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'MAX_HISTORY_PAGE_SIZE', 4)
+    assert len(history_client.get('/api/history?limit=100').json['records']) == 4
+    assert len(history_client.get('/api/history?limit=0').json['records']) == 1
+    assert len(history_client.get('/api/history?limit=-5').json['records']) == 1
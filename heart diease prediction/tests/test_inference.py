@@ -0,0 +1,73 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import FEATURE_COLUMNS, to_records
+from forest import CompiledForestPipeline, save_model_arrays, load_model_arrays
+from inference import CompiledPipeline
+
+def assert_parity(pipeline, compiled, records):
+    frame = pd.DataFrame(records, columns=FEATURE_COLUMNS)
+    expected_labels = pipeline.predict(frame)
+    expected_proba = pipeline.predict_proba(frame)[:, list(pipeline.classes_).index(1)]
+
+    for data, label, proba in zip(records, expected_labels, expected_proba):
+        fast_label, fast_proba = compiled.predict_one(data)
+        assert fast_label == label
+        assert fast_proba == pytest.approx(proba, abs=1e-9)
+
+    results = compiled.predict_many(records)
+    assert [label for label, _ in results] == list(expected_labels)
+    np.testing.assert_allclose([proba for _, proba in results], expected_proba, rtol=0, atol=1e-9)
+
+def test_matches_sklearn_pipeline(split, fitted_pipeline):
+    _, X_test, _, _ = split
+    records = to_records(X_test)
+    # The dataset has missing values, make sure they are part of the comparison
+    assert any(value is None for data in records for value in data.values())
+    assert_parity(fitted_pipeline, CompiledPipeline(fitted_pipeline), records)
+
+def test_missing_values_are_imputed(split, fitted_pipeline):
+    _, X_test, _, _ = split
+    records = to_records(X_test.head(50))
+    for i, data in enumerate(records):
+        # Blank out a different numerical and categorical feature in every row
+        data[FEATURE_COLUMNS[i % len(FEATURE_COLUMNS)]] = None
+        data['education'] = None
+    # Keep one value per column so the frame keeps numeric dtypes
+    records.append(to_records(X_test.tail(1))[0])
+    assert_parity(fitted_pipeline, CompiledPipeline(fitted_pipeline), records)
+
+def test_unknown_categories_encode_as_zeros(split, fitted_pipeline):
+    _, X_test, _, _ = split
+    records = to_records(X_test.head(50))
+    for data in records:
+        data['education'] = 7.0
+        data['prevalentStroke'] = 3
+    assert_parity(fitted_pipeline, CompiledPipeline(fitted_pipeline), records)
+
+def test_matches_memory_mapped_array_store(split, fitted_pipeline, tmp_path):
+    _, X_test, _, _ = split
+    model_path = os.path.join(tmp_path, 'model.pkl')
+    directory = os.path.join(tmp_path, 'model.arrays')
+    joblib.dump(fitted_pipeline, model_path)
+    save_model_arrays(fitted_pipeline, model_path, directory)
+
+    loaded = load_model_arrays(directory, mmap_mode='r')
+    assert isinstance(loaded, CompiledForestPipeline)
+    # The tree arrays are views of the mapped files, not copies
+    assert isinstance(loaded.forest.threshold.base, np.memmap)
+    assert_parity(fitted_pipeline, CompiledPipeline(loaded), to_records(X_test))
+
+def test_unsupported_pipeline_is_rejected(fitted_pipeline):
+    preprocessor = fitted_pipeline.named_steps['preprocessor']
+    encoder = preprocessor.named_transformers_['cat'].named_steps['onehot']
+    encoder.handle_unknown = 'error'
+    try:
+        with pytest.raises(ValueError):
+            CompiledPipeline(fitted_pipeline)
+    finally:
+        encoder.handle_unknown = 'ignore'
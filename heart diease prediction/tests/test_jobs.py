@@ -0,0 +1,107 @@
+import os
+import subprocess
+import time
+
+import pytest
+
+import jobs
+from jobs import JobStore
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(os.path.join(tmp_path, 'jobs.db'))
+
+def test_active_job_is_reused(store):
+    job, created = store.submit('visualizations')
+    assert created and job['state'] == 'queued'
+
+    again, created = store.submit('visualizations')
+    assert not created
+    assert again['job_id'] == job['job_id']
+
+    store.mark_running(job['job_id'])
+    store.mark_succeeded(job['job_id'], {'charts': 5})
+    # Once it has finished, the next request starts a new job
+    third, created = store.submit('visualizations')
+    assert created and third['job_id'] != job['job_id']
+    assert store.get(job['job_id'])['result'] == {'charts': 5}
+
+def test_job_with_a_dead_process_is_not_reused(store):
+    job, _ = store.submit('visualizations')
+    process = subprocess.Popen(['true'])
+    process.wait()
+    store.set_pid(job['job_id'], process.pid)
+
+    replacement, created = store.submit('visualizations')
+    assert created
+    assert store.get(job['job_id'])['state'] == 'failed'
+    assert store.latest('visualizations')['job_id'] == replacement['job_id']
+
+def test_queued_job_without_a_process_expires(store, monkeypatch):
+    job, _ = store.submit('visualizations')
+    monkeypatch.setattr(jobs.time, 'time', lambda now=time.time(): now + jobs.QUEUED_TIMEOUT + 1)
+    _, created = store.submit('visualizations')
+    assert created
+    assert store.get(job['job_id'])['state'] == 'failed'
+
+def hang():
+    time.sleep(60)
+
+def test_hung_job_is_terminated_by_its_reaper(store, monkeypatch):
+    monkeypatch.setitem(jobs.JOB_KINDS, 'hang', 'test_jobs:hang')
+    monkeypatch.setattr(jobs, 'RUNNING_TIMEOUT', 1)
+    job, created = jobs.start_job(store, 'hang')
+    assert created
+
+    deadline = time.time() + 30
+    while store.get(job['job_id'])['state'] in jobs.ACTIVE_STATES and time.time() < deadline:
+        time.sleep(0.1)
+    failed = store.get(job['job_id'])
+    assert failed['state'] == 'failed'
+    assert failed['error'] == 'Job timed out after 1 seconds'
+    _, created = store.submit('hang')
+    assert created
+
+def test_running_job_past_the_timeout_is_not_reused(store, monkeypatch):
+    job, _ = store.submit('visualizations')
+    process = subprocess.Popen(['sleep', '60'])
+    try:
+        store.set_pid(job['job_id'], process.pid)
+        monkeypatch.setattr(jobs.time, 'time', lambda now=time.time(): now + jobs.RUNNING_TIMEOUT + 1)
+        replacement, created = store.submit('visualizations')
+        assert created
+        assert store.get(job['job_id'])['state'] == 'failed'
+        # The hung process was stopped, not just forgotten
+        assert process.wait(timeout=10) != 0
+    finally:
+        process.kill()
+
+def test_unknown_kind_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.submit('reindex')
+
+def test_get_never_starts_a_job(app_module, client, monkeypatch):
+    started = []
+    monkeypatch.setattr(app_module, 'start_job', lambda store, kind: started.append(kind) or store.submit(kind))
+
+    for url in ('/generate_visualizations', '/api/visualizations/jobs'):
+        response = client.get(url)
+        assert response.status_code == 200
+    assert started == []
+
+    first = client.post('/generate_visualizations')
+    second = client.post('/api/visualizations/jobs')
+    assert first.status_code == second.status_code == 202
+    assert first.json['deduplicated'] is False
+    assert second.json['deduplicated'] is True
+    assert second.json['job_id'] == first.json['job_id']
+    assert client.get('/generate_visualizations').json['job']['job_id'] == first.json['job_id']
+
+def test_app_files_stay_out_of_the_project(app_module):
+    from conftest import PROJECT_DIR, WORK_DIR
+    paths = [app_module.MODEL_PATH, app_module.MODEL_ARRAYS_DIR, app_module.STATS_PATH,
+             app_module.PERCENTILES_PATH, app_module.COHORTS_PATH, app_module.chart_data.dataset_path,
+             app_module.history_store.db_path, app_module.job_store.db_path]
+    for path in paths:
+        path = os.path.abspath(path)
+        assert path.startswith(WORK_DIR) and not path.startswith(PROJECT_DIR), path
@@ -0,0 +1,69 @@
+import os
+
+from metrics import Registry
+
+def worker_registry(directory):
+    registry = Registry(directory)
+    requests = registry.counter('requests_total', 'Requests', ('route',))
+    seconds = registry.histogram('request_seconds', 'Latency', buckets=(0.1, 1.0))
+    return registry, requests, seconds
+
+def test_snapshots_of_all_workers_add_up(tmp_path):
+    registry, requests, seconds = worker_registry(str(tmp_path))
+    requests.inc(('/predict',), 3)
+    seconds.observe(0.05)
+    registry.flush()
+    # Another worker's snapshot
+    other, other_requests, _ = worker_registry(str(tmp_path))
+    other_requests.inc(('/predict',), 2)
+    other._write(dict(other.snapshot(), worker='other'), other._snapshot_path(12345))
+
+    text = registry.render()
+    assert 'requests_total{route="/predict"} 5' in text
+    assert 'request_seconds_count 1' in text
+
+def test_exited_worker_is_folded_into_one_file(tmp_path):
+    directory = str(tmp_path)
+    registry, requests, seconds = worker_registry(directory)
+    for pid, (count, latency) in enumerate([(2, 0.05), (3, 0.5), (4, 5.0)], start=100):
+        worker, worker_requests, worker_seconds = worker_registry(directory)
+        worker_requests.inc(('/predict',), count)
+        worker_seconds.observe(latency)
+        worker._write(dict(worker.snapshot(), worker=f'{pid}-1'), worker._snapshot_path(pid))
+    before = registry.render()
+
+    for pid in (100, 101, 102):
+        registry.fold_snapshot(pid)
+    # Left: this process's own snapshot, written by render(), and the exited totals
+    assert sorted(os.listdir(directory)) == sorted([f'metrics-{os.getpid()}.json', 'metrics-exited.json'])
+    after = registry.render()
+    assert after == before
+    assert 'requests_total{route="/predict"} 9' in after
+    assert 'request_seconds_bucket{le="0.1"} 1' in after
+    assert 'request_seconds_bucket{le="1"} 2' in after
+    assert 'request_seconds_count 3' in after
+
+    # Folding a worker that left no snapshot changes nothing
+    registry.fold_snapshot(103)
+    assert registry.render() == after
+
+def test_worker_folded_during_a_scrape_is_counted_once(tmp_path):
+    directory = str(tmp_path)
+    registry, _, _ = worker_registry(directory)
+    worker, worker_requests, _ = worker_registry(directory)
+    worker_requests.inc(('/predict',), 7)
+    worker._write(dict(worker.snapshot(), worker='200-1'), worker._snapshot_path(200))
+    # The scrape read the worker's file, then the master folded it before the scrape read the totals
+    stale = registry._read(worker._snapshot_path(200))
+    registry.fold_snapshot(200)
+    registry._write(stale, worker._snapshot_path(200))
+    assert 'requests_total{route="/predict"} 7' in registry.render()
+
+def test_clear_snapshots_removes_the_exited_totals(tmp_path):
+    directory = str(tmp_path)
+    registry, requests, _ = worker_registry(directory)
+    requests.inc(('/predict',))
+    registry.flush()
+    registry.fold_snapshot(os.getpid())
+    registry.clear_snapshots()
+    assert os.listdir(directory) == []
@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import population
+from conftest import DATASET_PATH
+from population import PercentileIndex, percentile_rank, load_or_build_index, TARGET
+from population import load_or_build_stats, load_stats, save_stats, stats_current, STATS_SCHEMA_VERSION
+from prediction_cache import artifact_version
+
+def index_of(columns, features):
+    return PercentileIndex({k: np.asarray(v, dtype=np.float64) for k, v in columns.items()}, features)
+
+def test_percentile_rank_counts_ties_as_half():
+    values = np.array([1.0, 2.0, 2.0, 3.0])
+    assert percentile_rank(values, 2.0) == 50.0
+    assert percentile_rank(values, 0.0) == 0.0
+    assert percentile_rank(values, 4.0) == 100.0
+    assert percentile_rank(np.array([]), 1.0) is None
+
+def test_cohort_ranks_against_its_own_rows():
+    index = index_of({
+        'sex': [1, 1, 1, 0],
+        'age': [45, 47, 65, 46],
+        'sysBP': [110, 130, 200, 90]
+    }, ['sysBP'])
+    comparison = index.compare({'sex': 1, 'age': 42, 'sysBP': 130})
+    assert comparison['cohort'] == {'sex': 'male', 'age_band': '40-49', 'size': 2}
+    assert comparison['features']['sysBP']['cohort_percentile'] == 75.0
+    assert comparison['features']['sysBP']['percentile'] == 62.5
+    assert comparison['features']['sysBP']['cohort_median'] == 120.0
+
+def test_missing_age_belongs_to_no_cohort():
+    index = index_of({
+        'sex': [1, 1, 1],
+        'age': [65, np.nan, 70],
+        'sysBP': [140, 300, 160]
+    }, ['sysBP'])
+    assert index.cohort_sizes[(1, 3)] == 2
+    assert sum(index.cohort_sizes.values()) == 2
+    comparison = index.compare({'sex': 1, 'age': 66, 'sysBP': 150})
+    assert comparison['features']['sysBP']['cohort_percentile'] == 50.0
+    # The row still counts in the overall population
+    assert len(index.overall['sysBP']) == 3
+
+def test_saved_index_answers_like_the_built_one(tmp_path, record):
+    model_path = os.path.join(tmp_path, 'model.pkl')
+    path = os.path.join(tmp_path, 'model.percentiles.npz')
+    with open(model_path, 'wb') as f:
+        f.write(b'model')
+    index = PercentileIndex.from_dataset(DATASET_PATH)
+    index.save(path, model_path)
+
+    loaded = PercentileIndex.load(path, model_path)
+    assert loaded.size == index.size
+    assert loaded.cohort_sizes == index.cohort_sizes
+    assert loaded.compare(record) == index.compare(record)
+
+    # A retrained model makes the saved index stale
+    with open(model_path, 'wb') as f:
+        f.write(b'retrained model')
+    assert PercentileIndex.load(path, model_path) is None
+
+def test_saved_index_is_loaded_without_the_dataset(tmp_path, monkeypatch, record):
+    model_path = os.path.join(tmp_path, 'model.pkl')
+    path = os.path.join(tmp_path, 'model.percentiles.npz')
+    with open(model_path, 'wb') as f:
+        f.write(b'model')
+    expected = load_or_build_index(path, model_path, DATASET_PATH).compare(record)
+    assert os.path.exists(path)
+
+    def no_dataset(*args, **kwargs):
+        raise AssertionError('the dataset was read')
+    monkeypatch.setattr(population, 'load_columns', no_dataset)
+    assert load_or_build_index(path, model_path, DATASET_PATH).compare(record) == expected
+
+def test_stats_snapshot_round_trip(tmp_path, monkeypatch):
+    model_path = os.path.join(tmp_path, 'model.pkl')
+    path = os.path.join(tmp_path, 'model.stats.json')
+    with open(model_path, 'wb') as f:
+        f.write(b'model')
+    built = load_or_build_stats(path, model_path, DATASET_PATH)
+    assert built['model_version'] == artifact_version(model_path)
+    assert built['rows'] == len(pd.read_csv(DATASET_PATH))
+    assert 'id' not in built['features'] and TARGET not in built['features']
+
+    def no_dataset(*args, **kwargs):
+        raise AssertionError('the dataset was read')
+    with monkeypatch.context() as patched:
+        patched.setattr(population, 'load_dataset', no_dataset)
+        assert load_or_build_stats(path, model_path, DATASET_PATH) == built
+
+    # A retrained model makes the snapshot stale, and it is rebuilt for the new artifact
+    with open(model_path, 'wb') as f:
+        f.write(b'retrained model')
+    assert not stats_current(load_stats(path), model_path)
+    rebuilt = load_or_build_stats(path, model_path, DATASET_PATH)
+    assert rebuilt['model_version'] == artifact_version(model_path) != built['model_version']
+    assert load_stats(path) == rebuilt
+
+def test_stats_from_another_schema_are_ignored(tmp_path):
+    path = os.path.join(tmp_path, 'model.stats.json')
+    save_stats({'schema_version': STATS_SCHEMA_VERSION - 1, 'rows': 1}, path)
+    assert load_stats(path) is None
+    with open(path, 'w') as f:
+        f.write('{not json')
+    assert load_stats(path) is None
+    assert load_stats(os.path.join(tmp_path, 'missing.json')) is None
@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+from conftest import FEATURE_COLUMNS
+
+def post_batch(client, body, content_type='application/json'):
+    return client.post('/predict/batch', data=body, content_type=content_type)
+
+def test_json_list_is_scored_row_by_row(client, record):
+    rows = [record, dict(record, age=70, sysBP=180), dict(record, is_smoking=0)]
+    response = client.post('/predict/batch', json=rows)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    body = response.json
+    assert (body['total'], body['succeeded'], body['failed']) == (3, 3, 0)
+    assert [result['index'] for result in body['results']] == [0, 1, 2]
+    for result in body['results']:
+        assert result['prediction'] in (0, 1)
+        assert 0.0 <= result['probability'] <= 1.0
+        assert result['message']
+
+    # A single row gets the same answer as /predict
+    single = client.post('/predict', json=record).json
+    assert body['results'][0]['prediction'] == single['prediction']
+    assert body['results'][0]['probability'] == pytest.approx(single['probability'])
+
+def test_records_object_is_accepted(client, record):
+    response = client.post('/predict/batch', json={'records': [record, record]})
+    assert response.status_code == 200
+    assert response.json['succeeded'] == 2
+
+def test_csv_body_matches_json(client, record):
+    rows = [record, dict(record, age=70, totChol=260)]
+    csv_body = pd.DataFrame(rows, columns=FEATURE_COLUMNS).to_csv(index=False)
+    from_csv = post_batch(client, csv_body, 'text/csv')
+    assert from_csv.status_code == 200, from_csv.get_data(as_text=True)
+    from_json = client.post('/predict/batch', json=rows)
+    for csv_result, json_result in zip(from_csv.json['results'], from_json.json['results']):
+        assert csv_result['prediction'] == json_result['prediction']
+        assert csv_result['probability'] == pytest.approx(json_result['probability'])
+
+def test_invalid_rows_do_not_fail_the_batch(client, record):
+    missing = {k: v for k, v in record.items() if k != 'sysBP'}
+    rows = [record, missing, dict(record, totChol='high'), 'not a record', record]
+    response = client.post('/predict/batch', json=rows)
+    assert response.status_code == 200
+    body = response.json
+    assert (body['total'], body['succeeded'], body['failed']) == (5, 2, 3)
+    results = body['results']
+    assert results[1] == {'index': 1, 'error': "Missing required feature 'sysBP'"}
+    assert results[2] == {'index': 2, 'error': "Feature 'totChol' must be numeric"}
+    assert results[3] == {'index': 3, 'error': 'Record must be a JSON object'}
+    assert 'prediction' in results[0] and 'prediction' in results[4]
+
+def test_empty_body_is_rejected(client):
+    response = post_batch(client, b'')
+    assert response.status_code == 400
+    assert response.json['error'].startswith('Invalid batch request')
+
+def test_empty_list_scores_nothing(client):
+    response = client.post('/predict/batch', json=[])
+    assert response.status_code == 200
+    assert (response.json['total'], response.json['results']) == (0, [])
+
+def test_row_limit(client, app_module, record, monkeypatch):
+    monkeypatch.setattr(app_module, 'MAX_BATCH_SIZE', 2)
+    assert client.post('/predict/batch', json=[record] * 2).status_code == 200
+    response = client.post('/predict/batch', json=[record] * 3)
+    assert response.status_code == 413
+    assert '2 records' in response.json['error']
+
+@pytest.mark.parametrize('body, content_type', [
+    ('age=50&sysBP=120', 'application/x-www-form-urlencoded'),
+    ('<records/>', 'application/xml'),
+    ('{"age": 50}', 'application/json')
+])
+def test_bodies_that_are_not_a_list_of_records_are_rejected(client, body, content_type):
+    response = post_batch(client, body, content_type)
+    assert response.status_code == 400
+    assert response.json['error'].startswith('Invalid batch request')
@@ -0,0 +1,117 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import FEATURE_COLUMNS, PROJECT_DIR
+from prediction_cache import PredictionCache, SQLiteCache, LRUCache, artifact_version
+
+RESULT = {'prediction': 1, 'probability': 0.7, 'risk_factors': []}
+
+def test_equivalent_inputs_share_a_key(record):
+    cache = PredictionCache(FEATURE_COLUMNS)
+    cache.set_version('v1')
+    same = dict(record, age=float(record['age']), sex=False, note='not a model feature')
+    assert cache.key(same) == cache.key(record)
+    assert cache.key(dict(record, totChol=None)) != cache.key(dict(record, totChol=float('nan')))
+
+def test_new_model_version_invalidates_results(record, tmp_path):
+    model_path = os.path.join(tmp_path, 'model.pkl')
+    with open(model_path, 'wb') as f:
+        f.write(b'first model')
+    shared = SQLiteCache(os.path.join(tmp_path, 'cache.db'))
+    cache = PredictionCache(FEATURE_COLUMNS, shared=shared)
+    cache.set_version(artifact_version(model_path))
+    cache.put(cache.key(record), RESULT)
+    assert cache.get(cache.key(record)) == RESULT
+
+    # Retraining rewrites the artifact, which changes its version
+    with open(model_path, 'wb') as f:
+        f.write(b'retrained model')
+    cache.set_version(artifact_version(model_path))
+    assert cache.get(cache.key(record)) is None
+    # Another worker still on the old version cannot hand its results to this one either
+    assert PredictionCache(FEATURE_COLUMNS, shared=shared).key(record) != cache.key(record)
+
+def test_entries_expire_after_ttl():
+    cache = LRUCache(max_entries=2, ttl=0.05)
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.06)
+    assert cache.get('a') is None
+
+def test_shared_hit_keeps_the_shared_expiry(record, tmp_path):
+    shared = SQLiteCache(os.path.join(tmp_path, 'cache.db'), ttl=0.3)
+    writer = PredictionCache(FEATURE_COLUMNS, ttl=0.3, shared=shared)
+    writer.set_version('v1')
+    writer.put(writer.key(record), RESULT)
+    time.sleep(0.2)
+
+    # A second worker finds the result in the shared cache with about 0.1s left
+    reader = PredictionCache(FEATURE_COLUMNS, ttl=0.3, shared=shared)
+    reader.set_version('v1')
+    assert reader.get(reader.key(record)) == RESULT
+    assert reader.stats()['shared_hits'] == 1
+    time.sleep(0.15)
+    # Its local copy expires with the shared entry instead of living another full TTL
+    assert reader.get(reader.key(record)) is None
+    assert reader.stats()['misses'] == 1
+
+def test_counters_are_exact_under_concurrency(record):
+    cache = PredictionCache(FEATURE_COLUMNS)
+    cache.set_version('v1')
+    key = cache.key(record)
+    cache.put(key, RESULT)
+
+    def lookups():
+        for _ in range(2000):
+            cache.get(key)
+            cache.get('missing')
+
+    threads = [threading.Thread(target=lookups) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (8000, 8000)
+    assert stats['hit_ratio'] == pytest.approx(0.5)
+
+class Unscorable:
+    def __getattr__(self, name):
+        raise AssertionError('the model was called for a cached result')
+
+def test_result_from_one_worker_is_a_hit_in_another(app_module, client, record, tmp_path, monkeypatch):
+    db_path = os.path.join(tmp_path, 'cache.db')
+    workers = []
+    for _ in range(2):
+        cache = PredictionCache(FEATURE_COLUMNS, shared=SQLiteCache(db_path))
+        cache.set_version(app_module.model_version)
+        workers.append(cache)
+
+    monkeypatch.setattr(app_module, 'prediction_cache', workers[0])
+    first = client.post('/predict', json=record).json
+    assert workers[0].stats()['misses'] == 1
+
+    # The second worker has never seen the input and must not score it
+    monkeypatch.setattr(app_module, 'prediction_cache', workers[1])
+    monkeypatch.setattr(app_module, 'fast_model', Unscorable())
+    second = client.post('/predict', json=record).json
+    assert (second['prediction'], second['probability']) == (first['prediction'], first['probability'])
+    stats = client.get('/api/cache_stats').json
+    assert (stats['shared_hits'], stats['misses']) == (1, 0)
+
+    # A separate process reads the same entry
+    script = ('import json, sys; from prediction_cache import PredictionCache, SQLiteCache; '
+              'cache = PredictionCache(json.loads(sys.argv[1]), shared=SQLiteCache(sys.argv[2])); '
+              'cache.set_version(sys.argv[3]); '
+              'print(json.dumps([cache.get(cache.key(json.loads(sys.argv[4]))), cache.stats()["shared_hits"]]))')
+    output = subprocess.run([sys.executable, '-c', script, json.dumps(FEATURE_COLUMNS), db_path,
+                             app_module.model_version, json.dumps(record)],
+                            cwd=PROJECT_DIR, capture_output=True, text=True, check=True).stdout
+    value, shared_hits = json.loads(output)
+    assert value['probability'] == first['probability'] and shared_hits == 1
@@ -0,0 +1,31 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+from model import create_preprocessing_pipeline
+from search import _nested_subsets, halving_search
+
+def test_rung_subsets_are_nested_and_stratified():
+    # A rare positive class, like the dataset's heart disease cases
+    y = np.array([1] * 15 + [0] * 85)
+    subsets = _nested_subsets(y, [0.125, 0.25, 0.5, 1.0], np.random.RandomState(0))
+    assert [len(subsets[f]) for f in (0.125, 0.25, 0.5, 1.0)] == [12, 25, 50, 100]
+    for smaller, larger in [(0.125, 0.25), (0.25, 0.5), (0.5, 1.0)]:
+        assert set(subsets[smaller]) <= set(subsets[larger])
+    for fraction in (0.125, 0.25, 0.5):
+        share = y[subsets[fraction]].mean()
+        assert abs(share - 0.15) <= 1 / len(subsets[fraction])
+
+def test_halving_search_scores_every_rung(split):
+    X_train, _, y_train, _ = split
+    pipeline = Pipeline(steps=[
+        ('preprocessor', create_preprocessing_pipeline()),
+        ('classifier', RandomForestClassifier(n_jobs=1))
+    ])
+    space = {'classifier__max_depth': [4, 8], 'classifier__min_samples_leaf': [1, 4]}
+    model, report = halving_search(pipeline, X_train, y_train, space, min_estimators=4,
+                                   max_estimators=16, cv=3)
+    assert [rung['fraction'] for rung in report['rungs']] == [0.25, 0.5, 1.0]
+    assert [rung['candidates'] for rung in report['rungs']] == [4, 2, 1]
+    assert report['fits'] == (4 + 2 + 1) * 3
+    assert len(model.named_steps['classifier'].estimators_) == 16
@@ -0,0 +1,44 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import model
+from conftest import DATASET_PATH
+from transform_cache import DEFAULT_CACHE_DIR
+
+@pytest.fixture
+def training_dir(tmp_path, monkeypatch):
+    """
+    A scratch directory to train in, with chart rendering and cross-validation recorded instead of run
+    """
+    shutil.copyfile(DATASET_PATH, os.path.join(tmp_path, 'train_updated.csv'))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(model, 'create_visualizations', lambda *args, **kwargs: [])
+    calls = []
+
+    def cross_val_roc_auc(pipeline, X, y, cache=None):
+        calls.append(cache)
+        return np.array([0.7, 0.8])
+    monkeypatch.setattr(model, 'cross_val_roc_auc', cross_val_roc_auc)
+    return calls
+
+def evaluation():
+    with open('model_evaluation.json') as f:
+        return json.load(f)
+
+def test_cross_validation_and_disk_cache_are_off_by_default(training_dir):
+    model.train_model()
+    assert training_dir == []
+    assert evaluation()['cv_roc_auc'] is None
+    assert not os.path.exists(DEFAULT_CACHE_DIR)
+    assert os.path.exists('heart_disease_model.pkl')
+
+def test_cross_validation_and_disk_cache_are_opt_in(training_dir):
+    model.train_model(cross_validate=True, cache_dir=DEFAULT_CACHE_DIR)
+    [cache] = training_dir
+    assert cache.directory == DEFAULT_CACHE_DIR
+    assert evaluation()['cv_roc_auc'] == pytest.approx(0.75)
+    assert os.listdir(DEFAULT_CACHE_DIR)
@@ -0,0 +1,146 @@
+"""
+Content-addressed cache of preprocessed training matrices
+
+Fitting the ColumnTransformer from create_preprocessing_pipeline() and
+transforming a fold takes about as long as fitting a small forest, and a
+search used to repeat it for every candidate on every fold even though
+the result only depends on the rows and the preprocessing configuration.
+Entries are keyed by a hash of the unfitted preprocessor (its class and
+parameters, so any change to the pipeline is a new key), the training
+rows, the rows to transform and the scikit-learn version. Each entry holds
+the fitted preprocessor and both transformed matrices.
+
+Entries are kept in memory for the life of the cache and, when a
+directory is given, written to disk, so later searches, cross-validation
+and retraining on the same data skip preprocessing altogether. A changed
+dataset simply produces new keys. The oldest files are removed once the
+directory holds more than max_entries.
+"""
+
+import os
+import tempfile
+import time
+
+import joblib
+import sklearn
+from sklearn.base import clone
+
+DEFAULT_CACHE_DIR = 'preprocessing_cache'
+
+DEFAULT_MAX_ENTRIES = 64
+
+class TransformCache:
+    """
+    Cache of (fitted preprocessor, transformed training rows, transformed test rows)
+    """
+
+    def __init__(self, directory=None, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            directory: Directory for the on-disk entries, e.g. DEFAULT_CACHE_DIR, or None
+                to cache in memory only
+            max_entries: Number of files kept on disk
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.entries = {}
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            # Time spent fitting and transforming on misses
+            'transform_seconds': 0.0,
+            # Time spent hashing the inputs and loading entries
+            'lookup_seconds': 0.0,
+            # What the hits would have cost to recompute, minus their lookup time
+            'saved_seconds': 0.0
+        }
+
+    def key(self, preprocessor, X_train, X_test=None):
+        """
+        Hash of the preprocessing configuration and the data
+        """
+        return joblib.hash((sklearn.__version__, clone(preprocessor), X_train, X_test))
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.joblib')
+
+    def _load(self, key):
+        if key in self.entries:
+            return self.entries[key]
+        if self.directory is None:
+            return None
+        try:
+            entry = joblib.load(self._path(key))
+        except (OSError, EOFError, ValueError):
+            return None
+        self.entries[key] = entry
+        return entry
+
+    def _save(self, key, entry):
+        self.entries[key] = entry
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Written to a temporary file first, so a reader never loads a partial entry
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix='.entry-')
+        with os.fdopen(fd, 'wb') as f:
+            joblib.dump(entry, f)
+        os.replace(temporary, self._path(key))
+        self._prune()
+
+    def _prune(self):
+        files = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.endswith('.joblib')]
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def fit_transform(self, preprocessor, X_train, X_test=None):
+        """
+        Fit a copy of the preprocessor on X_train and transform X_train and X_test
+
+        Args:
+            preprocessor: Unfitted preprocessor (it is cloned, never modified)
+            X_train: Rows to fit on and transform
+            X_test: Other rows to transform with the fitted copy, if any
+
+        Returns:
+            fitted, Xt_train, Xt_test, seconds: The fitted preprocessor, the transformed
+                matrices (Xt_test is None without X_test) and what computing them cost
+        """
+        start = time.perf_counter()
+        key = self.key(preprocessor, X_train, X_test)
+        entry = self._load(key)
+        if entry is not None:
+            lookup = time.perf_counter() - start
+            self.stats['hits'] += 1
+            self.stats['lookup_seconds'] += lookup
+            self.stats['saved_seconds'] += entry['seconds'] - lookup
+            return entry['preprocessor'], entry['train'], entry['test'], entry['seconds']
+        self.stats['lookup_seconds'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        fitted = clone(preprocessor)
+        Xt_train = fitted.fit_transform(X_train)
+        Xt_test = fitted.transform(X_test) if X_test is not None else None
+        seconds = time.perf_counter() - start
+        self.stats['misses'] += 1
+        self.stats['transform_seconds'] += seconds
+        self._save(key, {'preprocessor': fitted, 'train': Xt_train, 'test': Xt_test, 'seconds': seconds})
+        return fitted, Xt_train, Xt_test, seconds
+
+    def clear(self):
+        """
+        Drop every entry, in memory and on disk
+        """
+        self.entries.clear()
+        if self.directory is None or not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.joblib'):
+                os.remove(os.path.join(self.directory, name))